@@ -2,10 +2,12 @@
 # To get started, simply uncomment the below code or create your own.
 # Deploy with `firebase deploy`
 
-from firebase_functions import https_fn
+from firebase_functions import https_fn, scheduler_fn
+from firebase_functions.core import init
 from firebase_functions.options import set_global_options
 from firebase_admin import initialize_app
-from services import auth_service, damago_service, push_service, user_service, seed_service, couple_interaction_service
+from utils import router
+from utils.constants import API_MIN_INSTANCES
 
 # For cost control, you can set the maximum number of containers that can be
 # running at the same time. This helps mitigate the impact of unexpected
@@ -15,89 +17,151 @@ from services import auth_service, damago_service, push_service, user_service, s
 set_global_options(max_instances=10, region="asia-northeast3")
 initialize_app()
 
+# 서비스 모듈은 각 함수가 처음 호출될 때 import 합니다. (utils/router.py 참고)
+# 예) get_user_info 인스턴스는 Cloud Tasks, FCM, nanoid 모듈을 불러오지 않습니다.
+# import 시간 예산 확인: python scripts/profile_imports.py
+
+@init
+def warm_up_instance() -> None:
+    """인스턴스 초기화 시 클라이언트, 인증서, 카탈로그를 미리 준비"""
+    router.load_handler("warmup_service", "warm_up_instance")()
+
 @https_fn.on_request()
 def generate_code(req: https_fn.Request) -> https_fn.Response:
-    return auth_service.generate_code(req)
+    return router.call("auth_service", "generate_code", req)
 
 @https_fn.on_request()
 def connect_couple(req: https_fn.Request) -> https_fn.Response:
-    return auth_service.connect_couple(req)
+    return router.call("auth_service", "connect_couple", req)
 
 @https_fn.on_request()
 def poke(req: https_fn.Request) -> https_fn.Response:
-    return push_service.poke(req)
+    return router.call("push_service", "poke", req)
 
 @https_fn.on_request()
 def save_live_activity_token(req: https_fn.Request) -> https_fn.Response:
-    return push_service.save_live_activity_token(req)
+    return router.call("push_service", "save_live_activity_token", req)
 
 @https_fn.on_request()
 def update_live_activity(req: https_fn.Request) -> https_fn.Response:
-    return push_service.update_live_activity(req)
+    return router.call("push_service", "update_live_activity", req)
 
 @https_fn.on_request()
 def start_live_activity(req: https_fn.Request) -> https_fn.Response:
-    return push_service.start_live_activity(req)
+    return router.call("push_service", "start_live_activity", req)
 
 @https_fn.on_request()
 def retry_push_notification(req: https_fn.Request) -> https_fn.Response:
-    return push_service.retry_push_notification(req)
+    return router.call("push_service", "retry_push_notification", req)
 
 @https_fn.on_request()
 def feed(req: https_fn.Request) -> https_fn.Response:
-    return damago_service.feed(req)
+    return router.call("damago_service", "feed", req)
 
 @https_fn.on_request()
 def create_damago(req: https_fn.Request) -> https_fn.Response:
-    return damago_service.create_damago(req)
+    return router.call("damago_service", "create_damago", req)
+
+@https_fn.on_request()
+def fetch_damago_collection(req: https_fn.Request) -> https_fn.Response:
+    return router.call("damago_service", "fetch_damago_collection", req)
+
+@https_fn.on_request()
+def fetch_leaderboard(req: https_fn.Request) -> https_fn.Response:
+    return router.call("leaderboard_service", "fetch_leaderboard", req)
 
 @https_fn.on_request()
 def make_hungry(req: https_fn.Request) -> https_fn.Response:
-    return damago_service.make_hungry(req)
+    return router.call("damago_service", "make_hungry", req)
 
 @https_fn.on_request()
 def get_user_info(req: https_fn.Request) -> https_fn.Response:
-    return user_service.get_user_info(req)
+    return router.call("user_service", "get_user_info", req)
 
 @https_fn.on_request()
 def update_fcm_token(req: https_fn.Request) -> https_fn.Response:
-    return user_service.update_fcm_token(req)
+    return router.call("user_service", "update_fcm_token", req)
     
 @https_fn.on_request()
 def update_user_info(req: https_fn.Request) -> https_fn.Response:
-    return user_service.update_user_info(req)
+    return router.call("user_service", "update_user_info", req)
 
 @https_fn.on_request()
 def adjust_coin(req: https_fn.Request) -> https_fn.Response:
-    return user_service.adjust_coin(req)
+    return router.call("user_service", "adjust_coin", req)
 
 @https_fn.on_request()
 def withdraw_user(req: https_fn.Request) -> https_fn.Response:
-    return auth_service.withdraw_user(req)
+    return router.call("auth_service", "withdraw_user", req)
+
+@https_fn.on_request()
+def continue_cascade_delete(req: https_fn.Request) -> https_fn.Response:
+    return router.call("cascade_service", "continue_cascade_delete", req)
 
 @https_fn.on_request()
 def check_couple_connection(req: https_fn.Request) -> https_fn.Response:
-    return user_service.check_couple_connection(req)
+    return router.call("user_service", "check_couple_connection", req)
 
 @https_fn.on_request()
 def fetch_daily_question(req: https_fn.Request) -> https_fn.Response:
-    return couple_interaction_service.fetch_daily_question(req)
+    return router.call("couple_interaction_service", "fetch_daily_question", req)
 
 @https_fn.on_request()
 def fetch_history(req: https_fn.Request) -> https_fn.Response:
-    return couple_interaction_service.fetch_history(req)
+    return router.call("couple_interaction_service", "fetch_history", req)
 
 @https_fn.on_request()
 def submit_daily_question(req: https_fn.Request) -> https_fn.Response:
-    return couple_interaction_service.submit_daily_question(req)
+    return router.call("couple_interaction_service", "submit_daily_question", req)
 
 @https_fn.on_request()
 def fetch_balance_game(req: https_fn.Request) -> https_fn.Response:
-    return couple_interaction_service.fetch_balance_game(req)
+    return router.call("couple_interaction_service", "fetch_balance_game", req)
 
 @https_fn.on_request()
 def submit_balance_game(req: https_fn.Request) -> https_fn.Response:
-    return couple_interaction_service.submit_balance_game(req)
+    return router.call("couple_interaction_service", "submit_balance_game", req)
+
+# ========================================
+# 재화 관리 (스케줄러)
+# ========================================
+
+@scheduler_fn.on_schedule(schedule="every 5 minutes")
+def fold_economy_shards(event: scheduler_fn.ScheduledEvent) -> None:
+    """재화 샤드 변동분을 커플 문서에 합산"""
+    router.run_scheduled("economy_service", "fold_economy_shards", event)
+
+@scheduler_fn.on_schedule(schedule="every 30 minutes")
+def compact_economy_ledger(event: scheduler_fn.ScheduledEvent) -> None:
+    """재화 원장 항목을 체크포인트 잔액에 합산"""
+    router.run_scheduled("economy_service", "compact_economy_ledger", event)
+
+# ========================================
+# 커플 코드 풀 (스케줄러)
+# ========================================
+
+@scheduler_fn.on_schedule(schedule="every 10 minutes")
+def refill_code_pool(event: scheduler_fn.ScheduledEvent) -> None:
+    """미리 예약해 둔 커플 코드를 목표 개수까지 보충"""
+    router.run_scheduled("code_service", "refill_code_pool", event)
+
+# ========================================
+# 탈퇴 연쇄 삭제 (스케줄러)
+# ========================================
+
+@scheduler_fn.on_schedule(schedule="every 15 minutes")
+def resume_cascade_deletes(event: scheduler_fn.ScheduledEvent) -> None:
+    """중단된 탈퇴 연쇄 삭제 작업을 이어서 진행"""
+    router.run_scheduled("cascade_service", "resume_cascade_deletes", event)
+
+# ========================================
+# 리더보드 (스케줄러)
+# ========================================
+
+@scheduler_fn.on_schedule(schedule="every 30 minutes")
+def refresh_leaderboard(event: scheduler_fn.ScheduledEvent) -> None:
+    """탈퇴로 순위가 줄어든 리더보드를 다시 계산"""
+    router.run_scheduled("leaderboard_service", "refresh_leaderboard", event)
 
 # ========================================
 # 시드 데이터 관리 (관리자 전용)
@@ -106,14 +170,57 @@ def submit_balance_game(req: https_fn.Request) -> https_fn.Response:
 @https_fn.on_request()
 def seed_daily_questions(req: https_fn.Request) -> https_fn.Response:
     """일일 응답 질문 시드 데이터 추가"""
-    return seed_service.seed_daily_questions(req)
+    return router.call("seed_service", "seed_daily_questions", req)
 
 @https_fn.on_request()
 def seed_balance_games(req: https_fn.Request) -> https_fn.Response:
     """밸런스 게임 시드 데이터 추가"""
-    return seed_service.seed_balance_games(req)
+    return router.call("seed_service", "seed_balance_games", req)
 
 @https_fn.on_request()
 def clear_seed_data(req: https_fn.Request) -> https_fn.Response:
     """시드 데이터 삭제 (개발 환경 전용)"""
-    return seed_service.clear_seed_data(req)
+    return router.call("seed_service", "clear_seed_data", req)
+
+# ========================================
+# 통합 엔트리포인트 (선택)
+# ========================================
+# 하나의 함수(api)가 경로로 기존 핸들러를 호출하여, 모든 라우트가 warm 인스턴스를 공유합니다.
+# 예) POST https://asia-northeast3-{project}.cloudfunctions.net/api/feed
+# 위의 개별 함수들은 기존 클라이언트 호환을 위해 그대로 유지합니다.
+
+API_ROUTES = {
+    "generate_code": ("auth_service", "generate_code"),
+    "connect_couple": ("auth_service", "connect_couple"),
+    "withdraw_user": ("auth_service", "withdraw_user"),
+    "continue_cascade_delete": ("cascade_service", "continue_cascade_delete"),
+    "poke": ("push_service", "poke"),
+    "save_live_activity_token": ("push_service", "save_live_activity_token"),
+    "update_live_activity": ("push_service", "update_live_activity"),
+    "start_live_activity": ("push_service", "start_live_activity"),
+    "retry_push_notification": ("push_service", "retry_push_notification"),
+    "feed": ("damago_service", "feed"),
+    "create_damago": ("damago_service", "create_damago"),
+    "fetch_damago_collection": ("damago_service", "fetch_damago_collection"),
+    "fetch_leaderboard": ("leaderboard_service", "fetch_leaderboard"),
+    "make_hungry": ("damago_service", "make_hungry"),
+    "get_user_info": ("user_service", "get_user_info"),
+    "update_fcm_token": ("user_service", "update_fcm_token"),
+    "update_user_info": ("user_service", "update_user_info"),
+    "adjust_coin": ("user_service", "adjust_coin"),
+    "check_couple_connection": ("user_service", "check_couple_connection"),
+    "fetch_daily_question": ("couple_interaction_service", "fetch_daily_question"),
+    "fetch_history": ("couple_interaction_service", "fetch_history"),
+    "submit_daily_question": ("couple_interaction_service", "submit_daily_question"),
+    "fetch_balance_game": ("couple_interaction_service", "fetch_balance_game"),
+    "submit_balance_game": ("couple_interaction_service", "submit_balance_game"),
+    "seed_daily_questions": ("seed_service", "seed_daily_questions"),
+    "seed_balance_games": ("seed_service", "seed_balance_games"),
+    "clear_seed_data": ("seed_service", "clear_seed_data"),
+    "warm_up": ("warmup_service", "warm_up"),
+}
+
+@https_fn.on_request(max_instances=30, min_instances=API_MIN_INSTANCES)
+def api(req: https_fn.Request) -> https_fn.Response:
+    """경로 기반 통합 라우터 (/api/{route})"""
+    return router.dispatch(API_ROUTES, req)
@@ -0,0 +1,172 @@
+"""
+콜드 스타트 횟수 비교 벤치마크 (개별 함수 배포 vs 통합 api 라우터)
+
+세션 단위 요청 흐름을 재생하여, 라우트마다 별도 함수로 배포했을 때와
+하나의 api 함수로 모든 라우트를 처리했을 때의 콜드 스타트 횟수와 지연 시간을 비교합니다.
+Firebase/Firestore 없이 인스턴스 수명만 시뮬레이션합니다.
+
+사용법:
+    python scripts/bench_cold_starts.py
+    python scripts/bench_cold_starts.py --sessions-per-hour 300 --hours 24 --idle-timeout 900
+    # 실제 요청 로그 재생 (한 줄에 {"t": 초, "route": "feed"} 형식의 JSON)
+    python scripts/bench_cold_starts.py --replay requests.jsonl
+"""
+
+import argparse
+import json
+import random
+import statistics
+
+# (라우트, 이전 요청 이후 대기 시간(초)) 목록으로 구성된 세션 유형과 가중치
+SESSION_MIX = [
+    (0.35, "app_open", [
+        ("get_user_info", 0), ("check_couple_connection", 1),
+        ("fetch_daily_question", 3), ("fetch_balance_game", 5),
+    ]),
+    (0.25, "feed", [
+        ("get_user_info", 0), ("feed", 4), ("feed", 2), ("feed", 2),
+    ]),
+    (0.20, "daily_question", [
+        ("get_user_info", 0), ("fetch_daily_question", 2),
+        ("submit_daily_question", 40), ("fetch_history", 10),
+    ]),
+    (0.10, "poke", [
+        ("get_user_info", 0), ("poke", 5),
+    ]),
+    (0.10, "store", [
+        ("get_user_info", 0), ("create_damago", 8), ("update_user_info", 15),
+    ]),
+]
+
+# feed 이후 Cloud Tasks가 호출하는 배고픔 전환 (초)
+HUNGER_DELAY_SECONDS = 4 * 60 * 60
+
+
+def generate_requests(sessions_per_hour: float, hours: float, seed: int) -> list:
+    """세션 도착을 포아송 과정으로 생성하여 (시각, 라우트) 목록을 반환합니다."""
+    rng = random.Random(seed)
+    weights = [weight for weight, _, _ in SESSION_MIX]
+    duration = hours * 3600
+    requests = []
+
+    t = 0.0
+    while True:
+        t += rng.expovariate(sessions_per_hour / 3600)
+        if t >= duration:
+            break
+
+        _, _, steps = rng.choices(SESSION_MIX, weights=weights)[0]
+        at = t
+        for route, gap in steps:
+            at += gap * rng.uniform(0.5, 1.5)
+            requests.append((at, route))
+            if route == "feed":
+                requests.append((at + HUNGER_DELAY_SECONDS, "make_hungry"))
+
+    requests.sort()
+    return requests
+
+
+def load_replay(path: str) -> list:
+    requests = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                requests.append((float(row["t"]), row["route"]))
+    requests.sort()
+    return requests
+
+
+class Deployment:
+    """하나의 Cloud Function (인스턴스 풀)"""
+
+    def __init__(self, max_instances: int, idle_timeout: float):
+        self.max_instances = max_instances
+        self.idle_timeout = idle_timeout
+        self.free_at = []  # 각 인스턴스가 다음 요청을 받을 수 있는 시각
+        self.cold_starts = 0
+
+    def handle(self, at: float, service_time: float, cold_start_time: float) -> float:
+        """요청을 처리하고 (대기 + 콜드 스타트 + 처리) 지연 시간을 반환합니다."""
+        # 유휴 시간이 지난 인스턴스는 회수
+        self.free_at = [free for free in self.free_at if at - free <= self.idle_timeout]
+
+        idle = [i for i, free in enumerate(self.free_at) if free <= at]
+        if idle:
+            index = max(idle, key=lambda i: self.free_at[i])
+            self.free_at[index] = at + service_time
+            return service_time
+
+        if len(self.free_at) < self.max_instances:
+            self.cold_starts += 1
+            self.free_at.append(at + cold_start_time + service_time)
+            return cold_start_time + service_time
+
+        # 모든 인스턴스가 바쁘면 가장 먼저 끝나는 인스턴스를 기다림
+        index = min(range(len(self.free_at)), key=lambda i: self.free_at[i])
+        start = self.free_at[index]
+        self.free_at[index] = start + service_time
+        return start - at + service_time
+
+
+def simulate(requests: list, consolidated: bool, args) -> dict:
+    deployments = {}
+    latencies = []
+
+    for at, route in requests:
+        key = "api" if consolidated else route
+        if key not in deployments:
+            max_instances = args.api_max_instances if consolidated else args.max_instances
+            deployments[key] = Deployment(max_instances, args.idle_timeout)
+        latencies.append(deployments[key].handle(at, args.service_time, args.cold_start_time))
+
+    cold_starts = sum(d.cold_starts for d in deployments.values())
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        "mode": "api (consolidated)" if consolidated else "per-function",
+        "functions": len(deployments),
+        "requests": len(requests),
+        "coldStarts": cold_starts,
+        "coldStartRatio": cold_starts / len(requests) if requests else 0,
+        "p50": quantiles[49],
+        "p95": quantiles[94],
+        "p99": quantiles[98],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions-per-hour", type=float, default=120)
+    parser.add_argument("--hours", type=float, default=24)
+    parser.add_argument("--idle-timeout", type=float, default=15 * 60, help="인스턴스 회수까지 유휴 시간(초)")
+    parser.add_argument("--cold-start-time", type=float, default=2.5, help="콜드 스타트 비용(초)")
+    parser.add_argument("--service-time", type=float, default=0.15, help="warm 요청 처리 시간(초)")
+    parser.add_argument("--max-instances", type=int, default=10)
+    parser.add_argument("--api-max-instances", type=int, default=30)
+    parser.add_argument("--replay", help="요청 로그(JSONL) 재생")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="결과를 JSON으로 출력")
+    args = parser.parse_args()
+
+    if args.replay:
+        requests = load_replay(args.replay)
+    else:
+        requests = generate_requests(args.sessions_per_hour, args.hours, args.seed)
+
+    results = [simulate(requests, False, args), simulate(requests, True, args)]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'mode':<20} {'functions':>9} {'requests':>9} {'cold':>6} {'ratio':>7} {'p50(s)':>7} {'p95(s)':>7} {'p99(s)':>7}")
+    for r in results:
+        print(
+            f"{r['mode']:<20} {r['functions']:>9} {r['requests']:>9} {r['coldStarts']:>6} "
+            f"{r['coldStartRatio']:>7.2%} {r['p50']:>7.2f} {r['p95']:>7.2f} {r['p99']:>7.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
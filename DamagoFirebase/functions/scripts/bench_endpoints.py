@@ -0,0 +1,208 @@
+"""
+엔드포인트 벤치마크 (합성 커플 워크로드)
+
+N쌍의 합성 커플을 generate_code, connect_couple로 만들고 다마고를 뽑은 뒤,
+실제 사용 패턴에 가까운 세션을 핸들러에 직접 재생합니다. (워크로드와 외부 서비스 대역은 tests/harness.py)
+액션(라우트)별 처리량, p50/p95/p99 지연, Firestore 연산 수, 트랜잭션 재시도 수를 보고합니다.
+
+백엔드
+- memory (기본): utils/memory_firestore.py. 외부 의존 없이 실행되며 결과가 재현 가능합니다.
+- emulator: Firestore/Auth 에뮬레이터 (FIRESTORE_EMULATOR_HOST, FIREBASE_AUTH_EMULATOR_HOST 필요)
+
+인증은 두 백엔드 모두 Auth 에뮬레이터 모드에서 허용되는 서명 없는 ID 토큰을 사용하고,
+커플 연결 후에는 클라이언트의 토큰 갱신처럼 커플 claim이 들어간 토큰으로 교체합니다.
+에뮬레이터가 없는 외부 서비스는 요청만 기록하는 대역으로 대체합니다.
+- Cloud Tasks 예약, FCM 전송 (두 백엔드 공통)
+- custom claim 저장 (memory 백엔드만, emulator는 Auth 에뮬레이터에 저장)
+합성 사용자는 FCM 토큰만 등록하고 Live Activity 토큰은 없으므로 Live Activity 갱신은 전송 전 단계에서 건너뜁니다.
+
+카탈로그 캐시를 미리 채워 warm 인스턴스 기준으로 측정하며,
+커플 코드 풀은 --code-pool 개수만큼 채웁니다. (기본: 합성 사용자 수, 0이면 즉석 생성 경로 측정)
+--check-budget이면 utils/firestore_budget.py 예산을 넘은 액션이 있을 때 종료 코드 1로 끝납니다.
+
+사용법:
+    python scripts/bench_endpoints.py
+    python scripts/bench_endpoints.py --couples 100 --sessions 3000 --concurrency 8 --seed 7
+    python scripts/bench_endpoints.py --json > before.json
+    python scripts/bench_endpoints.py --baseline before.json    # 브랜치 간 비교
+    firebase emulators:exec --only firestore,auth "python scripts/bench_endpoints.py --backend emulator"
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "tests"))
+
+import harness  # noqa: E402
+
+FIELDS = ("reads", "writes", "queries", "transactions", "retries")
+
+
+# --- 측정 ---
+
+@dataclass
+class ActionStats:
+    latencies: list = field(default_factory=list)
+    statuses: Counter = field(default_factory=Counter)
+    totals: Counter = field(default_factory=Counter)
+    maxima: Counter = field(default_factory=Counter)
+    violations: Counter = field(default_factory=Counter)
+
+    def add(self, ms: float, status: int, ops, violations: list) -> None:
+        self.latencies.append(ms)
+        self.statuses[status] += 1
+        for name in FIELDS:
+            value = getattr(ops, name)
+            self.totals[name] += value
+            self.maxima[name] = max(self.maxima[name], value)
+        for violation in violations:
+            self.violations[violation.split(" ")[0]] += 1
+
+    def report(self) -> dict:
+        count = len(self.latencies)
+        return {
+            "count": count,
+            "ok": sum(n for status, n in self.statuses.items() if status < 400),
+            "statuses": {str(status): n for status, n in sorted(self.statuses.items())},
+            "p50": _percentile(self.latencies, 50),
+            "p95": _percentile(self.latencies, 95),
+            "p99": _percentile(self.latencies, 99),
+            "meanMs": round(statistics.fmean(self.latencies), 2),
+            "ops": {name: round(self.totals[name] / count, 2) for name in FIELDS},
+            "opsMax": {name: self.maxima[name] for name in FIELDS},
+            "budgetViolations": dict(self.violations),
+        }
+
+
+def _percentile(values: list, percent: int) -> float:
+    if len(values) == 1:
+        return round(values[0], 2)
+    return round(statistics.quantiles(values, n=100, method="inclusive")[percent - 1], 2)
+
+
+# --- 보고 ---
+
+def print_report(result: dict) -> None:
+    config = result["config"]
+    print(
+        f"backend={config['backend']} couples={config['couples']} sessions={config['sessions']} "
+        f"concurrency={config['concurrency']} seed={config['seed']}"
+    )
+    print(
+        f"actions={result['actions']} wall={result['wallSeconds']}s "
+        f"throughput={result['throughput']} req/s retries={result['retries']} "
+        f"tasks={result['tasksScheduled']} pushes={result['pushesSent']}"
+    )
+    print()
+    print(f"{'action':<26} {'n':>5} {'ok':>5} {'p50':>7} {'p95':>7} {'p99':>7} "
+          f"{'reads':>6} {'writes':>6} {'query':>5} {'tx':>4} {'retry':>5}  budget")
+    for route, stats in sorted(result["routes"].items()):
+        ops = stats["ops"]
+        violations = stats["budgetViolations"]
+        budget = "over " + ",".join(f"{k}x{v}" for k, v in violations.items()) if violations else "ok"
+        print(
+            f"{route:<26} {stats['count']:>5} {stats['ok']:>5} {stats['p50']:>7.2f} {stats['p95']:>7.2f} {stats['p99']:>7.2f} "
+            f"{ops['reads']:>6.1f} {ops['writes']:>6.1f} {ops['queries']:>5.1f} {ops['transactions']:>4.1f} {ops['retries']:>5.2f}  {budget}"
+        )
+
+
+def print_comparison(result: dict, baseline: dict) -> None:
+    def delta(before, after):
+        if not before:
+            return "   n/a"
+        return f"{(after - before) / before * 100:+6.1f}%"
+
+    print()
+    print(f"vs baseline: throughput {baseline['throughput']} -> {result['throughput']} req/s "
+          f"({delta(baseline['throughput'], result['throughput'])})")
+    print(f"{'action':<26} {'p50 (ms)':>26} {'p95 (ms)':>26} {'reads':>14} {'writes':>14}")
+    for route, stats in sorted(result["routes"].items()):
+        before = baseline["routes"].get(route)
+        if before is None:
+            print(f"{route:<26} (new)")
+            continue
+        print(
+            f"{route:<26} "
+            f"{before['p50']:>7.2f} -> {stats['p50']:<7.2f}{delta(before['p50'], stats['p50'])} "
+            f"{before['p95']:>7.2f} -> {stats['p95']:<7.2f}{delta(before['p95'], stats['p95'])} "
+            f"{before['ops']['reads']:>5.1f} -> {stats['ops']['reads']:<5.1f} "
+            f"{before['ops']['writes']:>5.1f} -> {stats['ops']['writes']:<5.1f}"
+        )
+
+
+# --- 실행 ---
+
+def run(args) -> dict:
+    harness.configure_environment(args.backend, args.project)
+    from utils.firestore_budget import check_budget
+
+    stats = {}
+    lock = threading.Lock()
+
+    def observe(route: str, ms: float, status: int, ops) -> None:
+        violations = check_budget(route, ops)
+        with lock:
+            stats.setdefault(route, ActionStats()).add(ms, status, ops, violations)
+
+    replayed = harness.replay(
+        args.backend, args.couples, args.sessions, args.concurrency, args.seed, args.code_pool, args.project, observe
+    )
+
+    wall = replayed["wallSeconds"]
+    routes = {route: action.report() for route, action in stats.items()}
+    actions = sum(action["count"] for action in routes.values())
+    return {
+        "config": {
+            "backend": args.backend,
+            "couples": args.couples,
+            "sessions": args.sessions,
+            "concurrency": args.concurrency,
+            "codePool": replayed["codePool"],
+            "seed": args.seed,
+        },
+        "actions": actions,
+        "wallSeconds": round(wall, 2),
+        "throughput": round(actions / wall, 1),
+        "retries": sum(action.totals["retries"] for action in stats.values()),
+        "tasksScheduled": replayed["tasksScheduled"],
+        "pushesSent": replayed["pushesSent"],
+        "routes": routes,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="합성 커플 워크로드로 엔드포인트 벤치마크")
+    parser.add_argument("--backend", choices=("memory", "emulator"), default="memory")
+    parser.add_argument("--couples", type=int, default=50, help="합성 커플 수")
+    parser.add_argument("--sessions", type=int, default=1000, help="재생할 세션 수 (커플 생성 제외)")
+    parser.add_argument("--concurrency", type=int, default=1, help="동시에 실행할 세션 수 (커플 문서 경합 재현)")
+    parser.add_argument("--seed", type=int, default=1, help="세션 구성 랜덤 시드")
+    parser.add_argument("--code-pool", type=int, help="미리 채울 커플 코드 풀 크기 (기본: 합성 사용자 수)")
+    parser.add_argument("--project", default=harness.DEFAULT_PROJECT)
+    parser.add_argument("--baseline", type=Path, help="비교할 이전 --json 결과")
+    parser.add_argument("--check-budget", action="store_true", help="Firestore 연산 예산 초과 시 실패")
+    parser.add_argument("--json", action="store_true", help="결과를 JSON으로 출력")
+    args = parser.parse_args()
+
+    result = run(args)
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        print_report(result)
+        if args.baseline:
+            print_comparison(result, json.loads(args.baseline.read_text()))
+
+    if args.check_budget and any(stats["budgetViolations"] for stats in result["routes"].values()):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
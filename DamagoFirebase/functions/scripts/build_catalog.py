@@ -0,0 +1,53 @@
+"""
+질문 카탈로그 스냅샷 빌드 (data/*.csv -> data/catalog.json)
+
+CSV를 수정한 뒤 실행하여 스냅샷을 다시 만들고 CSV와 함께 커밋합니다.
+--check는 스냅샷이 CSV와 일치하는지만 확인합니다. (CI 배포 단계에서 실행, 다르면 종료 코드 1)
+
+사용법:
+    cd DamagoFirebase/functions
+    python scripts/build_catalog.py
+    python scripts/build_catalog.py --check
+"""
+
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils import catalog_snapshot
+
+
+def main(args: list) -> int:
+    try:
+        snapshot = catalog_snapshot.compile_snapshot()
+    except ValueError as e:
+        print(f"Invalid catalog: {e}", file=sys.stderr)
+        return 1
+
+    compiled = catalog_snapshot.dumps(snapshot)
+    path = catalog_snapshot.SNAPSHOT_PATH
+    summary = {
+        collection: {"rows": len(data["orders"]), "contentHash": data["contentHash"]}
+        for collection, data in snapshot["collections"].items()
+    }
+
+    if "--check" in args:
+        current = path.read_text(encoding="utf-8") if path.exists() else None
+        if current != compiled:
+            print(f"{path.name} is out of date. Run: python scripts/build_catalog.py", file=sys.stderr)
+            return 1
+        print(json.dumps(summary, ensure_ascii=False))
+        return 0
+
+    path.write_text(compiled, encoding="utf-8")
+    print(json.dumps({"path": str(path), "bytes": len(compiled.encode("utf-8")), **summary}, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    if any(arg != "--check" for arg in sys.argv[1:]):
+        print(__doc__)
+        sys.exit(2)
+    sys.exit(main(sys.argv[1:]))
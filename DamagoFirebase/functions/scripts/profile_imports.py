@@ -0,0 +1,188 @@
+"""
+함수별 import 시간 프로파일링 및 예산 확인
+
+각 Cloud Function 엔트리포인트마다 새 인터프리터에서
+`python -X importtime`으로 main.py와 해당 핸들러를 불러와
+전체 import 시간과 불러온 모듈을 측정합니다.
+
+- 예산(ms)을 넘거나, 불러오면 안 되는 무거운 모듈이 로드되면 실패(종료 코드 1)로 처리합니다.
+- 측정값은 머신마다 다르므로 느린 환경에서는 --scale로 예산을 조정합니다.
+
+사용법:
+    python scripts/profile_imports.py
+    python scripts/profile_imports.py --only get_user_info feed --top 15
+    python scripts/profile_imports.py --scale 1.5 --json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+FUNCTIONS_DIR = Path(__file__).resolve().parent.parent
+
+# 엔트리포인트: (서비스 모듈, 핸들러 이름)
+ENTRY_POINTS = {
+    "generate_code": ("auth_service", "generate_code"),
+    "connect_couple": ("auth_service", "connect_couple"),
+    "withdraw_user": ("auth_service", "withdraw_user"),
+    "continue_cascade_delete": ("cascade_service", "continue_cascade_delete"),
+    "poke": ("push_service", "poke"),
+    "save_live_activity_token": ("push_service", "save_live_activity_token"),
+    "update_live_activity": ("push_service", "update_live_activity"),
+    "start_live_activity": ("push_service", "start_live_activity"),
+    "retry_push_notification": ("push_service", "retry_push_notification"),
+    "feed": ("damago_service", "feed"),
+    "create_damago": ("damago_service", "create_damago"),
+    "fetch_damago_collection": ("damago_service", "fetch_damago_collection"),
+    "fetch_leaderboard": ("leaderboard_service", "fetch_leaderboard"),
+    "make_hungry": ("damago_service", "make_hungry"),
+    "get_user_info": ("user_service", "get_user_info"),
+    "update_fcm_token": ("user_service", "update_fcm_token"),
+    "update_user_info": ("user_service", "update_user_info"),
+    "adjust_coin": ("user_service", "adjust_coin"),
+    "check_couple_connection": ("user_service", "check_couple_connection"),
+    "fetch_daily_question": ("couple_interaction_service", "fetch_daily_question"),
+    "fetch_history": ("couple_interaction_service", "fetch_history"),
+    "submit_daily_question": ("couple_interaction_service", "submit_daily_question"),
+    "fetch_balance_game": ("couple_interaction_service", "fetch_balance_game"),
+    "submit_balance_game": ("couple_interaction_service", "submit_balance_game"),
+    "fold_economy_shards": ("economy_service", "fold_economy_shards"),
+    "compact_economy_ledger": ("economy_service", "compact_economy_ledger"),
+    "refill_code_pool": ("code_service", "refill_code_pool"),
+    "resume_cascade_deletes": ("cascade_service", "resume_cascade_deletes"),
+    "seed_daily_questions": ("seed_service", "seed_daily_questions"),
+    "seed_balance_games": ("seed_service", "seed_balance_games"),
+    "clear_seed_data": ("seed_service", "clear_seed_data"),
+}
+
+# 모든 함수가 공통으로 부담하는 비용(firebase_functions, firestore 클라이언트)을 포함한 예산 (ms)
+DEFAULT_BUDGET_MS = 900
+
+# 무거운 의존성을 쓰는 함수는 별도 예산
+BUDGET_MS = {
+    "poke": 1100,
+    "save_live_activity_token": 1100,
+    "update_live_activity": 1100,
+    "start_live_activity": 1100,
+    "retry_push_notification": 1100,
+}
+
+# 요청 처리 경로에서 지연 로딩되어야 하는 무거운 모듈
+HEAVY_MODULES = [
+    "google.cloud.tasks_v2",
+    "firebase_admin.messaging",
+    "nanoid",
+    "services.seed_service",
+]
+
+# 엔트리포인트별로 허용되는 무거운 모듈 (나머지는 로드되면 위반)
+ALLOWED_HEAVY = {
+    "poke": {"firebase_admin.messaging"},
+    "save_live_activity_token": {"firebase_admin.messaging"},
+    "update_live_activity": {"firebase_admin.messaging"},
+    "start_live_activity": {"firebase_admin.messaging"},
+    "retry_push_notification": {"firebase_admin.messaging"},
+    "seed_daily_questions": {"services.seed_service"},
+    "seed_balance_games": {"services.seed_service"},
+    "clear_seed_data": {"services.seed_service"},
+}
+
+
+def measure(module: str, name: str) -> dict:
+    """새 인터프리터에서 main과 핸들러를 import 하여 importtime 출력을 집계합니다."""
+    code = (
+        "import main\n"
+        "from utils.router import load_handler\n"
+        f"load_handler({module!r}, {name!r})\n"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=FUNCTIONS_DIR,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    if proc.returncode != 0:
+        tail = proc.stderr.strip().splitlines()[-5:]
+        raise RuntimeError(f"{module}.{name} import failed:\n" + "\n".join(tail))
+
+    modules = {}
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, package = line[len("import time:"):].split("|")
+        total_us += int(self_us)
+        package_name = package.strip()
+        modules[package_name] = {
+            "cumulativeUs": int(cumulative_us),
+            # importtime은 중첩 깊이를 들여쓰기로 표시합니다.
+            "depth": (len(package) - len(package.lstrip()) - 1) // 2,
+        }
+
+    return {"totalMs": total_us / 1000, "modules": modules}
+
+
+def top_level_costs(modules: dict, top: int) -> list:
+    """최상위(직접 import된) 모듈을 누적 시간 순으로 정렬합니다."""
+    roots = [(name, info["cumulativeUs"]) for name, info in modules.items() if info["depth"] == 0]
+    roots.sort(key=lambda item: item[1], reverse=True)
+    return [{"module": name, "ms": us / 1000} for name, us in roots[:top]]
+
+
+def check(entry: str, result: dict, scale: float) -> list:
+    violations = []
+    budget = BUDGET_MS.get(entry, DEFAULT_BUDGET_MS) * scale
+    if result["totalMs"] > budget:
+        violations.append(f"{result['totalMs']:.0f}ms > budget {budget:.0f}ms")
+
+    allowed = ALLOWED_HEAVY.get(entry, set())
+    for heavy in HEAVY_MODULES:
+        if heavy in result["modules"] and heavy not in allowed:
+            violations.append(f"loads {heavy}")
+    return violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", help="측정할 엔트리포인트")
+    parser.add_argument("--scale", type=float, default=1.0, help="예산 배율 (느린 머신용)")
+    parser.add_argument("--top", type=int, default=0, help="엔트리포인트별 상위 N개 모듈 출력")
+    parser.add_argument("--json", action="store_true", help="결과를 JSON으로 출력")
+    args = parser.parse_args()
+
+    entries = args.only or list(ENTRY_POINTS)
+    unknown = [entry for entry in entries if entry not in ENTRY_POINTS]
+    if unknown:
+        parser.error(f"unknown entry points: {', '.join(unknown)}")
+
+    report = []
+    for entry in entries:
+        result = measure(*ENTRY_POINTS[entry])
+        report.append({
+            "entry": entry,
+            "totalMs": round(result["totalMs"], 1),
+            "budgetMs": BUDGET_MS.get(entry, DEFAULT_BUDGET_MS) * args.scale,
+            "violations": check(entry, result, args.scale),
+            "top": top_level_costs(result["modules"], args.top),
+        })
+
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print(f"{'entry point':<28} {'import(ms)':>10} {'budget':>8}  result")
+        for row in report:
+            status = "ok" if not row["violations"] else "FAIL: " + "; ".join(row["violations"])
+            print(f"{row['entry']:<28} {row['totalMs']:>10.1f} {row['budgetMs']:>8.0f}  {status}")
+            for item in row["top"]:
+                print(f"    {item['module']:<40} {item['ms']:>8.1f}")
+
+    if any(row["violations"] for row in report):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
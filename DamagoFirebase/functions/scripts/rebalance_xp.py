@@ -0,0 +1,57 @@
+"""
+다마고 경험치 테이블 재조정 (XP_TABLE 변경 후 실행)
+
+모든 다마고의 level/currentExp/maxExp를 현재 utils/constants의 테이블로 다시 계산하여 바뀐 문서만 기록합니다.
+중단되면 같은 명령으로 다시 실행하여 이어서 진행합니다. (services/xp_migration_service.py 참고)
+
+NumPy가 필요하므로 스크립트 전용 의존성을 먼저 설치합니다. (함수 배포용 requirements.txt에는 없음)
+
+사용법:
+    cd DamagoFirebase/functions
+    pip install -r scripts/requirements.txt
+    GOOGLE_APPLICATION_CREDENTIALS=... python scripts/rebalance_xp.py --dry-run
+    GOOGLE_APPLICATION_CREDENTIALS=... python scripts/rebalance_xp.py
+
+    # 예전 테이블 기준 누적 경험치를 새 테이블로 옮기기 (레벨이 내려갈 수 있음)
+    python scripts/rebalance_xp.py --from-table old_xp_table.json --dry-run
+
+    # 에뮬레이터
+    FIRESTORE_EMULATOR_HOST=localhost:8080 GCLOUD_PROJECT=damago-dev python scripts/rebalance_xp.py --dry-run
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from firebase_admin import initialize_app
+from utils.firestore import get_db
+from services.xp_migration_service import rebalance, PAGE_SIZE
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="다마고 경험치 테이블 재조정")
+    parser.add_argument("--dry-run", action="store_true", help="기록 없이 레벨 분포 변화만 보고")
+    parser.add_argument("--from-table", type=Path, help="예전 XP_TABLE (JSON 정수 배열)")
+    parser.add_argument("--restart", action="store_true", help="체크포인트를 무시하고 처음부터 실행")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    args = parser.parse_args()
+
+    from_table = json.loads(args.from_table.read_text()) if args.from_table else None
+
+    initialize_app()
+    report = rebalance(
+        get_db(),
+        dry_run=args.dry_run,
+        from_table=from_table,
+        restart=args.restart,
+        page_size=args.page_size
+    )
+    print(json.dumps(report, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+"""
+커플 코드 예약(codes/{code}) 재구축
+
+예약 도입 전에 가입한 유저의 코드를 codes 컬렉션에 채웁니다.
+connect_couple은 예약만 조회하므로 배포 전에 한 번 실행해야 합니다. (여러 번 실행해도 안전)
+같은 코드를 가진 유저가 둘 이상이면 conflicts에 기록하고 종료 코드 1을 반환합니다.
+
+사용법:
+    cd DamagoFirebase/functions
+    GOOGLE_APPLICATION_CREDENTIALS=... python scripts/rebuild_code_reservations.py [--dry-run]
+
+    # 에뮬레이터
+    FIRESTORE_EMULATOR_HOST=localhost:8080 GCLOUD_PROJECT=damago-dev python scripts/rebuild_code_reservations.py
+"""
+
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from firebase_admin import initialize_app
+from utils.firestore import get_db
+from services.code_service import rebuild_reservations
+
+
+def main(args: list) -> int:
+    initialize_app()
+    db = get_db()
+
+    report = rebuild_reservations(db, dry_run="--dry-run" in args)
+    print(json.dumps(report, ensure_ascii=False))
+
+    return 1 if report["conflicts"] else 0
+
+
+if __name__ == "__main__":
+    if any(arg not in ("--dry-run",) for arg in sys.argv[1:]):
+        print(__doc__)
+        sys.exit(2)
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,40 @@
+"""
+다마고 리더보드(leaderboards/damagoLevel) 재구축
+
+damagos 전체를 훑어 리더보드 문서를 다시 만듭니다. (services/leaderboard_service.py의 rebuild)
+feed는 레벨업한 다마고만 반영하므로, 리더보드를 도입할 때(기존 다마고를 채우기 위해) 배포 후 한 번 실행해야 합니다.
+문서를 잃었거나 순위가 의심될 때도 다시 실행합니다. (여러 번 실행해도 안전)
+
+사용법:
+    cd DamagoFirebase/functions
+    GOOGLE_APPLICATION_CREDENTIALS=... python scripts/rebuild_leaderboard.py
+
+    # 에뮬레이터
+    FIRESTORE_EMULATOR_HOST=localhost:8080 GCLOUD_PROJECT=damago-dev python scripts/rebuild_leaderboard.py
+"""
+
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from firebase_admin import initialize_app
+from utils.firestore import get_db
+from services.leaderboard_service import rebuild
+
+
+def main() -> int:
+    initialize_app()
+    db = get_db()
+
+    report = rebuild(db)
+    print(json.dumps(report, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    if sys.argv[1:]:
+        print(__doc__)
+        sys.exit(2)
+    sys.exit(main())
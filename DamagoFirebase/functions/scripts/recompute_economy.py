@@ -0,0 +1,41 @@
+"""
+원장 기반 커플 잔액 재계산 (오프라인 감사용)
+
+사용법:
+    cd DamagoFirebase/functions
+    GOOGLE_APPLICATION_CREDENTIALS=... python scripts/recompute_economy.py <coupleID> [<coupleID> ...]
+
+    # 에뮬레이터
+    FIRESTORE_EMULATOR_HOST=localhost:8080 GCLOUD_PROJECT=damago-dev python scripts/recompute_economy.py <coupleID>
+"""
+
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from firebase_admin import initialize_app
+from utils.firestore import get_db
+from services.economy_service import recompute_balance
+
+
+def main(couple_ids: list) -> int:
+    initialize_app()
+    db = get_db()
+
+    mismatched = 0
+    for couple_id in couple_ids:
+        report = recompute_balance(db, couple_id)
+        if not report["matches"]:
+            mismatched += 1
+        print(json.dumps(report, ensure_ascii=False))
+
+    return 1 if mismatched else 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(2)
+    sys.exit(main(sys.argv[1:]))
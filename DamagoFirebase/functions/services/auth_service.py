@@ -1,13 +1,19 @@
 from firebase_functions import https_fn
 from firebase_admin import firestore
-from nanoid import generate
 import google.cloud.firestore
+from google.api_core.exceptions import AlreadyExists
 import json
 
 from utils.constants import AVAILABLE_DAMAGO_TYPES, BASIC_DAMAGO_TYPES, get_default_damago_name, XP_TABLE
-from utils.firestore import get_db
-from utils.middleware import get_uid_from_request
+from utils.firestore import get_db, get_snapshot, get_snapshots
+from utils.middleware import get_uid_from_request, set_couple_claims, clear_couple_claims
 import utils.errors as errors
+import utils.catalog as catalog
+from utils import tracing
+from services import home_service, code_service, cascade_service, leaderboard_service
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 def generate_code(req: https_fn.Request) -> https_fn.Response:
     """
@@ -29,6 +35,7 @@ def generate_code(req: https_fn.Request) -> https_fn.Response:
     doc_ref = users_ref.document(uid)
 
     # --- [Step 1] 기존 유저 확인 ---
+    tracing.step(tracing.READ)
     doc_snapshot = doc_ref.get()
 
     if doc_snapshot.exists:
@@ -50,42 +57,57 @@ def generate_code(req: https_fn.Request) -> https_fn.Response:
                 mimetype='application/json'
             )
 
-    # --- [Step 2] 고유 코드 생성 (NanoID) ---
-    safe_alphabet = '23456789ABCDEFGHJKLMNPQRSTUVWXYZ'
-    max_retries = 10
-    unique_code = None
+    # --- [Step 2] 고유 코드 예약 및 유저 생성 ---
+    tracing.step(tracing.TXN)
 
-    for _ in range(max_retries):
-        temp_code = generate(alphabet=safe_alphabet, size=8)
-        query = users_ref.where("code", "==", temp_code).limit(1).stream()
-        if not next(query, None):
-            unique_code = temp_code
+    @google.cloud.firestore.transactional
+    def run_reserve_transaction(transaction, fallback_code):
+        snapshot = doc_ref.get(transaction=transaction)
+        existing_code = snapshot.to_dict().get("code") if snapshot.exists else None
+        if existing_code:
+            # 같은 유저의 동시 요청이 먼저 발급한 경우
+            return existing_code
+
+        # 미리 예약해 둔 풀에서 꺼내고, 풀이 비어 있으면 즉석 생성 코드를 예약
+        code = code_service.claim_pooled(transaction, db, uid)
+        if code is None:
+            code = fallback_code
+            # 예약 문서는 없을 때만 생성되므로 다른 유저와 코드가 겹치면 커밋 전체가 실패
+            code_service.reserve(transaction, db, code, uid)
+
+        # fcmToken이 이미 존재할 수 있으므로 덮어쓰지 않도록 주의 (None으로 설정하지 않음)
+        user_data = {
+            "uid": uid,  # udid -> uid 변경
+            "code": code,
+            "partnerUID": None, # partnerUDID -> partnerUID 변경
+            "damagoID": None,
+            "coupleID": None,
+            "anniversaryDate": None,
+            "nickname": None,
+            "laStartToken": None,
+            "laUpdateToken": None,
+            "useFCM": True,
+            "useLiveActivity": True,
+            "createdAt": firestore.SERVER_TIMESTAMP,
+            "updatedAt": firestore.SERVER_TIMESTAMP
+        }
+
+        # merge=True를 사용하여 기존 필드(예: fcmToken)는 유지하고, 없는 필드는 추가/업데이트
+        transaction.set(doc_ref, user_data, merge=True)
+        return code
+
+    unique_code = None
+    for _ in range(code_service.MAX_RESERVE_ATTEMPTS):
+        try:
+            unique_code = run_reserve_transaction(db.transaction(), code_service.new_code())
             break
+        except AlreadyExists:
+            # 이미 예약된 코드 (드묾): 새 코드로 재시도
+            continue
 
     if unique_code is None:
         return errors.error_response(errors.Internal.UNABLE_TO_GENERATE_NEW_CODE)
 
-    # --- [Step 3] 유저 생성 (또는 업데이트) ---
-    # fcmToken이 이미 존재할 수 있으므로 덮어쓰지 않도록 주의 (None으로 설정하지 않음)
-    user_data = {
-        "uid": uid,  # udid -> uid 변경
-        "code": unique_code,
-        "partnerUID": None, # partnerUDID -> partnerUID 변경
-        "damagoID": None,
-        "coupleID": None,
-        "anniversaryDate": None,
-        "nickname": None,
-        "laStartToken": None,
-        "laUpdateToken": None,
-        "useFCM": True,
-        "useLiveActivity": True,
-        "createdAt": firestore.SERVER_TIMESTAMP,
-        "updatedAt": firestore.SERVER_TIMESTAMP
-    }
-    
-    # merge=True를 사용하여 기존 필드(예: fcmToken)는 유지하고, 없는 필드는 추가/업데이트
-    doc_ref.set(user_data, merge=True)
-
     return https_fn.Response(
         json.dumps({"myCode": unique_code, "partnerCode": None}), 
         status=200,
@@ -117,25 +139,27 @@ def connect_couple(req: https_fn.Request) -> https_fn.Response:
     users_ref = db.collection("users")
 
     # --- [Step 1] 유저 조회 ---
-    # 내 정보는 UID로 조회
+    tracing.step(tracing.READ)
+    # 내 정보는 UID로, 상대방은 코드 예약(codes/{code})으로 한 번에 조회
     my_doc_ref = users_ref.document(my_uid)
-    my_doc = my_doc_ref.get()
+    my_doc, target_reservation = get_snapshots(db, [my_doc_ref, code_service.code_ref(db, target_code)])
 
     if not my_doc.exists:
         return errors.error_response(errors.NotFound.USER_TOKEN_INVALID)
     
     my_code = my_doc.to_dict().get("code")
+    my_nickname = my_doc.to_dict().get("nickname")
 
     # if my_code == target_code:
     #     return https_fn.Response("Cannot connect to yourself", status=400)
 
-    # 상대방 정보는 코드로 조회
-    target_snapshot = users_ref.where("code", "==", target_code).limit(1).get()
+    target_uid = code_service.uid_from_snapshot(target_reservation)
+    target_doc = get_snapshot(users_ref.document(target_uid)) if target_uid else None
 
-    if not target_snapshot:
+    if target_doc is None or not target_doc.exists:
         return errors.error_response(errors.NotFound.TARGET_USER_INVALID_CODE)
 
-    target_doc = target_snapshot[0]
+    target_nickname = target_doc.to_dict().get("nickname")
 
     # --- [Step 2] ID 생성 ---
     codes = sorted([my_code, target_code])
@@ -144,17 +168,20 @@ def connect_couple(req: https_fn.Request) -> https_fn.Response:
 
     # 첫 번째 질문 ID 가져오기 (order=1)
     first_question_id = None
-    questions_query = db.collection("dailyQuestions").where("order", "==", 1).limit(1).get()
-    if questions_query:
-        first_question_id = questions_query[0].id
+    first_question = catalog.get_by_order(db, catalog.DAILY_QUESTIONS, 1)
+    if first_question:
+        first_question_id = first_question.id
 
     # --- [Step 3] 트랜잭션 실행 ---
+    tracing.step(tracing.TXN)
     @google.cloud.firestore.transactional
     def run_transaction(transaction, couple_ref, my_ref, target_ref, my_uid, target_uid, question_id):
         snapshot = couple_ref.get(transaction=transaction)
 
         if snapshot.exists:
-            return "ok" # 이미 연결됨
+            # 이미 연결됨
+            existing = snapshot.to_dict()
+            return existing.get("user1UID"), existing.get("user2UID")
 
         # 커플 생성 (다마고 선택은 이후 DamagoSetup 등 선택 화면에서 진행)
         transaction.set(couple_ref, {
@@ -183,6 +210,21 @@ def connect_couple(req: https_fn.Request) -> https_fn.Response:
             "updatedAt": firestore.SERVER_TIMESTAMP
         })
 
+        # 홈 화면 읽기 모델 생성 (활성 다마고는 선택 화면에서 설정)
+        transaction.set(home_service.home_ref(db, couple_ref.id), {
+            "coupleID": couple_ref.id,
+            "user1UID": my_uid,
+            "user2UID": target_uid,
+            "damagoID": None,
+            "damago": None,
+            "totalCoin": 0,
+            "foodCount": 10,
+            "nicknames": {my_uid: my_nickname, target_uid: target_nickname},
+            "anniversaryDate": None,
+            "initialized": True,
+            "updatedAt": firestore.SERVER_TIMESTAMP
+        })
+
         # 기본 다마고 생성 (기본 이름 사용)
         for damago_type in BASIC_DAMAGO_TYPES:
             damago_id = f"{couple_ref.id}_{damago_type}"
@@ -203,10 +245,10 @@ def connect_couple(req: https_fn.Request) -> https_fn.Response:
                 "damagoType": damago_type,
             })
 
-        return "ok"
+        return my_uid, target_uid
 
     try:
-        result_message = run_transaction(
+        user1_uid, user2_uid = run_transaction(
             db.transaction(),
             couple_ref,
             my_doc.reference,
@@ -218,7 +260,17 @@ def connect_couple(req: https_fn.Request) -> https_fn.Response:
     except Exception as e:
         return https_fn.Response(f"Transaction failed: {str(e)}", status=500)
 
-    return https_fn.Response(result_message)
+    # --- [Step 4] Custom Claims 설정 ---
+    tracing.step(tracing.CLAIMS)
+    # 이후 요청에서 users 문서 조회 없이 토큰만으로 커플을 찾을 수 있도록 저장
+    # (실패해도 핸들러가 users 문서로 fallback 하므로 연결 자체는 성공 처리)
+    try:
+        set_couple_claims(user1_uid, couple_ref.id, user2_uid, True)
+        set_couple_claims(user2_uid, couple_ref.id, user1_uid, False)
+    except Exception as e:
+        logger.error("Failed to set couple claims", coupleID=couple_ref.id, error=str(e))
+
+    return https_fn.Response("ok")
 
 def withdraw_user(req: https_fn.Request) -> https_fn.Response:
     """
@@ -226,8 +278,8 @@ def withdraw_user(req: https_fn.Request) -> https_fn.Response:
 
     1. 해당 user 삭제
     2. 해당 user가 속한 커플(coupleID) 삭제
-    3. 해당 커플의 모든 다마고 삭제
-    4. 파트너(partnerUID) 정보 초기화 (coupleID, partnerUID, damagoID 제거)
+    3. 파트너(partnerUID) 정보 초기화 (coupleID, partnerUID, damagoID 제거)
+    4. 해당 커플의 다마고, 답변, 재화 원장 연쇄 삭제 (services/cascade_service.py)
 
     Args:
         req (https_fn.Request): Header Authorization Bearer Token
@@ -244,6 +296,7 @@ def withdraw_user(req: https_fn.Request) -> https_fn.Response:
     user_ref = db.collection("users").document(uid)
 
     # 유저 정보 조회
+    tracing.step(tracing.READ)
     user_doc = user_ref.get()
     if not user_doc.exists:
         return errors.error_response(errors.NotFound.USER)
@@ -254,20 +307,20 @@ def withdraw_user(req: https_fn.Request) -> https_fn.Response:
 
     batch = db.batch()
 
-    # 1. 해당 user 삭제
+    # 1. 해당 user 삭제 (코드 예약 해제 포함)
     batch.delete(user_ref)
+    code_service.release(batch, db, user_data.get("code"))
 
-    # 2. 커플 삭제
+    # 2. 커플 삭제 (홈 화면 읽기 모델 포함)
+    # 커플 소유 문서(다마고, 답변, 재화 원장)는 같은 배치로 만든 연쇄 삭제 작업이 지웁니다.
+    cascade_job_id = None
     if couple_id:
         couple_ref = db.collection("couples").document(couple_id)
         batch.delete(couple_ref)
+        batch.delete(home_service.home_ref(db, couple_id))
+        cascade_job_id = cascade_service.start_couple_deletion(batch, db, couple_id)
 
-    # 3. 해당 커플의 모든 다마고 삭제
-    if couple_id:
-        for doc in db.collection("damagos").where("coupleID", "==", couple_id).stream():
-            batch.delete(doc.reference)
-
-    # 4. 파트너 정보 초기화 (본인이 아닌 경우에만)
+    # 3. 파트너 정보 초기화 (본인이 아닌 경우에만)
     if partner_uid and partner_uid != uid:
         partner_ref = db.collection("users").document(partner_uid)
         batch.update(partner_ref, {
@@ -277,8 +330,27 @@ def withdraw_user(req: https_fn.Request) -> https_fn.Response:
             "anniversaryDate": firestore.DELETE_FIELD
         })
 
+    tracing.step(tracing.WRITE)
     batch.commit()
 
+    # 4. 커플 소유 문서 삭제 (많으면 나머지는 Cloud Tasks에서 이어서 삭제)
+    if cascade_job_id:
+        cascade_service.delete_inline(db, cascade_job_id)
+        try:
+            leaderboard_service.remove_couple(db, couple_id)
+        except Exception as e:
+            logger.error("Failed to remove couple from leaderboard", coupleID=couple_id, error=str(e))
+
+    # 커플 claim 제거 (파트너는 토큰 갱신 시 반영)
+    tracing.step(tracing.CLAIMS)
+    for claim_uid in [uid, partner_uid]:
+        if not claim_uid:
+            continue
+        try:
+            clear_couple_claims(claim_uid)
+        except Exception as e:
+            logger.error("Failed to clear couple claims", uid=claim_uid, error=str(e))
+
     return https_fn.Response(
         json.dumps({"message": "User withdrawn successfully"}),
         mimetype="application/json"
@@ -0,0 +1,242 @@
+"""
+연쇄 삭제 (탈퇴 시 커플 소유 데이터 정리)
+
+커플이 소유한 문서를 아래 소유 관계(COUPLE_OWNERSHIP)를 따라 모두 삭제합니다.
+- damagos (coupleID로 조회)
+- couples/{coupleID}/dailyQuestionAnswers, balanceGameAnswers
+- couples/{coupleID}/economy (샤드, 원장 체크포인트), economyLedger
+
+진행 상황은 cascadeDeletes/{jobID} 문서에 체크포인트로 남기므로 중간에 실패해도 이어서 삭제할 수 있습니다.
+- withdraw_user는 작업 문서를 유저 삭제와 같은 배치로 만들고, INLINE_DELETE_LIMIT개까지만 바로 삭제합니다.
+- 남은 문서는 Cloud Tasks(continue_cascade_delete)가 TASK_DELETE_LIMIT개씩 이어서 삭제합니다.
+- 예약에 실패했거나 중단된 작업은 resume_cascade_deletes 스케줄러가 다시 실행합니다.
+
+삭제는 utils/bulk_delete.py 엔진으로 페이지(PAGE_SIZE) 단위로 진행합니다.
+"""
+
+import json
+import os
+from dataclasses import dataclass
+from datetime import datetime, timezone, timedelta
+from typing import Callable
+
+from firebase_functions import https_fn, scheduler_fn
+from firebase_admin import firestore
+from google.cloud.firestore import FieldFilter
+
+from utils.firestore import get_db
+from utils import bulk_delete
+from utils.tasks import get_tasks_client
+from utils.constants import PROJECT_ID, LOCATION, CASCADE_DELETE_QUEUE_NAME, IS_EMULATOR
+import utils.errors as errors
+from utils import tracing
+from services.economy_service import ECONOMY_COLLECTION, LEDGER_COLLECTION
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+JOBS_COLLECTION = "cascadeDeletes"
+
+# 한 번에 조회/삭제하는 문서 수
+PAGE_SIZE = 300
+# withdraw_user 요청 안에서 바로 삭제하는 최대 문서 수 (나머지는 Cloud Tasks로 처리)
+INLINE_DELETE_LIMIT = 300
+# Cloud Tasks 실행 한 번에 삭제하는 최대 문서 수
+TASK_DELETE_LIMIT = 5000
+# 이 시간 동안 진행이 없는 작업은 스케줄러가 다시 실행
+STALE_JOB_AFTER = timedelta(minutes=15)
+RESUME_BATCH_LIMIT = 20
+
+
+@dataclass(frozen=True)
+class Edge:
+    """루트 ID로 삭제할 문서 집합(쿼리)을 만드는 소유 관계"""
+    name: str
+    query: Callable
+
+
+def _couple_subcollection(name: str) -> Edge:
+    return Edge(name, lambda db, couple_id: db.collection("couples").document(couple_id).collection(name))
+
+
+COUPLE_OWNERSHIP = (
+    Edge("damagos", lambda db, couple_id: db.collection("damagos").where(filter=FieldFilter("coupleID", "==", couple_id))),
+    _couple_subcollection("dailyQuestionAnswers"),
+    _couple_subcollection("balanceGameAnswers"),
+    _couple_subcollection(ECONOMY_COLLECTION),
+    _couple_subcollection(LEDGER_COLLECTION),
+)
+
+OWNERSHIP_GRAPHS = {
+    "couple": COUPLE_OWNERSHIP,
+}
+
+
+def job_ref(db, job_id: str):
+    return db.collection(JOBS_COLLECTION).document(job_id)
+
+
+def start_couple_deletion(batch, db, couple_id: str) -> str:
+    """
+    배치에 커플 연쇄 삭제 작업 문서를 추가하고 작업 ID를 반환합니다.
+    작업 ID가 커플마다 고정이므로 같은 커플을 다시 시작해도 작업은 하나입니다.
+    """
+    job_id = f"couple-{couple_id}"
+    batch.set(job_ref(db, job_id), {
+        "kind": "couple",
+        "rootID": couple_id,
+        "edge": 0,
+        "deleted": 0,
+        "createdAt": firestore.SERVER_TIMESTAMP,
+        "updatedAt": firestore.SERVER_TIMESTAMP
+    })
+    return job_id
+
+
+def run_job(db, job_id: str, max_docs: int) -> bool:
+    """
+    체크포인트부터 최대 max_docs개를 삭제합니다. 모두 삭제했으면 작업 문서를 지우고 True를 반환합니다.
+    삭제하지 못한 문서가 있으면 작업 문서를 남긴 채 BulkDeleteError를 발생시킵니다.
+    """
+    ref = job_ref(db, job_id)
+    snapshot = ref.get()
+    if not snapshot.exists:
+        return True
+
+    job = snapshot.to_dict()
+    edges = OWNERSHIP_GRAPHS[job["kind"]]
+    edge_index = job.get("edge", 0)
+    deleted = 0
+
+    while edge_index < len(edges) and deleted < max_docs:
+        limit = max_docs - deleted
+        try:
+            count = bulk_delete.delete_query(
+                db, edges[edge_index].query(db, job["rootID"]), edges[edge_index].name, PAGE_SIZE, limit
+            )
+        except bulk_delete.BulkDeleteError as e:
+            # 남은 문서가 있으므로 이 소유 관계에 머무르고, 진행만 기록한 뒤 실패로 처리 (다음 실행이 다시 조회하여 삭제)
+            ref.update({
+                "deleted": firestore.Increment(e.deleted),
+                "failed": len(e.failed_paths),
+                "updatedAt": firestore.SERVER_TIMESTAMP
+            })
+            logger.error(
+                "Cascade delete left documents behind", jobID=job_id, edge=edges[edge_index].name,
+                failed=len(e.failed_paths), failedPaths=e.failed_paths[:20]
+            )
+            raise
+        deleted += count
+        if count < limit:
+            # 남은 문서가 없으면 다음 소유 관계로
+            edge_index += 1
+
+        ref.update({
+            "edge": edge_index,
+            "deleted": firestore.Increment(count),
+            "updatedAt": firestore.SERVER_TIMESTAMP
+        })
+
+    done = edge_index >= len(edges)
+    if done:
+        ref.delete()
+    logger.info("Cascade delete progressed", jobID=job_id, deleted=deleted, edge=edge_index, done=done)
+    return done
+
+
+def enqueue_continuation(job_id: str) -> None:
+    """남은 삭제를 Cloud Tasks로 예약합니다. 실패해도 resume_cascade_deletes가 다시 실행합니다."""
+    # Cloud Tasks 클라이언트는 import 비용이 커서 예약 시점에만 불러옵니다.
+    from google.cloud import tasks_v2
+
+    try:
+        client = get_tasks_client()
+        parent = client.queue_path(PROJECT_ID, LOCATION, CASCADE_DELETE_QUEUE_NAME)
+
+        if os.environ.get("FUNCTIONS_EMULATOR") == "true":
+            target_url = f"http://127.0.0.1:5001/{PROJECT_ID}/{LOCATION}/continue_cascade_delete"
+        else:
+            target_url = f"https://{LOCATION}-{PROJECT_ID}.cloudfunctions.net/continue_cascade_delete"
+
+        task = {
+            "http_request": {
+                "http_method": tasks_v2.HttpMethod.POST,
+                "url": target_url,
+                "headers": {"Content-Type": "application/json"},
+                "body": json.dumps({"jobID": job_id}).encode(),
+            },
+        }
+
+        if not IS_EMULATOR:
+            task["http_request"]["oidc_token"] = {
+                "service_account_email": f"{PROJECT_ID}@appspot.gserviceaccount.com"
+            }
+
+        with tracing.span(tracing.TASK):
+            client.create_task(request={"parent": parent, "task": task})
+        logger.info("Cascade delete continuation enqueued", jobID=job_id)
+    except Exception as e:
+        logger.error("Failed to enqueue cascade delete continuation", jobID=job_id, error=str(e))
+
+
+def delete_inline(db, job_id: str) -> bool:
+    """요청 안에서 일부를 바로 삭제하고, 남으면 Cloud Tasks로 넘깁니다."""
+    try:
+        done = run_job(db, job_id, INLINE_DELETE_LIMIT)
+    except Exception as e:
+        logger.error("Inline cascade delete failed", jobID=job_id, error=str(e))
+        done = False
+
+    if not done:
+        enqueue_continuation(job_id)
+    return done
+
+
+def continue_cascade_delete(req: https_fn.Request) -> https_fn.Response:
+    """
+    Cloud Tasks에 의해 호출되어 연쇄 삭제 작업을 이어서 진행합니다.
+    이미 시작된 작업만 진행하며, 끝나지 않았으면 다음 태스크를 예약합니다.
+    """
+    data = req.get_json(silent=True) or req.args
+    job_id = data.get("jobID")
+    if not job_id:
+        return errors.error_response(errors.BadRequest.MISSING_PARAMETERS)
+
+    db = get_db()
+    tracing.step(tracing.WRITE)
+    try:
+        done = run_job(db, job_id, TASK_DELETE_LIMIT)
+    except bulk_delete.BulkDeleteError as e:
+        # 5xx로 응답하여 Cloud Tasks가 재시도하도록 함 (재시도가 끝나도 작업 문서는 resume_cascade_deletes가 이어서 처리)
+        return https_fn.Response(f"Cascade delete incomplete: {e}", status=500)
+
+    if not done:
+        enqueue_continuation(job_id)
+        return https_fn.Response("Cascade delete continues", status=202)
+
+    return https_fn.Response("Cascade delete completed", status=200)
+
+
+def resume_cascade_deletes(event: scheduler_fn.ScheduledEvent) -> None:
+    """
+    주기적으로 실행되어 STALE_JOB_AFTER 동안 진행이 없는 작업을 이어서 삭제합니다.
+    """
+    db = get_db()
+    stale_before = datetime.now(timezone.utc) - STALE_JOB_AFTER
+    jobs = (
+        db.collection(JOBS_COLLECTION)
+        .where(filter=FieldFilter("updatedAt", "<", stale_before))
+        .limit(RESUME_BATCH_LIMIT)
+        .stream()
+    )
+
+    resumed = 0
+    for job in jobs:
+        try:
+            if not run_job(db, job.id, TASK_DELETE_LIMIT):
+                enqueue_continuation(job.id)
+            resumed += 1
+        except Exception as e:
+            logger.error("Failed to resume cascade delete", jobID=job.id, error=str(e))
+
+    logger.info("Cascade deletes resumed", jobs=resumed)
@@ -0,0 +1,201 @@
+"""
+커플 연결 코드 예약 (codes/{code})
+
+코드마다 예약 문서를 두어 발급과 조회를 쿼리 없이 처리합니다.
+- 발급: 유저 생성 트랜잭션에서 예약 문서를 create(없을 때만 생성)로 함께 기록합니다.
+  다른 인스턴스가 같은 코드를 먼저 예약했다면 커밋이 AlreadyExists로 실패하므로 중복 발급이 불가능합니다.
+- 조회: codes/{code} 단건 조회로 uid를 찾습니다. (users.code 필드 인덱스 불필요)
+- 탈퇴: 유저 삭제와 같은 배치에서 예약을 해제합니다.
+
+코드 풀 (codePool/{code})
+- refill_code_pool 스케줄러가 uid 없는 예약과 풀 문서를 배치로 미리 만들어 둡니다.
+- 발급 트랜잭션은 풀에서 하나를 꺼내 예약에 uid를 기록합니다. (코드 공간 점유율과 무관하게 1회 조회)
+- 풀이 비어 있으면 즉석 생성 코드를 예약합니다.
+
+예약 도입 전에 가입한 유저는 rebuild_reservations(scripts/rebuild_code_reservations.py)로 예약을 채웁니다.
+"""
+
+from firebase_functions import scheduler_fn
+from firebase_admin import firestore
+from google.api_core.exceptions import AlreadyExists
+from google.cloud.firestore import FieldFilter
+from google.cloud.firestore_v1.field_path import FieldPath
+from utils.constants import CODE_POOL_TARGET, CODE_POOL_LOW_WATER
+from utils.firestore import get_db
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+CODES_COLLECTION = "codes"
+POOL_COLLECTION = "codePool"
+
+# 혼동되는 문자(0, O, 1, I)를 제외한 32자, 8자리 (약 1조 개)
+CODE_ALPHABET = "23456789ABCDEFGHJKLMNPQRSTUVWXYZ"
+CODE_LENGTH = 8
+
+# 예약 충돌 시 새 코드로 재시도하는 최대 횟수
+MAX_RESERVE_ATTEMPTS = 10
+
+# 재구축 시 한 번에 확인하는 유저 수
+REBUILD_CHUNK_SIZE = 300
+
+# 풀 보충 시 배치 하나에 넣는 코드 수 (코드당 예약 + 풀 문서 2건, 배치당 최대 500건)
+REFILL_BATCH_SIZE = 250
+
+
+def code_ref(db, code: str):
+    return db.collection(CODES_COLLECTION).document(code)
+
+
+def pool_ref(db, code: str):
+    return db.collection(POOL_COLLECTION).document(code)
+
+
+def new_code() -> str:
+    # nanoid는 코드 발급에서만 필요하므로 사용 시점에 import
+    from nanoid import generate
+    return generate(alphabet=CODE_ALPHABET, size=CODE_LENGTH)
+
+
+def reserve(transaction, db, code: str, uid: str) -> None:
+    """트랜잭션에 코드 예약을 추가합니다. 이미 예약된 코드면 커밋이 AlreadyExists로 실패합니다."""
+    transaction.create(code_ref(db, code), {
+        "uid": uid,
+        "createdAt": firestore.SERVER_TIMESTAMP
+    })
+
+
+def claim_pooled(transaction, db, uid: str) -> str | None:
+    """
+    트랜잭션에서 풀의 코드 하나를 꺼내 uid에 배정합니다. 풀이 비어 있으면 None을 반환합니다.
+
+    동시 발급이 같은 문서를 집지 않도록 무작위 코드 이후의 첫 문서를 고르고, 없으면 처음으로 돌아갑니다.
+    그래도 겹치면 트랜잭션 충돌(Aborted)로 재시도됩니다.
+    """
+    pool = db.collection(POOL_COLLECTION).order_by(FieldPath.document_id())
+    start = pool_ref(db, new_code())
+    candidates = list(transaction.get(pool.where(filter=FieldFilter(FieldPath.document_id(), ">=", start)).limit(1)))
+    if not candidates:
+        candidates = list(transaction.get(pool.limit(1)))
+    if not candidates:
+        return None
+
+    code = candidates[0].id
+    transaction.delete(candidates[0].reference)
+    transaction.set(code_ref(db, code), {
+        "uid": uid,
+        "claimedAt": firestore.SERVER_TIMESTAMP
+    }, merge=True)
+    return code
+
+
+def release(batch, db, code: str | None) -> None:
+    """배치에 코드 예약 해제를 추가합니다."""
+    if code:
+        batch.delete(code_ref(db, code))
+
+
+def uid_from_snapshot(snapshot) -> str | None:
+    """예약 문서 스냅샷에서 uid를 꺼냅니다. (예약이 없으면 None)"""
+    if not snapshot.exists:
+        return None
+    return snapshot.to_dict().get("uid")
+
+
+def rebuild_reservations(db, dry_run: bool = False) -> dict:
+    """
+    users 문서의 code로 누락된 예약을 채웁니다. (여러 번 실행해도 안전)
+
+    Returns:
+        { "users": 확인한 유저 수, "created": 새로 만든 예약 수, "existing": 이미 있던 예약 수,
+          "conflicts": [같은 코드를 가진 다른 유저 목록] }
+    """
+    report = {"users": 0, "created": 0, "existing": 0, "conflicts": []}
+
+    def flush(chunk: list) -> None:
+        snapshots = db.get_all([code_ref(db, code) for code in {code for _, code in chunk}])
+        reserved = {snapshot.id: uid_from_snapshot(snapshot) for snapshot in snapshots}
+
+        batch = db.batch()
+        pending = 0
+        for uid, code in chunk:
+            owner = reserved.get(code)
+            if owner is None:
+                batch.set(code_ref(db, code), {"uid": uid, "createdAt": firestore.SERVER_TIMESTAMP})
+                # 같은 청크 안의 중복 코드도 충돌로 판정되도록 기록
+                reserved[code] = uid
+                pending += 1
+            elif owner == uid:
+                report["existing"] += 1
+            else:
+                # 예약 도입 전 쿼리 경합으로 생긴 중복 코드 (수동 처리 필요)
+                report["conflicts"].append({"code": code, "uid": uid, "reservedBy": owner})
+
+        if pending and not dry_run:
+            batch.commit()
+        report["created"] += pending
+
+    chunk = []
+    for user_doc in db.collection("users").select(["code"]).stream():
+        code = user_doc.to_dict().get("code")
+        report["users"] += 1
+        if not code:
+            continue
+        chunk.append((user_doc.id, code))
+        if len(chunk) >= REBUILD_CHUNK_SIZE:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+
+    if report["conflicts"]:
+        logger.warning("Duplicate couple codes found", count=len(report["conflicts"]))
+    return report
+
+
+def refill_pool(db, target: int = CODE_POOL_TARGET) -> dict:
+    """
+    풀을 목표 개수까지 채웁니다. 코드가 이미 예약되어 있으면 해당 배치만 새 코드로 다시 시도합니다.
+
+    Returns:
+        { "before": 보충 전 풀 크기, "added": 추가한 코드 수, "size": 보충 후 풀 크기 }
+    """
+    # 개수가 0이면 클라이언트가 0.0(float)을 돌려주므로 int로 변환
+    before = int(db.collection(POOL_COLLECTION).count().get()[0][0].value)
+    if before < CODE_POOL_LOW_WATER:
+        logger.warning("Code pool below low water mark", size=before, lowWater=CODE_POOL_LOW_WATER)
+
+    added = 0
+    missing = max(target - before, 0)
+    while missing > 0:
+        size = min(missing, REFILL_BATCH_SIZE)
+        for _ in range(MAX_RESERVE_ATTEMPTS):
+            batch = db.batch()
+            codes = {new_code() for _ in range(size)}
+            for code in codes:
+                batch.create(code_ref(db, code), {
+                    "uid": None,
+                    "createdAt": firestore.SERVER_TIMESTAMP
+                })
+                batch.create(pool_ref(db, code), {"createdAt": firestore.SERVER_TIMESTAMP})
+            try:
+                batch.commit()
+                break
+            except AlreadyExists:
+                continue
+        else:
+            logger.error("Failed to refill code pool", size=before + added)
+            break
+        # 배치 안에서 같은 코드가 생성되면 집합이 size보다 작으므로, 실제로 추가한 수만큼만 줄임
+        added += len(codes)
+        missing -= len(codes)
+
+    return {"before": before, "added": added, "size": before + added}
+
+
+def refill_code_pool(event: scheduler_fn.ScheduledEvent) -> None:
+    """
+    주기적으로 실행되어 코드 풀을 목표 개수까지 채웁니다.
+    """
+    report = refill_pool(get_db())
+    logger.info("Code pool refilled", target=CODE_POOL_TARGET, lowWater=CODE_POOL_LOW_WATER, **report)
@@ -1,12 +1,18 @@
 from firebase_functions import https_fn
 from firebase_admin import firestore
 from google.cloud.firestore import FieldFilter
-from utils.firestore import get_db
-from utils.middleware import get_uid_from_request
+from utils.firestore import get_db, get_snapshot, get_all_in_transaction
+from utils.middleware import get_uid_from_request, get_principal_from_request, resolve_couple_id, is_couple_member
 import utils.errors as errors
+import utils.idempotency as idempotency
+import utils.catalog as catalog
+from utils import tracing
 import json
 from datetime import datetime, timezone, timedelta
-from services.push_service import send_push_notification
+from services import economy_service
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 def fetch_history(req: https_fn.Request) -> https_fn.Response:
     """
@@ -16,20 +22,18 @@ def fetch_history(req: https_fn.Request) -> https_fn.Response:
       - limit: int (default: 20)
     """
     try:
-        uid = get_uid_from_request(req)
+        principal = get_principal_from_request(req)
     except ValueError as e:
         return https_fn.Response(str(e), status=401)
-        
+
+    uid = principal.uid
     db = get_db()
     
-    # 1. 사용자 -> 커플 ID 조회
-    user_doc = db.collection("users").document(uid).get()
-    if not user_doc.exists:
-        return errors.error_response(errors.NotFound.USER)
-    
-    couple_id = user_doc.get("coupleID")
-    if not couple_id:
-        return errors.error_response(errors.NotFound.COUPLE)
+    # 1. 사용자 -> 커플 ID 조회 (토큰 claim 우선)
+    tracing.step(tracing.READ)
+    couple_id, error = resolve_couple_id(db, principal)
+    if error:
+        return errors.error_response(error)
         
     # 2. 파라미터 파싱
     history_type = req.args.get("type", "daily_question")
@@ -38,16 +42,24 @@ def fetch_history(req: https_fn.Request) -> https_fn.Response:
     except ValueError:
         limit = 20
         
+    # 3. 커플 정보 조회 (토큰 claim의 커플 ID가 오래된 값일 수 있으므로 구성원인지 확인)
     couple_ref = db.collection("couples").document(couple_id)
+    couple_doc = get_snapshot(couple_ref)
+    if not couple_doc.exists:
+        return errors.error_response(errors.NotFound.COUPLE_DOCUMENT)
+    couple_data = couple_doc.to_dict()
+    if not is_couple_member(couple_data, uid):
+        return errors.error_response(errors.Forbidden.NOT_COUPLE_MEMBER)
+    is_user1 = (couple_data.get("user1UID") == uid)
     
     if history_type == "daily_question":
-        return _fetch_daily_question_history(db, couple_ref, limit, uid)
+        return _fetch_daily_question_history(db, couple_ref, limit, uid, is_user1)
     elif history_type == "balance_game":
-        return _fetch_balance_game_history(db, couple_ref, limit, uid)
+        return _fetch_balance_game_history(db, couple_ref, limit, uid, is_user1)
     else:
         return errors.error_response(errors.BadRequest.INVALID_TYPE)
 
-def _fetch_daily_question_history(db, couple_ref, limit, uid):
+def _fetch_daily_question_history(db, couple_ref, limit, uid, is_user1):
     # 답변 내역 조회 (bothAnswered == True)
     answers_query = (
         couple_ref.collection("dailyQuestionAnswers")
@@ -55,6 +67,7 @@ def _fetch_daily_question_history(db, couple_ref, limit, uid):
         .limit(limit)
     )
     
+    tracing.step(tracing.QUERY)
     answers = list(answers_query.stream())
     
     if not answers:
@@ -74,14 +87,10 @@ def _fetch_daily_question_history(db, couple_ref, limit, uid):
     
     # 질문 ID 수집 및 질문 내용 조회
     question_ids = [doc.id for doc in answers]
-    question_refs = [db.collection("dailyQuestions").document(qid) for qid in question_ids]
     
-    questions = db.get_all(question_refs)
-    questions_map = {q.id: q.to_dict() for q in questions if q.exists}
-    
-    # 커플 정보 조회 (isUser1 판단용)
-    couple_data = couple_ref.get().to_dict()
-    is_user1 = (couple_data.get("user1UID") == uid)
+    tracing.step(tracing.READ)
+    questions = catalog.get_by_ids(db, catalog.DAILY_QUESTIONS, question_ids)
+    questions_map = {qid: entry.data for qid, entry in questions.items()}
     
     result_list = []
     for ans_doc in answers:
@@ -103,7 +112,7 @@ def _fetch_daily_question_history(db, couple_ref, limit, uid):
         
     return https_fn.Response(json.dumps(result_list, default=str), mimetype="application/json")
 
-def _fetch_balance_game_history(db, couple_ref, limit, uid):
+def _fetch_balance_game_history(db, couple_ref, limit, uid, is_user1):
     # 밸런스 게임 답변 내역 조회
     answers_query = (
         couple_ref.collection("balanceGameAnswers")
@@ -111,13 +120,14 @@ def _fetch_balance_game_history(db, couple_ref, limit, uid):
         .limit(limit)
     )
     
+    tracing.step(tracing.QUERY)
     answers = list(answers_query.stream())
     
     if not answers:
         return https_fn.Response(json.dumps([]), mimetype="application/json")
         
     # 게임 ID 수집
-    game_refs = []
+    game_ids = []
     processed_answers = []
     
     for ans_doc in answers:
@@ -128,17 +138,15 @@ def _fetch_balance_game_history(db, couple_ref, limit, uid):
             game_id = ans_doc.id
             
         if game_id:
-            game_refs.append(db.collection("balanceGames").document(game_id))
+            game_ids.append(game_id)
             processed_answers.append({**data, "gameID": game_id})
             
-    if not game_refs:
+    if not game_ids:
         return https_fn.Response(json.dumps([]), mimetype="application/json")
 
-    games = db.get_all(game_refs)
-    games_map = {g.id: g.to_dict() for g in games if g.exists}
-    
-    couple_data = couple_ref.get().to_dict()
-    is_user1 = (couple_data.get("user1UID") == uid)
+    tracing.step(tracing.READ)
+    games = catalog.get_by_ids(db, catalog.BALANCE_GAMES, game_ids)
+    games_map = {game_id: entry.data for game_id, entry in games.items()}
     
     result_list = []
     for ans_data in processed_answers:
@@ -172,22 +180,18 @@ def fetch_daily_question(req: https_fn.Request) -> https_fn.Response:
     사용자의 커플 정보에 기반한 오늘의 질문을 조회합니다.
     """
     try:
-        uid = get_uid_from_request(req)
+        principal = get_principal_from_request(req)
     except ValueError as e:
         return https_fn.Response(str(e), status=401)
 
+    uid = principal.uid
     db = get_db()
     
-    # 1. 사용자 정보 조회 (CoupleID 확인)
-    user_doc = db.collection("users").document(uid).get()
-    if not user_doc.exists:
-        return errors.error_response(errors.NotFound.USER)
-        
-    user_data = user_doc.to_dict()
-    couple_id = user_data.get("coupleID")
-    
-    if not couple_id:
-        return errors.error_response(errors.NotFound.COUPLE)
+    # 1. 커플 ID 조회 (토큰 claim 우선, 없으면 사용자 정보 조회)
+    tracing.step(tracing.READ)
+    couple_id, error = resolve_couple_id(db, principal)
+    if error:
+        return errors.error_response(error)
         
     # 2. 커플 정보 조회 (User1/User2 확인 및 진행 상황 확인)
     couple_doc = db.collection("couples").document(couple_id).get()
@@ -195,6 +199,9 @@ def fetch_daily_question(req: https_fn.Request) -> https_fn.Response:
         return errors.error_response(errors.NotFound.COUPLE_DOCUMENT)
         
     couple_data = couple_doc.to_dict()
+    # 토큰 claim의 커플 ID가 오래된 값일 수 있으므로 구성원인지 확인 (진행도를 기록하는 경로)
+    if not is_couple_member(couple_data, uid):
+        return errors.error_response(errors.Forbidden.NOT_COUPLE_MEMBER)
     is_user1 = (couple_data.get("user1UID") == uid)
     
     # 현재 진행해야 할 질문 순서 계산
@@ -212,8 +219,7 @@ def fetch_daily_question(req: https_fn.Request) -> https_fn.Response:
         
         # [Fallback] 통계에 시간이 누락되었다면, 실제 마지막 답변 문서를 조회하여 시간 확인
         if not last_answered:
-             last_q_query = db.collection("dailyQuestions").where("order", "==", total_answered).limit(1).stream()
-             last_q_doc = next(last_q_query, None)
+             last_q_doc = catalog.get_by_order(db, catalog.DAILY_QUESTIONS, total_answered)
              
              if last_q_doc:
                  last_ans_doc = db.collection("couples").document(couple_id).collection("dailyQuestionAnswers").document(last_q_doc.id).get()
@@ -242,14 +248,13 @@ def fetch_daily_question(req: https_fn.Request) -> https_fn.Response:
     
     # 3. 질문 조회 (Order 기반)
     # 질문이 존재하는지 확인
-    questions_query = db.collection("dailyQuestions").where("order", "==", target_order).limit(1).stream()
-    question_doc = next(questions_query, None)
+    question_doc = catalog.get_by_order(db, catalog.DAILY_QUESTIONS, target_order)
     
     if not question_doc:
         # 더 이상 질문이 없거나 아직 질문이 생성되지 않음
         return errors.error_response(errors.NotFound.NO_MORE_QUESTIONS)
         
-    question_data = question_doc.to_dict()
+    question_data = question_doc.data
     question_id = question_doc.id
     question_content = question_data.get("questionText", "")
     
@@ -321,9 +326,26 @@ def submit_daily_question(req: https_fn.Request) -> https_fn.Response:
 
     db = get_db()
     
+    # --- [Idempotency] ---
+    tracing.step(tracing.READ)
+    idem_ref = idempotency.get_idempotency_ref(db, req, uid, "submit_daily_question")
+    stored = idempotency.find_stored_response(idem_ref)
+    if stored:
+        return stored.to_response()
+
+    # 질문 정보 조회 (유효성 검사 및 content 확보, 카탈로그 캐시 사용)
+    question_entry = catalog.get_by_id(db, catalog.DAILY_QUESTIONS, question_id)
+    if question_entry is None:
+        return errors.error_response(errors.NotFound.QUESTION)
+    question_content = question_entry.data.get("questionText")
+
     # 트랜잭션 함수 정의
     @firestore.transactional
     def submit_answer_in_transaction(transaction):
+        stored = idempotency.find_stored_response(idem_ref, transaction)
+        if stored:
+            return stored
+
         # 1. 사용자 및 커플 정보 조회
         user_ref = db.collection("users").document(uid)
         user_snapshot = next(transaction.get(user_ref))
@@ -338,24 +360,24 @@ def submit_daily_question(req: https_fn.Request) -> https_fn.Response:
             raise ValueError(errors.NotFound.COUPLE.message)
             
         couple_ref = db.collection("couples").document(couple_id)
-        couple_snapshot = next(transaction.get(couple_ref))
+        # 커밋 후 알림 전송(send_push_notification)이 읽을 파트너 문서를 커플 문서와 함께 읽어 memo에 둠
+        # 질문 문서도 함께 읽어 존재를 확인 (카탈로그 캐시 이후 삭제된 질문에 답변이 쌓이지 않도록)
+        partner_uid = user_data.get("partnerUID")
+        partner_refs = [db.collection("users").document(partner_uid)] if partner_uid else []
+        question_ref = db.collection(catalog.DAILY_QUESTIONS).document(question_id)
+        couple_snapshot, question_snapshot, *_ = get_all_in_transaction(
+            transaction, [couple_ref, question_ref, *partner_refs]
+        )
         
         if not couple_snapshot.exists:
             raise ValueError(errors.NotFound.COUPLE_DOCUMENT.message)
+        if not question_snapshot.exists:
+            raise ValueError(errors.NotFound.QUESTION.message)
             
         couple_data = couple_snapshot.to_dict()
         
         is_user1 = (couple_data.get("user1UID") == uid)
         
-        # 2. 질문 정보 조회 (유효성 검사 및 content 확보)
-        question_ref = db.collection("dailyQuestions").document(question_id)
-        question_snapshot = next(transaction.get(question_ref))
-        
-        if not question_snapshot.exists:
-            raise ValueError(errors.NotFound.QUESTION.message)
-            
-        question_content = question_snapshot.get("questionText")
-        
         # 3. 답변 저장 위치 참조
         answer_ref = couple_ref.collection("dailyQuestionAnswers").document(question_id)
         answer_snapshot = next(transaction.get(answer_ref))
@@ -389,11 +411,9 @@ def submit_daily_question(req: https_fn.Request) -> https_fn.Response:
             current_stats = couple_data.get("dailyQuestionStats", {})
             current_total = current_stats.get("totalAnswered", 0)
             
-            transaction.update(couple_ref, {
+            economy_service.grant(transaction, couple_ref, coin=30, food=3, reason="daily_question", uid=uid, couple_updates={
                 "dailyQuestionStats.totalAnswered": current_total + 1,
-                "dailyQuestionStats.lastAnsweredAt": now,
-                "totalCoin": firestore.Increment(30),
-                "foodCount": firestore.Increment(3)
+                "dailyQuestionStats.lastAnsweredAt": now
             })
         
         # 답변 문서 저장 (set with merge)
@@ -418,14 +438,19 @@ def submit_daily_question(req: https_fn.Request) -> https_fn.Response:
                         last_at = last_at.replace(tzinfo=timezone.utc)
                     final_last_answered_at = last_at.isoformat(timespec="seconds").replace("+00:00", "Z")
 
-        return {
+        response = {
             "questionID": question_id,
             "questionContent": question_content,
             "user1Answer": user1_answer,
             "user2Answer": user2_answer,
             "bothAnswered": is_both_answered,
             "lastAnsweredAt": final_last_answered_at,
-            "isUser1": is_user1,
+            "isUser1": is_user1
+        }
+        idempotency.store_response(transaction, idem_ref, response)
+
+        return {
+            **response,
             "notificationData": {
                 "partnerUID": user_data.get("partnerUID"),
                 "nickname": user_data.get("nickname", "상대방"),
@@ -434,9 +459,13 @@ def submit_daily_question(req: https_fn.Request) -> https_fn.Response:
         }
 
     try:
+        tracing.step(tracing.TXN)
         result = submit_answer_in_transaction(db.transaction())
+        if isinstance(result, idempotency.StoredResponse):
+            return result.to_response()
         
         # --- [Notification] ---
+        tracing.step(tracing.PUSH)
         # 트랜잭션 성공 후 알림 전송 (재시도로 인한 중복 발송 방지)
         notif_info = result.pop("notificationData", None)
         if notif_info and notif_info.get("partnerUID"):
@@ -452,6 +481,7 @@ def submit_daily_question(req: https_fn.Request) -> https_fn.Response:
                     title = "상대방이 오늘의 질문에 답변했어요!"
                     body = f"{nickname}님이 답변을 남겼습니다! 답변하고 결과를 확인해보세요."
                 
+                from services.push_service import send_push_notification
                 send_push_notification(
                     target_uid=partner_uid,
                     title=title,
@@ -462,7 +492,7 @@ def submit_daily_question(req: https_fn.Request) -> https_fn.Response:
                     }
                 )
             except Exception as e:
-                print(f"Error sending notification: {e}")
+                logger.error("Error sending notification", error=str(e))
 
         return https_fn.Response(json.dumps(result), mimetype="application/json")
     except ValueError as e:
@@ -475,22 +505,18 @@ def fetch_balance_game(req: https_fn.Request) -> https_fn.Response:
     사용자의 커플 정보에 기반한 오늘의 밸런스 게임을 조회합니다.
     """
     try:
-        uid = get_uid_from_request(req)
+        principal = get_principal_from_request(req)
     except ValueError as e:
         return https_fn.Response(str(e), status=401)
 
+    uid = principal.uid
     db = get_db()
     
-    # 1. 사용자 정보 조회
-    user_doc = db.collection("users").document(uid).get()
-    if not user_doc.exists:
-        return errors.error_response(errors.NotFound.USER)
-        
-    user_data = user_doc.to_dict()
-    couple_id = user_data.get("coupleID")
-    
-    if not couple_id:
-        return errors.error_response(errors.NotFound.COUPLE)
+    # 1. 커플 ID 조회 (토큰 claim 우선, 없으면 사용자 정보 조회)
+    tracing.step(tracing.READ)
+    couple_id, error = resolve_couple_id(db, principal)
+    if error:
+        return errors.error_response(error)
         
     # 2. 커플 정보 및 진행도 조회
     couple_doc = db.collection("couples").document(couple_id).get()
@@ -498,6 +524,9 @@ def fetch_balance_game(req: https_fn.Request) -> https_fn.Response:
         return errors.error_response(errors.NotFound.COUPLE_DOCUMENT)
         
     couple_data = couple_doc.to_dict()
+    # 토큰 claim의 커플 ID가 오래된 값일 수 있으므로 구성원인지 확인 (진행도를 기록하는 경로)
+    if not is_couple_member(couple_data, uid):
+        return errors.error_response(errors.Forbidden.NOT_COUPLE_MEMBER)
     is_user1 = (couple_data.get("user1UID") == uid)
     
     stats = couple_data.get("balanceGameStats", {})
@@ -513,13 +542,12 @@ def fetch_balance_game(req: https_fn.Request) -> https_fn.Response:
             target_order = total_answered
     
     # 3. 질문 조회 (balanceGames 컬렉션)
-    games_query = db.collection("balanceGames").where("order", "==", target_order).limit(1).stream()
-    game_doc = next(games_query, None)
+    game_doc = catalog.get_by_order(db, catalog.BALANCE_GAMES, target_order)
     
     if not game_doc:
         return errors.error_response(errors.NotFound.NO_MORE_BALANCE_GAMES)
         
-    game_data = game_doc.to_dict()
+    game_data = game_doc.data
     game_id = game_doc.id
     
     # 4. 답변 내역 조회
@@ -582,8 +610,19 @@ def submit_balance_game(req: https_fn.Request) -> https_fn.Response:
 
     db = get_db()
 
+    # --- [Idempotency] ---
+    tracing.step(tracing.READ)
+    idem_ref = idempotency.get_idempotency_ref(db, req, uid, "submit_balance_game")
+    stored = idempotency.find_stored_response(idem_ref)
+    if stored:
+        return stored.to_response()
+
     @firestore.transactional
     def submit_in_transaction(transaction):
+        stored = idempotency.find_stored_response(idem_ref, transaction)
+        if stored:
+            return stored
+
         user_ref = db.collection("users").document(uid)
         user_snapshot = next(transaction.get(user_ref))
         if not user_snapshot.exists: raise ValueError(errors.NotFound.USER.message)
@@ -593,7 +632,10 @@ def submit_balance_game(req: https_fn.Request) -> https_fn.Response:
         if not couple_id: raise ValueError(errors.NotFound.COUPLE.message)
             
         couple_ref = db.collection("couples").document(couple_id)
-        couple_snapshot = next(transaction.get(couple_ref))
+        # 커밋 후 알림 전송(send_push_notification)이 읽을 파트너 문서를 커플 문서와 함께 읽어 memo에 둠
+        partner_uid = user_data.get("partnerUID")
+        partner_refs = [db.collection("users").document(partner_uid)] if partner_uid else []
+        couple_snapshot = get_all_in_transaction(transaction, [couple_ref, *partner_refs])[0]
         if not couple_snapshot.exists: raise ValueError(errors.NotFound.COUPLE.message)
         
         couple_data = couple_snapshot.to_dict()
@@ -623,11 +665,9 @@ def submit_balance_game(req: https_fn.Request) -> https_fn.Response:
             current_stats = couple_data.get("balanceGameStats", {})
             current_total = current_stats.get("totalAnswered", 0)
             
-            transaction.update(couple_ref, {
+            economy_service.grant(transaction, couple_ref, coin=20, food=2, reason="balance_game", uid=uid, couple_updates={
                 "balanceGameStats.totalAnswered": current_total + 1,
-                "balanceGameStats.lastAnsweredAt": now,
-                "totalCoin": firestore.Increment(20),
-                "foodCount": firestore.Increment(2)
+                "balanceGameStats.lastAnsweredAt": now
             })
             
         transaction.set(answer_ref, answer_update, merge=True)
@@ -646,12 +686,17 @@ def submit_balance_game(req: https_fn.Request) -> https_fn.Response:
                             last_at = last_at.replace(tzinfo=timezone.utc)
                         final_last_answered_at = last_at.isoformat(timespec="seconds").replace("+00:00", "Z")
 
-        return {
+        response = {
             "gameID": game_id,
             "myChoice": choice,
             "opponentChoice": opponent_choice,
             "bothAnswered": is_both_answered,
-            "lastAnsweredAt": final_last_answered_at,
+            "lastAnsweredAt": final_last_answered_at
+        }
+        idempotency.store_response(transaction, idem_ref, response)
+
+        return {
+            **response,
             "notificationData": {
                 "partnerUID": user_data.get("partnerUID"),
                 "nickname": user_data.get("nickname", "상대방"),
@@ -660,9 +705,13 @@ def submit_balance_game(req: https_fn.Request) -> https_fn.Response:
         }
 
     try:
+        tracing.step(tracing.TXN)
         result = submit_in_transaction(db.transaction())
+        if isinstance(result, idempotency.StoredResponse):
+            return result.to_response()
         
         # --- [Notification] ---
+        tracing.step(tracing.PUSH)
         notif_info = result.pop("notificationData", None)
         if notif_info and notif_info.get("partnerUID"):
             try:
@@ -677,6 +726,7 @@ def submit_balance_game(req: https_fn.Request) -> https_fn.Response:
                     title = "상대방이 밸런스 게임에 답변했어요!"
                     body = f"{nickname}님이 선택을 마쳤습니다. 선택하고 결과를 확인해보세요!"
                 
+                from services.push_service import send_push_notification
                 send_push_notification(
                     target_uid=partner_uid,
                     title=title,
@@ -687,7 +737,7 @@ def submit_balance_game(req: https_fn.Request) -> https_fn.Response:
                     }
                 )
             except Exception as e:
-                print(f"Error sending notification: {e}")
+                logger.error("Error sending notification", error=str(e))
 
         return https_fn.Response(json.dumps(result), mimetype="application/json")
     except ValueError as e:
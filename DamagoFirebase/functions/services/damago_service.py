@@ -1,16 +1,15 @@
 import os
 import json
 from datetime import datetime, timezone, timedelta
-import random
+from functools import lru_cache
 from firebase_functions import https_fn
 from firebase_admin import firestore
 import google.cloud.firestore
 from google.cloud.firestore import FieldFilter
-from google.cloud import tasks_v2
-from google.protobuf import timestamp_pb2
 
-from utils.firestore import get_db
-from utils.middleware import get_uid_from_request
+from utils.firestore import get_db, get_snapshot, get_snapshots
+from utils.tasks import get_tasks_client
+from utils.middleware import get_uid_from_request, get_principal_from_request, resolve_couple_id, is_couple_member
 from utils.constants import (
     get_required_exp, 
     get_level_up_reward, 
@@ -20,17 +19,32 @@ from utils.constants import (
     LOCATION, 
     QUEUE_NAME, 
     HUNGER_DELAY_SECONDS,
-    AVAILABLE_DAMAGO_TYPES
+    DRAW_COST,
+    MAX_DRAW_COUNT,
+    DUPLICATE_DRAW_FOOD,
+    AVAILABLE_DAMAGO_TYPES,
+    BASIC_DAMAGO_TYPES,
+    get_default_damago_name
 )
 import utils.errors as errors
-from services.push_service import update_live_activity_internal
+import utils.idempotency as idempotency
+from utils import tracing, gacha, request_context
+from services import economy_service, home_service, leaderboard_service
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 도감에 표시하는 다마고 필드 (get_all 프로젝션)
+COLLECTION_DISPLAY_FIELDS = ["damagoName", "level", "currentExp", "maxExp"]
+# 도감 조회 시 다마고 문서와 같은 get_all로 읽는 커플 문서 필드 (구성원 확인용)
+COUPLE_MEMBER_FIELDS = ["user1UID", "user2UID"]
 
 def pick_random_damago() -> str:
     """
     뽑기 로직을 수행하여 다마고 타입을 반환합니다.
-    현재는 모든 타입에 대해 균등한 확률(Uniform Distribution)을 가집니다.
+    등급별 가중치(utils/gacha.py)를 따르며, 천장 카운터는 반영하지 않습니다.
     """
-    return random.choice(AVAILABLE_DAMAGO_TYPES)
+    return gacha.draw(1)[0][0]
 
 def feed(req: https_fn.Request) -> https_fn.Response:
     """
@@ -54,8 +68,22 @@ def feed(req: https_fn.Request) -> https_fn.Response:
     db = get_db()
     damago_ref = db.collection("damagos").document(damago_id)
 
+    # --- [Idempotency] ---
+    tracing.step(tracing.READ)
+    # 재시도된 요청이면 저장된 응답을 그대로 반환 (트랜잭션/푸시/태스크 재실행 방지)
+    idem_ref = idempotency.get_idempotency_ref(db, req, uid, "feed")
+    stored = idempotency.find_stored_response(idem_ref)
+    if stored:
+        return stored.to_response()
+
+    leveled_up = {}
+
     @google.cloud.firestore.transactional
     def run_feed_transaction(transaction, doc_ref):
+        stored = idempotency.find_stored_response(idem_ref, transaction)
+        if stored:
+            return stored
+
         snapshot = doc_ref.get(transaction=transaction)
         
         if not snapshot.exists:
@@ -85,13 +113,6 @@ def feed(req: https_fn.Request) -> https_fn.Response:
         if uid != user1 and uid != user2:
              raise PermissionError("You are not the owner of this damago")
 
-        # --- [Food Consumption Logic] ---
-        current_food_count = couple_data.get("foodCount", 0)
-        if current_food_count <= 0:
-            raise ValueError("Not enough food")
-        
-        new_food_count = current_food_count - 1
-
         # --- [Experience Logic] ---
         new_exp = current_exp + FEED_EXP
         new_level = current_level
@@ -111,6 +132,13 @@ def feed(req: https_fn.Request) -> https_fn.Response:
             for lv in range(current_level + 1, new_level + 1):
                 reward_coin += get_level_up_reward(lv)
 
+        # --- [Food Consumption & Reward] ---
+        # 먹이 1개 차감 및 레벨업 코인 보상 (잔액 부족 시 ValueError)
+        balance = economy_service.change(
+            transaction, couple_ref, couple_data, coin=reward_coin, food=-1,
+            reason="feed", uid=uid
+        )
+
         # --- [DB Update] ---
         update_data = {
             "level": new_level,
@@ -123,34 +151,50 @@ def feed(req: https_fn.Request) -> https_fn.Response:
         }
         transaction.update(doc_ref, update_data)
 
-        # 커플 문서 업데이트 (먹이 차감 및 코인 보상)
-        couple_updates = {"foodCount": new_food_count}
-        if reward_coin > 0:
-            couple_updates["totalCoin"] = firestore.Increment(reward_coin)
-            
-        transaction.update(couple_ref, couple_updates)
+        # 활성 다마고라면 홈 화면 읽기 모델도 갱신
+        if couple_data.get("damagoID") == doc_ref.id:
+            home_service.update_active_damago(transaction, db, couple_id, doc_ref.id, {**data, **update_data})
 
-        return {
+        # 레벨업했다면 트랜잭션 이후 리더보드에 반영
+        leveled_up.clear()
+        if new_level > current_level:
+            leveled_up.update(data, level=new_level)
+
+        result = {
             "level": new_level,
             "currentExp": new_exp,
             "maxExp": get_required_exp(new_level),
             "isLevelUp": new_level > current_level,
             "isHungry": False,
             "rewardCoin": reward_coin,
-            "foodCount": new_food_count,
+            "foodCount": balance.food,
             "user1UID": user1,
             "user2UID": user2,
             "damagoType": data.get("damagoType", "Bunny"),
             "statusMessage": update_data["statusMessage"],
             "damagoName": data.get("damagoName", "이름 없는 다마고")
         }
+        idempotency.store_response(transaction, idem_ref, result)
+        return result
 
     try:
+        tracing.step(tracing.TXN)
         result = run_feed_transaction(db.transaction(), damago_ref)
         if result is None:
              return errors.error_response(errors.NotFound.DAMAGO)
+        if isinstance(result, idempotency.StoredResponse):
+            return result.to_response()
         
+        # --- [Leaderboard] ---
+        if leveled_up:
+            tracing.step(tracing.WRITE)
+            try:
+                leaderboard_service.submit(db, leaderboard_service.make_entry(damago_id, leveled_up))
+            except Exception as lb_error:
+                logger.error("Failed to update leaderboard", damagoID=damago_id, error=str(lb_error))
+
         # --- [Live Activity Update] ---
+        tracing.step(tracing.PUSH)
         # 밥 주기 성공 시 파트너에게만 Live Activity 업데이트 전송 (본인은 로컬에서 직접 업데이트)
         try:
             partner_uid = result.get("user2UID") if uid == result.get("user1UID") else result.get("user1UID")
@@ -171,14 +215,20 @@ def feed(req: https_fn.Request) -> https_fn.Response:
             }
 
             if partner_uid:
+                from services.push_service import update_live_activity_internal
                 update_live_activity_internal(partner_uid, content_state, attributes)
                     
         except Exception as la_error:
-            print(f"Failed to update Live Activity for partner: {la_error}")
+            logger.error("Failed to update Live Activity for partner", error=str(la_error))
 
         # --- [Cloud Task Scheduling] ---
+        tracing.step(tracing.TASK)
         try:
-            client = tasks_v2.CloudTasksClient()
+            # Cloud Tasks 클라이언트는 import 비용이 커서 예약 시점에만 불러옵니다.
+            from google.cloud import tasks_v2
+            from google.protobuf import timestamp_pb2
+
+            client = get_tasks_client()
             parent = client.queue_path(PROJECT_ID, LOCATION, QUEUE_NAME)
             
             # 태스크 페이로드 설정
@@ -220,10 +270,10 @@ def feed(req: https_fn.Request) -> https_fn.Response:
                 }
 
             client.create_task(request={"parent": parent, "task": task})
-            print(f"Cloud Task scheduled for damago {damago_id} at {d}")
+            logger.debug("Cloud Task scheduled", damagoID=damago_id, scheduleTime=d.isoformat())
 
         except Exception as task_error:
-            print(f"Failed to schedule Cloud Task: {task_error}")
+            logger.error("Failed to schedule Cloud Task", damagoID=damago_id, error=str(task_error))
             # 태스크 실패가 전체 요청 실패로 이어지지는 않도록 함 (DB는 이미 업데이트됨)
 
         return https_fn.Response(
@@ -252,7 +302,8 @@ def make_hungry(req: https_fn.Request) -> https_fn.Response:
     db = get_db()
     damago_ref = db.collection("damagos").document(damago_id)
     
-    doc = damago_ref.get()
+    tracing.step(tracing.READ)
+    doc = get_snapshot(damago_ref)
     if not doc.exists:
         return errors.error_response(errors.NotFound.DAMAGO)
         
@@ -279,55 +330,69 @@ def make_hungry(req: https_fn.Request) -> https_fn.Response:
         # 아직 시간이 덜 지났으면(즉, 그 사이에 밥을 또 줬으면) 무시
         # 약간의 오차(예: 5초)를 두어 실행 지연으로 인한 실패 방지
         if elapsed < (delay_seconds - 5):
-            print(f"Skipping make_hungry: Fed recently ({elapsed}s ago)")
+            logger.info("Skipping make_hungry: fed recently", damagoID=damago_id, elapsedSeconds=elapsed)
             return https_fn.Response("Skipped: Fed recently", status=200)
 
     # 상태 업데이트
     new_status = "배고파요... 밥 주세요! 꼬르륵"
-    damago_ref.update({
+    hungry_updates = {
         "isHungry": True,
         "statusMessage": new_status,
         "lastUpdatedAt": firestore.SERVER_TIMESTAMP
-    })
-    
+    }
+
     couple_id = damago_data.get("coupleID")
-    if couple_id:
+    couple_ref = db.collection("couples").document(couple_id) if couple_id else None
+    # 알림 대상 및 활성 다마고 확인용 (쓰기 전에 한 번만 조회)
+    couple_doc = get_snapshot(couple_ref) if couple_ref else None
+
+    tracing.step(tracing.WRITE)
+    batch = db.batch()
+    batch.update(damago_ref, hungry_updates)
+
+    if couple_ref:
         # --- [Food Reward] ---
         # 배고픔 상태가 될 때 먹이 1개 지급
-        couple_ref = db.collection("couples").document(couple_id)
-        couple_ref.update({
-            "foodCount": firestore.Increment(1)
-        })
+        economy_service.grant(batch, couple_ref, food=1, reason="hungry")
 
-        # --- [Notify Users] ---
-        # 해당 다마고를 보고 있는 커플 유저들을 찾아 알림 전송
-        couple_doc = couple_ref.get()
-        if couple_doc.exists:
-            couple_data = couple_doc.to_dict()
-            # 변경된 필드명 사용 (user1UDID -> user1UID)
-            users = [couple_data.get("user1UID"), couple_data.get("user2UID")]
-            
-            last_fed_at = damago_data.get("lastFedAt")
-            last_fed_at_str = last_fed_at.isoformat(timespec='seconds') if last_fed_at else None
-            
-            # Live Activity Payload
-            content_state = {
-                "damagoType": damago_data.get("damagoType", "Bunny"),
-                "isHungry": True,
-                "statusMessage": new_status,
-                "level": damago_data.get("level"),
-                "currentExp": damago_data.get("currentExp"),
-                "maxExp": damago_data.get("maxExp"),
-                "lastFedAt": last_fed_at_str
-            }
-            
-            attributes = {
-                "damagoName": damago_data.get("damagoName", "이름 없는 다마고")
-            }
-            
-            for uid in users:
-                if uid:
-                    update_live_activity_internal(uid, content_state, attributes)
+        if couple_doc.exists and couple_doc.to_dict().get("damagoID") == damago_id:
+            home_service.update_active_damago(batch, db, couple_id, damago_id, {**damago_data, **hungry_updates})
+
+    batch.commit()
+
+    # --- [Notify Users] ---
+    tracing.step(tracing.PUSH)
+    # 해당 다마고를 보고 있는 커플 유저들을 찾아 알림 전송
+    if couple_doc and couple_doc.exists:
+        couple_data = couple_doc.to_dict()
+        # 변경된 필드명 사용 (user1UDID -> user1UID)
+        users = [couple_data.get("user1UID"), couple_data.get("user2UID")]
+        
+        last_fed_at = damago_data.get("lastFedAt")
+        last_fed_at_str = last_fed_at.isoformat(timespec='seconds') if last_fed_at else None
+        
+        # Live Activity Payload
+        content_state = {
+            "damagoType": damago_data.get("damagoType", "Bunny"),
+            "isHungry": True,
+            "statusMessage": new_status,
+            "level": damago_data.get("level"),
+            "currentExp": damago_data.get("currentExp"),
+            "maxExp": damago_data.get("maxExp"),
+            "lastFedAt": last_fed_at_str
+        }
+        
+        attributes = {
+            "damagoName": damago_data.get("damagoName", "이름 없는 다마고")
+        }
+        
+        from services.push_service import update_live_activity_internal
+
+        # 두 사용자 문서를 한 번에 읽어 memo에 두면 아래 update_live_activity_internal은 조회하지 않음
+        get_snapshots(db, [db.collection("users").document(uid) for uid in users if uid])
+        for uid in users:
+            if uid:
+                update_live_activity_internal(uid, content_state, attributes)
 
     return https_fn.Response("Made hungry and notified", status=200)
 
@@ -335,61 +400,98 @@ def make_hungry(req: https_fn.Request) -> https_fn.Response:
 def create_damago(req: https_fn.Request) -> https_fn.Response:
     """
     새로운 다마고를 생성합니다 (뽑기).
-    서버에서 랜덤으로 다마고를 결정하며, 커플의 코인을 100 차감합니다.
+    서버에서 등급별 가중치와 천장(utils/gacha.py)에 따라 다마고를 결정하며, 커플의 코인을 회당 DRAW_COST 차감합니다.
+    count(기본 1, 최대 MAX_DRAW_COUNT)를 주면 여러 번을 한 트랜잭션에서 뽑고 코인을 한 번에 차감합니다.
+
+    Response:
+        count == 1: { "id", "totalCoin", "damagoType", "isNew" }
+        count > 1: { "totalCoin", "results": [{ "id", "damagoType", "isNew" }, ...] }
     """
     try:
-        uid = get_uid_from_request(req)
+        principal = get_principal_from_request(req)
     except ValueError as e:
         return https_fn.Response(str(e), status=401)
-        
+
+    data = req.get_json(silent=True) or req.args
+    try:
+        count = int(data.get("count", 1))
+    except (TypeError, ValueError):
+        return errors.error_response(errors.BadRequest.INVALID_DRAW_COUNT)
+    if not 1 <= count <= MAX_DRAW_COUNT:
+        return errors.error_response(errors.BadRequest.INVALID_DRAW_COUNT)
+    if count > 1:
+        # 뽑은 횟수만큼 다마고 문서 조회/생성이 늘어나므로 별도 예산과 비교
+        request_context.set_budget_route("create_damago_multi")
+
+    uid = principal.uid
     db = get_db()
+
+    # --- [Idempotency] --- (재시도 요청은 커플 조회 없이 기록된 응답을 반환)
+    tracing.step(tracing.READ)
+    idem_ref = idempotency.get_idempotency_ref(db, req, uid, "create_damago")
+    stored = idempotency.find_stored_response(idem_ref)
+    if stored:
+        return stored.to_response()
     
-    # 1. 유저 및 커플 ID 조회 (Transaction 밖에서 조회하여 쿼리 기반 마련)
-    user_doc = db.collection("users").document(uid).get()
-    if not user_doc.exists:
-        return errors.error_response(errors.NotFound.USER)
-        
-    couple_id = user_doc.to_dict().get("coupleID")
-    if not couple_id:
+    # 1. 커플 ID 조회 (토큰 claim 우선, 없으면 Transaction 밖에서 유저 조회)
+    couple_id, error = resolve_couple_id(db, principal)
+    if error == errors.NotFound.COUPLE:
         return errors.error_response(errors.BadRequest.USER_HAS_NO_COUPLE)
-        
-    # 2. 랜덤 선택 (전체 목록에서 무작위 선택)
-    target_type = pick_random_damago()
+    if error:
+        return errors.error_response(error)
     
     couple_ref = db.collection("couples").document(couple_id)
     
     @google.cloud.firestore.transactional
     def run_create_transaction(transaction):
+        stored = idempotency.find_stored_response(idem_ref, transaction)
+        if stored:
+            return stored
+
         couple_snapshot = couple_ref.get(transaction=transaction)
         if not couple_snapshot.exists:
             raise ValueError("Couple not found")
             
         couple_data = couple_snapshot.to_dict()
-        current_coin = couple_data.get("totalCoin", 0)
-        
-        # 중복 확인 (ID 기반)
-        new_damago_id = f"{couple_id}_{target_type}"
-        new_damago_ref = db.collection("damagos").document(new_damago_id)
-        existing_damago = new_damago_ref.get(transaction=transaction)
-
-        # 코인 확인
-        draw_cost = 100
-        if current_coin < draw_cost:
-            raise ValueError("Not enough coins")
-            
-        is_new = not existing_damago.exists
-        
-        # 코인 차감 (공통)
-        new_coin = current_coin - draw_cost
-        couple_updates = {"totalCoin": new_coin}
+        # 토큰 claim의 커플 ID가 오래된 값일 수 있으므로 구성원인지 확인
+        if not is_couple_member(couple_data, uid):
+            raise PermissionError(errors.Forbidden.NOT_COUPLE_MEMBER.message)
+
+        # 2. 뽑기 (천장 카운터는 커플 문서에 저장, 트랜잭션 재시도 시 다시 뽑음)
+        target_types, pity = gacha.draw(count, couple_data.get("gachaPity"))
+
+        # 중복 확인 (ID 기반, 뽑힌 타입의 문서를 한 번에 조회)
+        damago_refs = {
+            target_type: db.collection("damagos").document(f"{couple_id}_{target_type}")
+            for target_type in dict.fromkeys(target_types)
+        }
+        owned = {snapshot.id for snapshot in transaction.get_all(list(damago_refs.values())) if snapshot.exists}
+
+        draws = []
+        for target_type in target_types:
+            new_damago_id = damago_refs[target_type].id
+            is_new = new_damago_id not in owned
+            owned.add(new_damago_id)
+            draws.append({"id": new_damago_id, "damagoType": target_type, "isNew": is_new})
+
+        # 코인 차감 (공통), 중복 캐릭터면 먹이 지급 (잔액 부족 시 ValueError)
+        duplicates = sum(1 for draw in draws if not draw["isNew"])
+        balance = economy_service.change(
+            transaction, couple_ref, couple_data,
+            coin=-DRAW_COST * count, food=DUPLICATE_DRAW_FOOD * duplicates,
+            reason="draw", uid=uid,
+            couple_updates={"gachaPity": pity} if pity else None
+        )
         
-        if is_new:
+        for draw in draws:
+            if not draw["isNew"]:
+                continue
             # 신규 캐릭터: 다마고 생성
             new_damago_data = {
-                "id": new_damago_id,
+                "id": draw["id"],
                 "coupleID": couple_id,
                 "damagoName": "이름 없는 다마고",
-                "damagoType": target_type,
+                "damagoType": draw["damagoType"],
                 "isHungry": False,
                 "statusMessage": "안녕! 만나서 반가워!",
                 "level": 1,
@@ -401,25 +503,114 @@ def create_damago(req: https_fn.Request) -> https_fn.Response:
                 "totalPlayTime": 0,
                 "lastActiveAt": firestore.SERVER_TIMESTAMP
             }
-            transaction.set(new_damago_ref, new_damago_data)
-        else:
-            # 중복 캐릭터: 먹이 5개 지급
-            couple_updates["foodCount"] = firestore.Increment(5)
-        
-        # 커플 문서 업데이트
-        transaction.update(couple_ref, couple_updates)
+            transaction.set(damago_refs[draw["damagoType"]], new_damago_data)
         
-        return {
-            "id": new_damago_id,
-            "totalCoin": new_coin,
-            "damagoType": target_type,
-            "isNew": is_new
-        }
+        if count == 1:
+            result = {**draws[0], "totalCoin": balance.coin}
+        else:
+            result = {"totalCoin": balance.coin, "results": draws}
+        idempotency.store_response(transaction, idem_ref, result)
+        return result
 
     try:
+        tracing.step(tracing.TXN)
         result = run_create_transaction(db.transaction())
+        if isinstance(result, idempotency.StoredResponse):
+            return result.to_response()
         return https_fn.Response(json.dumps(result), mimetype="application/json")
     except ValueError as ve:
         return https_fn.Response(str(ve), status=400)
+    except PermissionError:
+        return errors.error_response(errors.Forbidden.NOT_COUPLE_MEMBER)
     except Exception as e:
         return https_fn.Response(f"Transaction failed: {str(e)}", status=500)
+
+@lru_cache(maxsize=1)
+def damago_type_catalog() -> tuple:
+    """
+    도감의 타입 정보 (배포 중에는 바뀌지 않으므로 인스턴스당 한 번 생성)
+    AVAILABLE_DAMAGO_TYPES 순서를 따릅니다.
+    """
+    rates = gacha.drop_rates()
+    return tuple(
+        {
+            "damagoType": damago_type,
+            "defaultName": get_default_damago_name(damago_type),
+            "rarity": gacha.rarity_of(damago_type),
+            "dropRate": round(rates.get(damago_type, 0.0), 4),
+            "isBasic": damago_type in BASIC_DAMAGO_TYPES
+        }
+        for damago_type in AVAILABLE_DAMAGO_TYPES
+    )
+
+def fetch_damago_collection(req: https_fn.Request) -> https_fn.Response:
+    """
+    커플의 다마고 도감을 반환합니다.
+    다마고 문서 ID가 {coupleID}_{damagoType}이므로 모든 타입의 문서를 get_all 한 번으로 조회합니다. (표시 필드만)
+    토큰 claim의 커플 ID가 오래된 값일 수 있으므로 같은 get_all로 커플 문서를 읽어 구성원인지 확인합니다.
+
+    Returns:
+        JSON Response: {
+            "ownedCount": int, "totalCount": int,
+            "damagos": [{ "damagoType", "defaultName", "rarity", "dropRate", "isBasic", "isOwned",
+                          "id"?, "damagoName"?, "level"?, "currentExp"?, "maxExp"? }, ...]
+        }
+    """
+    try:
+        principal = get_principal_from_request(req)
+    except ValueError as e:
+        return https_fn.Response(str(e), status=401)
+
+    db = get_db()
+
+    # --- [Couple] 커플 ID 조회 (토큰 claim 우선) ---
+    tracing.step(tracing.READ)
+    couple_id, error = resolve_couple_id(db, principal)
+    if error == errors.NotFound.COUPLE:
+        return errors.error_response(errors.BadRequest.USER_HAS_NO_COUPLE)
+    if error:
+        return errors.error_response(error)
+
+    # --- [Fetch] 커플 문서(구성원 확인) + 모든 타입의 다마고 문서 조회 ---
+    catalog = damago_type_catalog()
+    couple_ref = db.collection("couples").document(couple_id)
+    refs = [db.collection("damagos").document(f"{couple_id}_{entry['damagoType']}") for entry in catalog]
+    snapshots = {
+        snapshot.reference.path: snapshot
+        for snapshot in db.get_all([couple_ref, *refs], field_paths=COLLECTION_DISPLAY_FIELDS + COUPLE_MEMBER_FIELDS)
+    }
+
+    couple_snapshot = snapshots[couple_ref.path]
+    if not couple_snapshot.exists:
+        return errors.error_response(errors.NotFound.COUPLE_DOCUMENT)
+    if not is_couple_member(couple_snapshot.to_dict(), principal.uid):
+        return errors.error_response(errors.Forbidden.NOT_COUPLE_MEMBER)
+
+    owned = {
+        ref.id: snapshots[ref.path].to_dict()
+        for ref in refs
+        if snapshots[ref.path].exists
+    }
+
+    # --- [Response] ---
+    damagos = []
+    for entry, ref in zip(catalog, refs):
+        damago_data = owned.get(ref.id)
+        if damago_data is None:
+            damagos.append({**entry, "isOwned": False})
+            continue
+        damagos.append({
+            **entry,
+            "isOwned": True,
+            "id": ref.id,
+            **{field: damago_data.get(field) for field in COLLECTION_DISPLAY_FIELDS}
+        })
+
+    return https_fn.Response(
+        json.dumps({
+            "ownedCount": len(owned),
+            "totalCount": len(catalog),
+            "damagos": damagos
+        }),
+        mimetype="application/json"
+    )
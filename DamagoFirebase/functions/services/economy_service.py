@@ -0,0 +1,438 @@
+"""
+커플 재화(코인/먹이) 관리 서비스
+
+couples/{coupleID}의 totalCoin/foodCount를 직접 수정하던 로직을 한 곳으로 모읍니다.
+ECONOMY_SHARD_COUNT > 0 이면 커플 문서를 쓰지 않는 지급분(make_hungry 등)을
+couples/{coupleID}/economy/shard-{n} 문서들에 나누어 기록하고, 주기적으로 커플 문서에 합산(fold)합니다.
+잔액 = 커플 문서의 totalCoin/foodCount(합산 잔액) + 모든 샤드의 변동분 합계
+차감은 합산 잔액에서 바로 이루어지며, 모자랄 때만 샤드를 읽어 그 자리에서 합산합니다.
+샤드는 기본으로 꺼져 있습니다. (utils/constants.py 참고: 합산 전 지급분은 클라이언트와 응답 잔액에 보이지 않음)
+
+모든 지급/차감은 같은 트랜잭션에서 couples/{coupleID}/economyLedger에
+추가 전용(append-only) 항목으로도 기록되며, compact_economy_ledger가 주기적으로
+economy/ledgerCheckpoint 잔액에 합산합니다.
+원장은 감사(audit) 기록일 뿐 쓰기 경로가 아닙니다. 잔액의 기준은 위의 커플 문서 + 샤드이며,
+원장은 잔액을 계산하는 데 쓰이지 않고 대조(recompute_balance)에만 사용됩니다.
+"""
+
+import random
+from dataclasses import dataclass
+from firebase_functions import scheduler_fn
+from firebase_admin import firestore
+import google.cloud.firestore
+from google.cloud.firestore import FieldFilter
+
+from utils.firestore import get_db, get_snapshots
+from utils.constants import ECONOMY_SHARD_COUNT
+import utils.errors as errors
+from services import home_service
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+ECONOMY_COLLECTION = "economy"
+LEDGER_COLLECTION = "economyLedger"
+LEDGER_CHECKPOINT_ID = "ledgerCheckpoint"
+FOLD_BATCH_LIMIT = 300
+COMPACT_BATCH_LIMIT = 400
+
+
+@dataclass(frozen=True)
+class Balance:
+    coin: int
+    food: int
+
+
+def is_sharded() -> bool:
+    return ECONOMY_SHARD_COUNT > 0
+
+
+def shard_refs(couple_ref) -> list:
+    return [
+        couple_ref.collection(ECONOMY_COLLECTION).document(f"shard-{index}")
+        for index in range(ECONOMY_SHARD_COUNT)
+    ]
+
+
+def _sum_shards(snapshots) -> Balance:
+    coin = 0
+    food = 0
+    for snapshot in snapshots:
+        if snapshot.exists:
+            data = snapshot.to_dict()
+            coin += data.get("totalCoin", 0)
+            food += data.get("foodCount", 0)
+    return Balance(coin, food)
+
+
+def read_balance(couple_ref, couple_data: dict, transaction=None) -> Balance:
+    """
+    커플의 현재 잔액을 계산합니다.
+    샤드를 사용하지 않으면 이미 읽어 둔 couple_data만으로 계산하므로 추가 조회가 없습니다.
+    """
+    coin = couple_data.get("totalCoin", 0)
+    food = couple_data.get("foodCount", 0)
+
+    if not is_sharded():
+        return Balance(coin, food)
+
+    if transaction is not None:
+        snapshots = transaction.get_all(shard_refs(couple_ref))
+    else:
+        snapshots = get_snapshots(get_db(), shard_refs(couple_ref))
+    delta = _sum_shards(snapshots)
+
+    return Balance(coin + delta.coin, food + delta.food)
+
+
+def ledger_checkpoint_ref(couple_ref):
+    return couple_ref.collection(ECONOMY_COLLECTION).document(LEDGER_CHECKPOINT_ID)
+
+
+def _append_ledger(writer, couple_ref, coin: int, food: int, reason: str, uid: str | None) -> None:
+    """
+    변동 내역을 새 문서로 추가합니다. 항상 새 문서이므로 다른 쓰기와 충돌하지 않습니다.
+    잔액 변경(Increment)과 별도로 남기는 감사 기록입니다.
+    """
+    entry_ref = couple_ref.collection(LEDGER_COLLECTION).document()
+    writer.set(entry_ref, {
+        "coupleID": couple_ref.id,
+        "coin": coin,
+        "food": food,
+        "reason": reason,
+        "uid": uid,
+        "compacted": False,
+        "createdAt": firestore.SERVER_TIMESTAMP
+    })
+
+
+def _increments(coin: int, food: int) -> dict:
+    updates = {}
+    if coin:
+        updates["totalCoin"] = firestore.Increment(coin)
+    if food:
+        updates["foodCount"] = firestore.Increment(food)
+    return updates
+
+
+def _write_home_balance(writer, couple_ref, balance: Balance) -> None:
+    """홈 문서의 잔액을 합산 잔액으로 맞춥니다."""
+    home_service.update_home(writer, get_db(), couple_ref.id, {
+        "totalCoin": balance.coin,
+        "foodCount": balance.food
+    })
+
+
+def _write_couple_delta(writer, couple_ref, coin: int, food: int, couple_updates: dict | None,
+                        folded_balance: Balance | None = None) -> None:
+    """
+    커플 문서(합산 잔액)에 변동분을 기록합니다.
+    홈 문서는 합산 잔액을 따라가므로 여기서만 갱신합니다. (샤드 지급은 합산 시 반영)
+    folded_balance: 샤드를 합산한 경우 홈 문서에 그대로 쓸 잔액
+    """
+    updates = _increments(coin, food)
+    if folded_balance is not None:
+        _write_home_balance(writer, couple_ref, folded_balance)
+    elif updates:
+        # 홈 화면 읽기 모델에도 같은 변동분을 반영 (조회 없는 Increment)
+        home_service.update_home(writer, get_db(), couple_ref.id, dict(updates))
+
+    # 같은 커밋에서 커플 문서를 두 번 쓰지 않도록 함께 기록
+    updates.update(couple_updates or {})
+    if updates:
+        writer.update(couple_ref, updates)
+
+
+def _write_shard_delta(writer, couple_ref, coin: int, food: int) -> None:
+    updates = _increments(coin, food)
+    if not updates:
+        return
+
+    # 읽지 않고 쓰기만 하므로(blind write) 두 사용자의 보상이 서로 충돌하지 않음
+    shard_ref = random.choice(shard_refs(couple_ref))
+    updates["pending"] = True
+    writer.set(shard_ref, updates, merge=True)
+
+
+def _write_delta(writer, couple_ref, coin: int, food: int, couple_updates: dict | None) -> None:
+    if not is_sharded() or couple_updates:
+        # 어차피 커플 문서를 쓰는 경우 샤드로 나눠도 경합이 줄지 않으므로 커플 문서에 바로 합산
+        _write_couple_delta(writer, couple_ref, coin, food, couple_updates)
+        return
+
+    # 홈 문서는 합산(fold_shards) 때 반영하므로 여기서는 쓰지 않음 (모든 지급이 한 문서로 몰리지 않도록)
+    _write_shard_delta(writer, couple_ref, coin, food)
+
+
+def grant(writer, couple_ref, coin: int = 0, food: int = 0, *, reason: str,
+          uid: str | None = None, couple_updates: dict | None = None) -> None:
+    """
+    코인/먹이를 지급합니다. 잔액 확인이 필요 없으므로 조회 없이 기록만 합니다.
+    writer는 transaction 또는 batch이며, couple_updates는 커플 문서에 함께 쓸 필드입니다.
+    """
+    _write_delta(writer, couple_ref, coin, food, couple_updates)
+    if coin or food:
+        _append_ledger(writer, couple_ref, coin, food, reason, uid)
+
+
+def _read_shards_for_fold(transaction, couple_ref) -> tuple[Balance, list]:
+    """트랜잭션 안에서 샤드를 읽어 (변동분 합계, 변동분이 남은 샤드 스냅샷)을 반환합니다."""
+    snapshots = [snapshot for snapshot in transaction.get_all(shard_refs(couple_ref)) if snapshot.exists]
+    return _sum_shards(snapshots), snapshots
+
+
+def _reset_shards(writer, snapshots) -> None:
+    for snapshot in snapshots:
+        writer.set(snapshot.reference, {
+            "totalCoin": 0,
+            "foodCount": 0,
+            "pending": False
+        })
+
+
+def change(transaction, couple_ref, couple_data: dict, coin: int = 0, food: int = 0, *,
+           reason: str, uid: str | None = None, couple_updates: dict | None = None) -> Balance:
+    """
+    잔액을 확인한 뒤 코인/먹이를 변경합니다 (음수면 차감).
+    트랜잭션의 쓰기 전에 호출해야 합니다.
+
+    차감은 트랜잭션에서 이미 읽은 커플 문서의 합산 잔액으로 확인하므로 샤드를 읽지 않습니다.
+    (샤드를 읽으면 그 커플의 모든 동시 지급과 충돌하므로)
+    합산 잔액이 모자랄 때만 샤드를 읽어 같은 트랜잭션에서 커플 문서로 합산한 뒤 다시 확인합니다.
+    지급만 있으면 grant와 같이 기록합니다.
+
+    Returns:
+        변경 후 잔액 (아직 합산되지 않은 다른 샤드 변동분 제외)
+
+    Raises:
+        ValueError: 차감 후 잔액이 음수가 되는 경우
+    """
+    balance = Balance(couple_data.get("totalCoin", 0), couple_data.get("foodCount", 0))
+    spend = Balance(min(coin, 0), min(food, 0))
+
+    folded_shards = None
+    if is_sharded() and (balance.coin + spend.coin < 0 or balance.food + spend.food < 0):
+        delta, folded_shards = _read_shards_for_fold(transaction, couple_ref)
+        balance = Balance(balance.coin + delta.coin, balance.food + delta.food)
+
+    new_balance = Balance(balance.coin + coin, balance.food + food)
+    if coin < 0 and new_balance.coin < 0:
+        raise ValueError(errors.BadRequest.NOT_ENOUGH_COINS.message)
+    if food < 0 and new_balance.food < 0:
+        raise ValueError(errors.BadRequest.NOT_ENOUGH_FOOD.message)
+
+    if folded_shards is not None:
+        # 샤드를 합산했으므로 지급분까지 커플 문서에 한 번에 기록
+        _write_couple_delta(
+            transaction, couple_ref,
+            new_balance.coin - couple_data.get("totalCoin", 0),
+            new_balance.food - couple_data.get("foodCount", 0),
+            couple_updates,
+            folded_balance=new_balance
+        )
+        _reset_shards(transaction, folded_shards)
+    elif spend.coin or spend.food:
+        # 차감은 커플 문서에 기록하므로 지급분도 같은 쓰기에 합산
+        _write_couple_delta(transaction, couple_ref, coin, food, couple_updates)
+    else:
+        _write_delta(transaction, couple_ref, coin, food, couple_updates)
+
+    if coin or food:
+        _append_ledger(transaction, couple_ref, coin, food, reason, uid)
+    return new_balance
+
+
+def fold_shards(db, couple_ref) -> Balance | None:
+    """샤드에 쌓인 변동분을 커플 문서와 홈 문서에 합산하고 샤드를 비웁니다."""
+
+    @google.cloud.firestore.transactional
+    def run_fold_transaction(transaction):
+        couple_snapshot = couple_ref.get(transaction=transaction)
+        refs = shard_refs(couple_ref)
+        snapshots = list(transaction.get_all(refs))
+
+        if not couple_snapshot.exists:
+            # 탈퇴 등으로 커플이 사라졌다면 남은 샤드만 정리
+            for snapshot in snapshots:
+                if snapshot.exists:
+                    transaction.delete(snapshot.reference)
+            return None
+
+        couple_data = couple_snapshot.to_dict()
+        delta = _sum_shards(snapshots)
+        balance = Balance(
+            couple_data.get("totalCoin", 0) + delta.coin,
+            couple_data.get("foodCount", 0) + delta.food
+        )
+
+        transaction.update(couple_ref, {
+            "totalCoin": balance.coin,
+            "foodCount": balance.food
+        })
+        _write_home_balance(transaction, couple_ref, balance)
+        _reset_shards(transaction, [snapshot for snapshot in snapshots if snapshot.exists])
+        return balance
+
+    return run_fold_transaction(db.transaction())
+
+
+def fold_economy_shards(event: scheduler_fn.ScheduledEvent) -> None:
+    """
+    주기적으로 실행되어 변동분이 남아 있는 커플의 샤드를 커플 문서에 합산합니다.
+    """
+    if not is_sharded():
+        return
+
+    db = get_db()
+    pending_shards = (
+        db.collection_group(ECONOMY_COLLECTION)
+        .where(filter=FieldFilter("pending", "==", True))
+        .limit(FOLD_BATCH_LIMIT)
+        .stream()
+    )
+
+    couple_refs = {}
+    for shard in pending_shards:
+        couple_ref = shard.reference.parent.parent
+        couple_refs[couple_ref.path] = couple_ref
+
+    folded = 0
+    for couple_ref in couple_refs.values():
+        try:
+            fold_shards(db, couple_ref)
+            folded += 1
+        except Exception as e:
+            logger.error("Failed to fold economy shards", coupleID=couple_ref.id, error=str(e))
+
+    logger.info("Economy shards folded", couples=folded)
+
+
+def _sum_entries(entries) -> Balance:
+    coin = 0
+    food = 0
+    for entry in entries:
+        data = entry.to_dict()
+        coin += data.get("coin", 0)
+        food += data.get("food", 0)
+    return Balance(coin, food)
+
+
+def compact_ledger(db, couple_ref, entry_refs: list) -> Balance | None:
+    """
+    아직 합산되지 않은 원장 항목들을 체크포인트 잔액에 합산하고 compacted로 표시합니다.
+    체크포인트가 없다면 (원장 도입 이전 잔액) = 현재 잔액 - 미합산 항목 으로 시작값을 계산합니다.
+    """
+
+    @google.cloud.firestore.transactional
+    def run_compact_transaction(transaction):
+        checkpoint_ref = ledger_checkpoint_ref(couple_ref)
+        checkpoint = checkpoint_ref.get(transaction=transaction)
+        entries = [
+            entry for entry in transaction.get_all(entry_refs)
+            if entry.exists and not entry.get("compacted")
+        ]
+        if not entries:
+            return None
+
+        delta = _sum_entries(entries)
+
+        if checkpoint.exists:
+            checkpoint_data = checkpoint.to_dict()
+            base = Balance(checkpoint_data.get("totalCoin", 0), checkpoint_data.get("foodCount", 0))
+            entry_count = checkpoint_data.get("entryCount", 0)
+        else:
+            couple_snapshot = couple_ref.get(transaction=transaction)
+            if not couple_snapshot.exists:
+                return None
+            live = read_balance(couple_ref, couple_snapshot.to_dict(), transaction)
+            pending = _sum_entries(
+                entry for entry in transaction.get(
+                    couple_ref.collection(LEDGER_COLLECTION)
+                    .where(filter=FieldFilter("compacted", "==", False))
+                )
+            )
+            base = Balance(live.coin - pending.coin, live.food - pending.food)
+            entry_count = 0
+
+        balance = Balance(base.coin + delta.coin, base.food + delta.food)
+        last_entry_at = max(
+            (entry.get("createdAt") for entry in entries if entry.get("createdAt")),
+            default=None
+        )
+
+        transaction.set(checkpoint_ref, {
+            "totalCoin": balance.coin,
+            "foodCount": balance.food,
+            "entryCount": entry_count + len(entries),
+            "lastEntryAt": last_entry_at,
+            "compactedAt": firestore.SERVER_TIMESTAMP
+        })
+        for entry in entries:
+            transaction.update(entry.reference, {"compacted": True})
+        return balance
+
+    return run_compact_transaction(db.transaction())
+
+
+def compact_economy_ledger(event: scheduler_fn.ScheduledEvent) -> None:
+    """
+    주기적으로 실행되어 미합산 원장 항목을 커플별 체크포인트 잔액에 합산합니다.
+    """
+    db = get_db()
+    entries = (
+        db.collection_group(LEDGER_COLLECTION)
+        .where(filter=FieldFilter("compacted", "==", False))
+        .limit(COMPACT_BATCH_LIMIT)
+        .stream()
+    )
+
+    grouped = {}
+    for entry in entries:
+        couple_ref = entry.reference.parent.parent
+        grouped.setdefault(couple_ref.path, (couple_ref, []))[1].append(entry.reference)
+
+    compacted = 0
+    for couple_ref, entry_refs in grouped.values():
+        try:
+            compact_ledger(db, couple_ref, entry_refs)
+            compacted += len(entry_refs)
+        except Exception as e:
+            logger.error("Failed to compact economy ledger", coupleID=couple_ref.id, error=str(e))
+
+    logger.info("Economy ledger compacted", entries=compacted, couples=len(grouped))
+
+
+def recompute_balance(db, couple_id: str) -> dict:
+    """
+    원장만으로 잔액을 다시 계산하여 실제 잔액과 비교합니다. (분쟁/감사용, 커플 문서는 쓰지 않음)
+
+    Returns:
+        { "ledger": 체크포인트 + 미합산 항목, "live": 현재 잔액, "matches": bool }
+    """
+    couple_ref = db.collection("couples").document(couple_id)
+    couple_snapshot = couple_ref.get()
+    if not couple_snapshot.exists:
+        raise ValueError(errors.NotFound.COUPLE_DOCUMENT.message)
+
+    checkpoint = ledger_checkpoint_ref(couple_ref).get()
+    checkpoint_data = checkpoint.to_dict() if checkpoint.exists else {}
+    pending = _sum_entries(
+        couple_ref.collection(LEDGER_COLLECTION)
+        .where(filter=FieldFilter("compacted", "==", False))
+        .select(["coin", "food"])
+        .stream()
+    )
+
+    ledger = Balance(
+        checkpoint_data.get("totalCoin", 0) + pending.coin,
+        checkpoint_data.get("foodCount", 0) + pending.food
+    )
+    live = read_balance(couple_ref, couple_snapshot.to_dict())
+
+    return {
+        "coupleID": couple_id,
+        "hasCheckpoint": checkpoint.exists,
+        "ledger": {"totalCoin": ledger.coin, "foodCount": ledger.food},
+        "live": {"totalCoin": live.coin, "foodCount": live.food},
+        "matches": ledger == live
+    }
@@ -0,0 +1,152 @@
+"""
+홈 화면 읽기 모델 (coupleHome/{coupleID})
+
+홈 화면에 필요한 활성 다마고 상태, 코인/먹이, 닉네임, 기념일을 한 문서에 모아 둡니다.
+users -> damagos -> couples 순차 조회 대신, 커플만 알면 한 번의 조회로 홈 화면을 그릴 수 있습니다.
+해당 값을 바꾸는 모든 쓰기 경로(feed, make_hungry, update_user_info, 재화 변경)가 함께 갱신합니다.
+코인/먹이는 커플 문서의 합산 잔액을 따르며, 재화 샤드에 쌓인 지급분은 합산(fold_shards) 때 반영됩니다.
+"""
+
+from firebase_admin import firestore
+import google.cloud.firestore
+from utils import tracing
+
+HOME_COLLECTION = "coupleHome"
+
+# 홈 화면에 표시되는 다마고 필드
+DAMAGO_STATUS_FIELDS = [
+    "damagoName",
+    "damagoType",
+    "level",
+    "currentExp",
+    "maxExp",
+    "isHungry",
+    "statusMessage",
+    "lastFedAt",
+    "totalPlayTime",
+    "lastActiveAt",
+]
+
+
+def home_ref(db, couple_id: str):
+    return db.collection(HOME_COLLECTION).document(couple_id)
+
+
+def damago_fields(damago_data: dict) -> dict:
+    """다마고 문서에서 홈 화면에 필요한 필드만 추립니다."""
+    return {field: damago_data.get(field) for field in DAMAGO_STATUS_FIELDS if field in damago_data}
+
+
+def format_damago_status(damago_data: dict) -> dict:
+    """다마고 데이터를 get_user_info 응답의 damagoStatus 형식으로 변환합니다."""
+    last_fed_at = damago_data.get("lastFedAt")
+    last_fed_at_str = last_fed_at.isoformat(timespec='seconds') if last_fed_at else None
+
+    last_active_at = damago_data.get("lastActiveAt")
+    last_active_at_str = last_active_at.isoformat(timespec='seconds') if last_active_at else None
+
+    return {
+        "damagoName": damago_data.get("damagoName", "이름 없는 다마고"),
+        "damagoType": damago_data.get("damagoType", "Bunny"),
+        "level": damago_data.get("level", 1),
+        "currentExp": damago_data.get("currentExp", 0),
+        "maxExp": damago_data.get("maxExp", 20),
+        "isHungry": damago_data.get("isHungry", False),
+        "statusMessage": damago_data.get("statusMessage", "행복해요!"),
+        "lastFedAt": last_fed_at_str,
+        "totalPlayTime": damago_data.get("totalPlayTime", 0),
+        "lastActiveAt": last_active_at_str
+    }
+
+
+def update_home(writer, db, couple_id: str, fields: dict) -> None:
+    """
+    홈 문서의 일부 필드를 갱신합니다. (중첩 맵은 merge됩니다)
+    writer는 transaction, batch 또는 None(즉시 기록)입니다.
+    """
+    ref = home_ref(db, couple_id)
+    data = {**fields, "updatedAt": firestore.SERVER_TIMESTAMP}
+    if writer is None:
+        ref.set(data, merge=True)
+    else:
+        writer.set(ref, data, merge=True)
+
+
+def update_active_damago(writer, db, couple_id: str, damago_id: str, damago_data: dict) -> None:
+    """활성 다마고의 상태를 홈 문서에 반영합니다."""
+    update_home(writer, db, couple_id, {
+        "damagoID": damago_id,
+        "damago": damago_fields(damago_data)
+    })
+
+
+def build_home(db, couple_id: str) -> dict | None:
+    """
+    원본 문서(couples, damagos, users, 재화)로부터 홈 문서를 다시 만듭니다.
+    홈 문서가 없던 기존 커플을 위한 지연 생성(backfill)에 사용됩니다.
+    """
+    from services import economy_service
+
+    couple_ref = db.collection("couples").document(couple_id)
+    ref = home_ref(db, couple_id)
+
+    @google.cloud.firestore.transactional
+    def run_build_transaction(transaction):
+        couple_snapshot = couple_ref.get(transaction=transaction)
+        if not couple_snapshot.exists:
+            return None
+
+        couple_data = couple_snapshot.to_dict()
+        balance = economy_service.read_balance(couple_ref, couple_data, transaction)
+
+        user_uids = [uid for uid in [couple_data.get("user1UID"), couple_data.get("user2UID")] if uid]
+        user_refs = [db.collection("users").document(uid) for uid in user_uids]
+        damago_id = couple_data.get("damagoID")
+        refs = list(user_refs)
+        if damago_id:
+            refs.append(db.collection("damagos").document(damago_id))
+
+        snapshots = {snapshot.reference.path: snapshot for snapshot in transaction.get_all(refs)}
+
+        nicknames = {}
+        for user_ref in user_refs:
+            user_snapshot = snapshots.get(user_ref.path)
+            if user_snapshot and user_snapshot.exists:
+                nicknames[user_ref.id] = user_snapshot.to_dict().get("nickname")
+
+        damago = None
+        if damago_id:
+            damago_snapshot = snapshots.get(db.collection("damagos").document(damago_id).path)
+            if damago_snapshot and damago_snapshot.exists:
+                damago = damago_fields(damago_snapshot.to_dict())
+
+        home = {
+            "coupleID": couple_id,
+            "user1UID": couple_data.get("user1UID"),
+            "user2UID": couple_data.get("user2UID"),
+            "damagoID": damago_id,
+            "damago": damago,
+            "totalCoin": balance.coin,
+            "foodCount": balance.food,
+            "nicknames": nicknames,
+            "anniversaryDate": couple_data.get("anniversaryDate"),
+            "initialized": True,
+            "updatedAt": firestore.SERVER_TIMESTAMP
+        }
+        transaction.set(ref, home)
+        return home
+
+    # 홈 문서가 없던 커플의 첫 조회에서만 발생하므로 별도 단계로 기록
+    with tracing.span("home_build"):
+        return run_build_transaction(db.transaction())
+
+
+def get_home(db, couple_id: str) -> dict | None:
+    """홈 문서를 조회합니다. 아직 만들어지지 않았다면 원본으로부터 생성합니다."""
+    snapshot = home_ref(db, couple_id).get()
+    if snapshot.exists:
+        home = snapshot.to_dict()
+        if home.get("initialized"):
+            return home
+
+    return build_home(db, couple_id)
@@ -0,0 +1,394 @@
+"""
+다마고 리더보드 (leaderboards/damagoLevel)
+
+damagos 전체를 level로 정렬해 조회하는 대신, 상위 항목만 한 문서에 유지합니다.
+- damagos: 레벨이 높은 다마고 순위
+- couples: 커플마다 가장 레벨이 높은 다마고 하나로 매긴 순위
+같은 레벨이면 먼저 도달한 쪽이 앞섭니다. (reachedAt)
+
+보여주는 순위는 LEADERBOARD_SIZE개이고, 탈퇴로 빠진 자리를 채우도록 LEADERBOARD_BUFFER개를 더 저장합니다.
+목록이 잘린 적이 있으면(complete가 아니면) 마지막 항목보다 낮은 다마고가 목록 밖에 있을 수 있으므로
+그보다 낮은 항목은 받지 않고, 탈퇴로 LEADERBOARD_SIZE개보다 줄어들면 needsRebuild를 표시해
+스케줄러(refresh_leaderboard)가 전체를 다시 계산합니다. (rebuild)
+
+레벨이나 이름을 바꾸는 경로가 갱신합니다.
+- feed: 레벨업한 다마고가 컷(마지막 순위 레벨) 이상일 때만 submit (인스턴스 캐시로 컷을 확인하므로 대부분 조회 없음)
+- update_user_info: 순위에 있는 다마고의 이름 변경 반영 (rename_damago)
+- withdraw_user: 탈퇴한 커플 항목 제거 (remove_couple, 다시 계산은 스케줄러)
+- XP 재조정 마이그레이션: 전체를 다시 계산 (rebuild)
+
+리더보드 문서는 rebuild로 처음 만듭니다. 도입 시(또는 문서를 잃었을 때) 한 번 실행합니다.
+    python scripts/rebuild_leaderboard.py
+
+조회(fetch_leaderboard)는 문서 한 번이며, 인스턴스마다 LEADERBOARD_CACHE_SECONDS 동안 캐시합니다.
+"""
+
+import json
+import time
+from datetime import datetime, timezone
+
+from firebase_functions import https_fn, scheduler_fn
+from firebase_admin import firestore
+import google.cloud.firestore
+
+from utils.firestore import get_db
+from utils.middleware import get_principal_from_request, resolve_couple_id
+import utils.errors as errors
+from utils import tracing
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+LEADERBOARD_COLLECTION = "leaderboards"
+DAMAGO_BOARD_ID = "damagoLevel"
+LEADERBOARD_SIZE = 100
+# 탈퇴로 빠진 자리를 채우기 위해 LEADERBOARD_SIZE보다 더 저장하는 항목 수
+LEADERBOARD_BUFFER = 20
+STORED_SIZE = LEADERBOARD_SIZE + LEADERBOARD_BUFFER
+LEADERBOARD_CACHE_SECONDS = 30
+
+BOARD_LISTS = ("damagos", "couples")
+
+# 항목에 저장하는 다마고 필드 (rebuild 프로젝션)
+ENTRY_FIELDS = ["coupleID", "damagoType", "damagoName", "level"]
+
+_cache: dict = {"loadedAt": 0.0, "board": None}
+
+
+def board_ref(db):
+    return db.collection(LEADERBOARD_COLLECTION).document(DAMAGO_BOARD_ID)
+
+
+def make_entry(damago_id: str, damago_data: dict, reached_at: datetime | None = None) -> dict:
+    return {
+        "damagoID": damago_id,
+        "coupleID": damago_data.get("coupleID"),
+        "damagoType": damago_data.get("damagoType"),
+        "damagoName": damago_data.get("damagoName"),
+        "level": int(damago_data.get("level") or 1),
+        # 배열 안에는 SERVER_TIMESTAMP를 쓸 수 없으므로 서버 시각을 직접 기록
+        "reachedAt": reached_at or datetime.now(timezone.utc)
+    }
+
+
+def _rank_key(entry: dict):
+    return (-entry["level"], entry["reachedAt"])
+
+
+def _complete_key(name: str) -> str:
+    # 목록이 잘린 적이 없는지 (damagosComplete, couplesComplete)
+    return f"{name}Complete"
+
+
+def _merge(entries: list, complete: bool, entry: dict, unique_field: str) -> tuple[list, bool]:
+    """
+    unique_field마다 가장 높은 항목 하나만 남기고 상위 STORED_SIZE개와 complete 여부를 반환합니다.
+    complete가 아니면 마지막 항목보다 낮은 새 항목은 목록 밖의 다마고와 순서를 알 수 없으므로 받지 않습니다.
+    """
+    existing = next((e for e in entries if e[unique_field] == entry[unique_field]), None)
+    if existing is not None:
+        same_damago = existing["damagoID"] == entry["damagoID"]
+        if not same_damago and _rank_key(existing) <= _rank_key(entry):
+            return entries, complete
+        entries = [e for e in entries if e is not existing]
+    elif not complete and entries and _rank_key(entry) > _rank_key(entries[-1]):
+        return entries, complete
+
+    merged = sorted([*entries, entry], key=_rank_key)
+    return merged[:STORED_SIZE], complete and len(merged) <= STORED_SIZE
+
+
+def _cutoff(entries: list, complete: bool) -> int:
+    """새 항목이 들어오려면 넘어야 하는 레벨 (잘린 적 없이 자리가 남아 있으면 0)"""
+    if complete and len(entries) < STORED_SIZE:
+        return 0
+    return entries[-1]["level"] if entries else 0
+
+
+def _read_lists(stored: dict) -> dict:
+    """{ damagos, couples, damagosComplete, couplesComplete } (complete 필드가 없던 문서는 잘리지 않았다고 봄)"""
+    lists = {}
+    for name in BOARD_LISTS:
+        entries = stored.get(name, [])
+        lists[name] = entries
+        lists[_complete_key(name)] = stored.get(_complete_key(name), len(entries) < LEADERBOARD_SIZE)
+    return lists
+
+
+def _remember(board: dict) -> None:
+    _cache["board"] = board
+    _cache["loadedAt"] = time.monotonic()
+
+
+def load_board(db, force: bool = False) -> dict:
+    """리더보드 문서를 반환합니다. (인스턴스 캐시, 없으면 빈 리더보드)"""
+    cached = _cache["board"]
+    if cached is not None and not force and time.monotonic() - _cache["loadedAt"] < LEADERBOARD_CACHE_SECONDS:
+        return cached
+
+    snapshot = board_ref(db).get()
+    stored = snapshot.to_dict() if snapshot.exists else {}
+    board = {**_read_lists(stored), "updatedAt": stored.get("updatedAt")}
+    _remember(board)
+    return board
+
+
+def submit(db, entry: dict) -> bool:
+    """
+    레벨이 오른 다마고를 리더보드에 반영합니다. 순위가 바뀌었으면 True를 반환합니다.
+    캐시된 컷보다 낮으면 조회 없이 건너뜁니다.
+    (컷은 레벨업으로만 오르므로 오래된 캐시는 더 많이 통과시킬 뿐이며, 다른 인스턴스의 탈퇴로 빈 자리는 캐시 만료 후 채워집니다)
+    """
+    cached = load_board(db)
+    cutoff = min(_cutoff(cached[name], cached[_complete_key(name)]) for name in BOARD_LISTS)
+    if entry["level"] < cutoff:
+        return False
+
+    ref = board_ref(db)
+
+    @google.cloud.firestore.transactional
+    def run_submit_transaction(transaction):
+        snapshot = ref.get(transaction=transaction)
+        stored = snapshot.to_dict() if snapshot.exists else {}
+        lists = _read_lists(stored)
+
+        merged = {}
+        for name, unique_field in zip(BOARD_LISTS, ("damagoID", "coupleID")):
+            merged[name], merged[_complete_key(name)] = _merge(
+                lists[name], lists[_complete_key(name)], entry, unique_field
+            )
+        board = {**merged, "updatedAt": stored.get("updatedAt")}
+        if merged == lists:
+            return board, False
+
+        transaction.set(ref, {**merged, "updatedAt": firestore.SERVER_TIMESTAMP})
+        return board, True
+
+    board, changed = run_submit_transaction(db.transaction())
+    _remember(board)
+    return changed
+
+
+def remove_couple(db, couple_id: str) -> None:
+    """
+    탈퇴한 커플의 항목을 리더보드에서 제거합니다.
+    잘린 적 있는 목록이 LEADERBOARD_SIZE개보다 줄어들면 빈 자리를 채울 수 없으므로 needsRebuild를 표시하고,
+    다시 계산은 스케줄러(refresh_leaderboard)에 맡깁니다. (탈퇴 요청 안에서 damagos 전체를 훑지 않음)
+    """
+    ref = board_ref(db)
+
+    @google.cloud.firestore.transactional
+    def run_remove_transaction(transaction) -> bool:
+        snapshot = ref.get(transaction=transaction)
+        if not snapshot.exists:
+            return False
+        lists = _read_lists(snapshot.to_dict())
+        remaining = {name: [e for e in lists[name] if e.get("coupleID") != couple_id] for name in BOARD_LISTS}
+        if all(len(remaining[name]) == len(lists[name]) for name in BOARD_LISTS):
+            return False
+        short = any(
+            not lists[_complete_key(name)] and len(remaining[name]) < LEADERBOARD_SIZE
+            for name in BOARD_LISTS
+        )
+        update = {**remaining, "updatedAt": firestore.SERVER_TIMESTAMP}
+        if short:
+            update["needsRebuild"] = True
+        transaction.update(ref, update)
+        return short
+
+    short = run_remove_transaction(db.transaction())
+    _cache["board"] = None
+    if short:
+        logger.info("Leaderboard below size after removal, rebuild scheduled", coupleID=couple_id)
+
+
+def rename_damago(db, damago_id: str, damago_name: str) -> bool:
+    """
+    순위에 있는 다마고의 이름을 바꿉니다. 바꿨으면 True를 반환합니다.
+    캐시된 리더보드에 없으면 조회 없이 건너뜁니다. (캐시 만료 전에 순위에 들어온 경우는 다음 submit이 새 이름을 기록)
+    """
+    cached = load_board(db)
+    if not any(e["damagoID"] == damago_id for name in BOARD_LISTS for e in cached[name]):
+        return False
+
+    ref = board_ref(db)
+
+    @google.cloud.firestore.transactional
+    def run_rename_transaction(transaction) -> bool:
+        snapshot = ref.get(transaction=transaction)
+        if not snapshot.exists:
+            return False
+        stored = snapshot.to_dict()
+        renamed = {
+            name: [
+                {**e, "damagoName": damago_name} if e.get("damagoID") == damago_id else e
+                for e in stored.get(name, [])
+            ]
+            for name in BOARD_LISTS
+        }
+        if all(renamed[name] == stored.get(name, []) for name in BOARD_LISTS):
+            return False
+        transaction.update(ref, {**renamed, "updatedAt": firestore.SERVER_TIMESTAMP})
+        return True
+
+    changed = run_rename_transaction(db.transaction())
+    _cache["board"] = None
+    return changed
+
+
+def _existing_couples(db, couple_ids: set) -> dict:
+    """{ coupleID: 커플 문서가 있는지 } (탈퇴로 커플 문서가 지워졌지만 다마고 삭제가 끝나지 않은 경우를 거르기 위함)"""
+    refs = [db.collection("couples").document(couple_id) for couple_id in couple_ids if couple_id]
+    exists = {couple_id: False for couple_id in couple_ids}
+    for snapshot in db.get_all(refs, field_paths=["user1UID"]):
+        exists[snapshot.id] = snapshot.exists
+    return exists
+
+
+def _reconcile(computed: list, stored: list, unique_field: str, exists: dict) -> list:
+    """
+    다시 계산한 목록에 트랜잭션 안에서 읽은 현재 목록을 합칩니다.
+    - 이미 순위에 있던 다마고는 기록된 도달 시각(reachedAt)을 유지
+    - 계산 중에 submit된 항목(더 높은 레벨, 새로 들어온 다마고)은 유지
+    - 커플 문서가 없는 것으로 확인된 항목은 제외
+    """
+    best = {}
+    for entry in [*stored, *computed]:
+        if exists.get(entry.get("coupleID")) is False:
+            continue
+        key = entry[unique_field]
+        current = best.get(key)
+        if current is None:
+            best[key] = entry
+        elif current["damagoID"] == entry["damagoID"]:
+            # 같은 다마고: 레벨이 같으면 먼저 기록된 도달 시각 유지
+            if entry["level"] > current["level"]:
+                best[key] = entry
+        elif _rank_key(entry) < _rank_key(current):
+            best[key] = entry
+    return sorted(best.values(), key=lambda e: (_rank_key(e), e["damagoID"]))[:STORED_SIZE]
+
+
+def rebuild(db) -> dict:
+    """
+    damagos 전체를 훑어 리더보드를 다시 만듭니다.
+    (처음 만들 때, 레벨이 일괄로 바뀐 뒤, 탈퇴로 목록이 LEADERBOARD_SIZE개보다 줄었을 때 스케줄러가)
+    커플 문서가 없는 다마고(탈퇴 후 연쇄 삭제 중)는 제외합니다.
+    쓰기는 트랜잭션으로 현재 문서와 합치므로 계산 중의 submit이나 탈퇴 제거를 덮어쓰지 않습니다.
+    도달 시각을 알 수 없는 새 항목은 같은 레벨의 기존 항목 뒤에, 문서 ID 순으로 정렬됩니다.
+    """
+    now = datetime.now(timezone.utc)
+    rank_key = lambda e: (_rank_key(e), e["damagoID"])
+
+    ranked = sorted(
+        (make_entry(doc.id, doc.to_dict(), now) for doc in db.collection("damagos").select(ENTRY_FIELDS).stream()),
+        key=rank_key
+    )
+
+    # 높은 순서대로 STORED_SIZE개씩 커플 존재를 확인하며 두 목록을 채움
+    exists = {}
+    top, couples, seen_couples = [], [], set()
+    for start in range(0, len(ranked), STORED_SIZE):
+        window = ranked[start:start + STORED_SIZE]
+        unknown = {e["coupleID"] for e in window if e["coupleID"] not in exists}
+        if unknown:
+            exists.update(_existing_couples(db, unknown))
+        for entry in window:
+            if not exists.get(entry["coupleID"]):
+                continue
+            if len(top) < STORED_SIZE:
+                top.append(entry)
+            if entry["coupleID"] not in seen_couples and len(couples) < STORED_SIZE:
+                seen_couples.add(entry["coupleID"])
+                couples.append(entry)
+        if len(top) == STORED_SIZE and len(couples) == STORED_SIZE:
+            break
+
+    # 가득 찼으면 목록 밖에 더 있을 수 있으므로 잘린 것으로 표시 (정확히 STORED_SIZE개여도 동작은 같음)
+    computed = {
+        "damagos": top,
+        "couples": couples,
+        _complete_key("damagos"): len(top) < STORED_SIZE,
+        _complete_key("couples"): len(couples) < STORED_SIZE,
+    }
+    ref = board_ref(db)
+
+    @google.cloud.firestore.transactional
+    def run_rebuild_transaction(transaction) -> dict:
+        snapshot = ref.get(transaction=transaction)
+        lists = _read_lists(snapshot.to_dict() if snapshot.exists else {})
+        board = {}
+        for name, unique_field in zip(BOARD_LISTS, ("damagoID", "coupleID")):
+            board[name] = _reconcile(computed[name], lists[name], unique_field, exists)
+            board[_complete_key(name)] = computed[_complete_key(name)] and len(board[name]) < STORED_SIZE
+        # set이므로 needsRebuild도 지워짐
+        transaction.set(ref, {**board, "updatedAt": firestore.SERVER_TIMESTAMP})
+        return board
+
+    board = run_rebuild_transaction(db.transaction())
+    _cache["board"] = None
+    report = {name: len(board[name]) for name in BOARD_LISTS}
+    logger.info("Leaderboard rebuilt", **report)
+    return report
+
+
+def refresh_leaderboard(event: scheduler_fn.ScheduledEvent) -> None:
+    """
+    주기적으로 실행되어 탈퇴로 목록이 줄어든(needsRebuild) 리더보드를 다시 계산합니다.
+    표시가 없으면 문서 한 번만 읽습니다.
+    """
+    db = get_db()
+    snapshot = board_ref(db).get()
+    if not snapshot.exists or not snapshot.to_dict().get("needsRebuild"):
+        return
+    rebuild(db)
+
+
+def _format_entries(entries: list, couple_id: str | None) -> list:
+    # 커플 ID는 커플 코드로 만들어지므로 응답에 노출하지 않음
+    # 버퍼(LEADERBOARD_BUFFER)는 보여주지 않음
+    return [
+        {
+            "rank": rank,
+            "damagoType": entry.get("damagoType"),
+            "damagoName": entry.get("damagoName"),
+            "level": entry.get("level"),
+            "isMine": bool(couple_id) and entry.get("coupleID") == couple_id
+        }
+        for rank, entry in enumerate(entries[:LEADERBOARD_SIZE], start=1)
+    ]
+
+
+def fetch_leaderboard(req: https_fn.Request) -> https_fn.Response:
+    """
+    다마고/커플 리더보드를 반환합니다. (인스턴스 캐시, 만료 시 문서 한 번 조회)
+
+    Returns:
+        JSON Response: {
+            "damagos": [{ "rank", "damagoType", "damagoName", "level", "isMine" }, ...],
+            "couples": [...]
+        }
+    """
+    try:
+        principal = get_principal_from_request(req)
+    except ValueError as e:
+        return https_fn.Response(str(e), status=401)
+
+    db = get_db()
+
+    # --- [Step 1] 내 커플 확인 (토큰 claim 우선, 커플이 없어도 조회 가능) ---
+    tracing.step(tracing.READ)
+    couple_id, error = resolve_couple_id(db, principal)
+    if error and error not in (errors.NotFound.COUPLE, errors.NotFound.USER):
+        return errors.error_response(error)
+
+    # --- [Step 2] 리더보드 조회 ---
+    board = load_board(db)
+
+    return https_fn.Response(
+        json.dumps({
+            "damagos": _format_entries(board["damagos"], couple_id),
+            "couples": _format_entries(board["couples"], couple_id)
+        }),
+        mimetype="application/json"
+    )
@@ -1,27 +1,34 @@
 from firebase_functions import https_fn
 from firebase_admin import firestore, messaging
-from google.cloud import tasks_v2
-from google.protobuf import timestamp_pb2
-from utils.firestore import get_db
+from utils.firestore import get_db, get_snapshot
+from utils.tasks import get_tasks_client
 from utils.middleware import get_uid_from_request
 import utils.errors as errors
+from utils import tracing
 import time
 import json
 from datetime import datetime, timezone, timedelta
 import os
 from utils.constants import BUNDLE_ID, PROJECT_ID, LOCATION, PUSH_RETRY_QUEUE_NAME, IS_EMULATOR
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 
 def enqueue_push_retry(payload: dict):
     """실패한 푸시 알림을 Cloud Tasks 큐에 지수 백오프와 함께 예약합니다."""
+    # Cloud Tasks 클라이언트는 import 비용이 커서 재시도 예약 시점에만 불러옵니다.
+    from google.cloud import tasks_v2
+    from google.protobuf import timestamp_pb2
+
     try:
-        client = tasks_v2.CloudTasksClient()
+        client = get_tasks_client()
         parent = client.queue_path(PROJECT_ID, LOCATION, PUSH_RETRY_QUEUE_NAME)
         
         # 재시도 횟수 제한 (최대 3회)
         retry_count = payload.get("retry_count", 0)
         if retry_count >= 3:
-            print(f"Max retries reached for task type: {payload.get('type')}")
+            logger.warning("Max push retries reached", taskType=payload.get("type"))
             return
             
         # 지수 백오프 적용 (10s, 60s, 300s)
@@ -60,10 +67,11 @@ def enqueue_push_retry(payload: dict):
                 "service_account_email": f"{PROJECT_ID}@appspot.gserviceaccount.com"
             }
 
-        client.create_task(request={"parent": parent, "task": task})
-        print(f"Push retry enqueued: {payload.get('type')} (Attempt {payload['retry_count']})")
+        with tracing.span(tracing.TASK):
+            client.create_task(request={"parent": parent, "task": task})
+        logger.info("Push retry enqueued", taskType=payload.get("type"), attempt=payload["retry_count"])
     except Exception as e:
-        print(f"Failed to enqueue push retry: {e}")
+        logger.error("Failed to enqueue push retry", error=str(e))
 
 
 def send_push_notification(target_uid: str, title: str, body: str, data: dict = None, is_retry: bool = False, retry_count: int = 0) -> bool:
@@ -71,22 +79,22 @@ def send_push_notification(target_uid: str, title: str, body: str, data: dict =
     특정 사용자에게 푸시 알림을 전송합니다. 실패 시 Cloud Tasks로 재시도합니다.
     """
     db = get_db()
-    target_user_doc = db.collection("users").document(target_uid).get()
+    target_user_doc = get_snapshot(db.collection("users").document(target_uid))
 
     if not target_user_doc.exists:
-        print(f"User {target_uid} not found")
+        logger.warning("Push target user not found", uid=target_uid)
         return False
 
     target_user_data = target_user_doc.to_dict()
     target_fcm_token = target_user_data.get("fcmToken")
 
     if not target_fcm_token:
-        print(f"User {target_uid} has no FCM token")
+        logger.info("User has no FCM token", uid=target_uid, rate_key="no_fcm_token")
         return False
 
     # 알림 설정 확인
     if not target_user_data.get("useFCM", True):
-        print(f"User {target_uid} has disabled push notifications")
+        logger.info("User has disabled push notifications", uid=target_uid, rate_key="fcm_disabled")
         return False
 
     try:
@@ -98,11 +106,12 @@ def send_push_notification(target_uid: str, title: str, body: str, data: dict =
             data=data or {},
             token=target_fcm_token
         )
-        response = messaging.send(message)
-        print(f"Successfully sent message to {target_uid}: {response}")
+        with tracing.span(tracing.FCM):
+            response = messaging.send(message)
+        logger.debug("Push sent", uid=target_uid, messageID=response)
         return True
     except Exception as e:
-        print(f"Error sending message to {target_uid}: {e}")
+        logger.error("Error sending push", uid=target_uid, error=str(e))
         
         # 일시적 네트워크 오류 등 재시도 가능한 상황인 경우 Cloud Task 예약
         if any(err in str(e).lower() for err in ["unavailable", "internal-error", "timeout"]):
@@ -145,6 +154,7 @@ def poke(req: https_fn.Request) -> https_fn.Response:
     db = get_db()
 
     # --- [Step 1] 파트너 조회 및 횟수 제한 확인 ---
+    tracing.step(tracing.TXN)
     my_user_ref = db.collection("users").document(my_uid)
     
     @firestore.transactional
@@ -191,6 +201,7 @@ def poke(req: https_fn.Request) -> https_fn.Response:
     partner_uid, nickname, new_count = result
 
     # --- [Step 2] FCM 전송 ---
+    tracing.step(tracing.PUSH)
     nickname = nickname or '상대방'
     final_body = custom_message if custom_message else f"{nickname}님이 당신을 콕 찔렀어요!"
     
@@ -214,9 +225,9 @@ def poke(req: https_fn.Request) -> https_fn.Response:
         # FCM 전송 실패 시 DB 롤백
         try:
             my_user_ref.update({"todayPokeCount": firestore.Increment(-1)})
-            print(f"Reverted poke count for {my_uid} due to FCM failure")
+            logger.info("Reverted poke count due to FCM failure", uid=my_uid)
         except Exception as e:
-            print(f"Failed to revert poke count for {my_uid}: {e}")
+            logger.error("Failed to revert poke count", uid=my_uid, error=str(e))
 
         return errors.error_response(errors.Internal.FAILED_TO_SEND_PUSH_NOTIFICATION)
 
@@ -271,10 +282,10 @@ def update_live_activity_internal(target_uid: str, content_state: dict, attribut
     """
     db = get_db()
 
-    user_doc = db.collection("users").document(target_uid).get()
+    user_doc = get_snapshot(db.collection("users").document(target_uid))
 
     if not user_doc.exists:
-        print(f"User {target_uid} not found")
+        logger.warning("Push target user not found", uid=target_uid)
         return False
 
     user_data = user_doc.to_dict()
@@ -284,7 +295,7 @@ def update_live_activity_internal(target_uid: str, content_state: dict, attribut
     use_live_activity = user_data.get("useLiveActivity", True)
 
     if not fcm_token or not use_live_activity:
-        print(f"Live Activity not active (or no FCM token) for {target_uid}")
+        logger.info("Live Activity not active (or no FCM token)", uid=target_uid, rate_key="la_inactive")
         return False
 
     # 1. Update 시도
@@ -314,12 +325,13 @@ def update_live_activity_internal(target_uid: str, content_state: dict, attribut
                     payload=messaging.APNSPayload(aps=aps)
                 )
             )
-            response = messaging.send(message)
-            print(f"Live Activity update sent to {target_uid}: {response}")
+            with tracing.span(tracing.FCM):
+                response = messaging.send(message)
+            logger.debug("Live Activity update sent", uid=target_uid, messageID=response)
             return True
 
         except Exception as e:
-            print(f"Live Activity update failed for {target_uid}: {e}")
+            logger.warning("Live Activity update failed", uid=target_uid, error=str(e))
             
             # 재시도가 아닌 최초 실패 시에만 Cloud Task 예약
             if not is_retry and any(err in str(e).lower() for err in ["unavailable", "internal-error", "timeout"]):
@@ -331,13 +343,13 @@ def update_live_activity_internal(target_uid: str, content_state: dict, attribut
                     "retry_count": retry_count
                 })
             
-            print(f"Trying fallback to Start...")
+            logger.debug("Trying Live Activity start fallback", uid=target_uid)
             # Fallback 진행을 위해 예외를 무시하고 아래로 진행
     
     # 2. Fallback: Start 시도 (Update 실패 혹은 토큰 없음)
     if la_start_token and attributes:
         try:
-            print(f"Attempting to START Live Activity for {target_uid} as fallback.")
+            logger.debug("Starting Live Activity as fallback", uid=target_uid)
             aps = messaging.Aps(
                 alert=messaging.ApsAlert(
                     title="다마고 알림",
@@ -364,14 +376,15 @@ def update_live_activity_internal(target_uid: str, content_state: dict, attribut
                     payload=messaging.APNSPayload(aps=aps)
                 )
             )
-            response = messaging.send(message)
-            print(f"Live Activity started (fallback) for {target_uid}: {response}")
+            with tracing.span(tracing.FCM):
+                response = messaging.send(message)
+            logger.debug("Live Activity started (fallback)", uid=target_uid, messageID=response)
             return True
         except Exception as e:
-            print(f"Live Activity start (fallback) failed for {target_uid}: {e}")
+            logger.error("Live Activity start (fallback) failed", uid=target_uid, error=str(e))
             return False
     else:
-        print(f"Cannot fallback to Start: Missing start token or attributes for {target_uid}")
+        logger.info("Cannot fallback to Live Activity start: missing start token or attributes", uid=target_uid, rate_key="la_no_start_token")
         return False
 
 
@@ -390,7 +403,7 @@ def start_live_activity(req: https_fn.Request) -> https_fn.Response:
 
     db = get_db()
 
-    user_doc = db.collection("users").document(target_uid).get()
+    user_doc = get_snapshot(db.collection("users").document(target_uid))
     if not user_doc.exists:
         return errors.error_response(errors.NotFound.USER)
 
@@ -418,7 +431,7 @@ def start_live_activity(req: https_fn.Request) -> https_fn.Response:
         )
 
         # [Debug] Payload 확인
-        print(f"[Start LA] Payload Custom Data: {aps.custom_data}")
+        logger.debug("Live Activity start payload", customData=aps.custom_data)
 
         message = messaging.Message(
             token=fcm_token,
@@ -432,12 +445,13 @@ def start_live_activity(req: https_fn.Request) -> https_fn.Response:
                 payload=messaging.APNSPayload(aps=aps)
             )
         )
-        response = messaging.send(message)
-        print(f"Live Activity start request sent to {target_uid}: {response}")
+        with tracing.span(tracing.FCM):
+            response = messaging.send(message)
+        logger.debug("Live Activity start request sent", uid=target_uid, messageID=response)
         return https_fn.Response("Live Activity Started Remotely")
 
     except Exception as e:
-        print(f"Error starting Live Activity: {e}")
+        logger.error("Error starting Live Activity", uid=target_uid, error=str(e))
         return https_fn.Response(f"Error: {str(e)}", status=500)
 
 
@@ -450,7 +464,7 @@ def retry_push_notification(req: https_fn.Request) -> https_fn.Response:
     target_uid = data.get("targetUID")
     retry_count = data.get("retry_count", 0)
 
-    print(f"Retrying task: {task_type} for {target_uid} (Retry count: {retry_count})")
+    logger.info("Retrying push task", taskType=task_type, uid=target_uid, retryCount=retry_count)
 
     if task_type == "push":
         send_push_notification(
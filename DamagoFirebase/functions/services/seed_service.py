@@ -6,11 +6,22 @@
 from firebase_functions import https_fn
 from firebase_admin import firestore
 import google.cloud.firestore
-import csv
-import os
-from pathlib import Path
+import json
+import queue
+import threading
+import time
 from utils.firestore import get_db
+from utils import bulk_delete
 import utils.errors as errors
+import utils.catalog as catalog
+from utils import catalog_snapshot
+from utils import tracing
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# BulkWriter가 실패한 쓰기를 다시 시도하는 최대 횟수 (이후에는 실패로 집계)
+MAX_WRITE_ATTEMPTS = 5
 
 def is_admin(req: https_fn.Request) -> bool:
     """
@@ -39,55 +50,144 @@ def is_admin(req: https_fn.Request) -> bool:
         return decoded_token.get('admin', False)
         
     except Exception as e:
-        print(f"Admin verification error: {e}")
+        logger.warning("Admin verification error", error=str(e))
         return False
 
 
-def load_daily_questions_from_csv() -> list:
-    """CSV 파일에서 일일 응답 질문 로드"""
-    csv_path = Path(__file__).parent.parent / 'data' / 'DailyQuestionResource.csv'
-    questions = []
-    
-    try:
-        with open(csv_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                questions.append({
-                    'order': int(row['번호']),
-                    'questionText': row['질문 내용'].strip()
-                })
-        return questions
-    except FileNotFoundError:
-        raise Exception(f"CSV file not found: {csv_path}")
-    except Exception as e:
-        raise Exception(f"Error loading CSV: {str(e)}")
+def _phase(report: dict, name: str, started: float, docs: int) -> None:
+    seconds = time.perf_counter() - started
+    report["phases"][name] = {
+        "docs": docs,
+        "seconds": round(seconds, 3),
+        "docsPerSecond": round(docs / seconds, 1) if seconds > 0 else None
+    }
 
 
-def load_balance_games_from_csv() -> list:
-    """CSV 파일에서 밸런스 게임 로드"""
-    csv_path = Path(__file__).parent.parent / 'data' / 'BalanceGameResource.csv'
-    games = []
-    
-    try:
-        with open(csv_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                games.append({
-                    'order': int(row['번호']),
-                    'questionText': row['질문'].strip(),
-                    'option1': row['선택지 1'].strip(),
-                    'option2': row['선택지 2'].strip()
-                })
-        return games
-    except FileNotFoundError:
-        raise Exception(f"CSV file not found: {csv_path}")
-    except Exception as e:
-        raise Exception(f"Error loading CSV: {str(e)}")
+def sync_catalog(db, collection: str, force: bool = False) -> dict:
+    """
+    카탈로그 스냅샷(utils/catalog_snapshot.py)의 행을 order 기준으로 저장된 문서와 비교하여 달라진 행만 기록합니다.
+
+    - 추가: 스냅샷에만 있는 order (새 문서)
+    - 수정: contentHash가 다른 order (기존 문서 ID 유지, 답변 기록의 questionID 참조 보존)
+    - 삭제: 저장소에만 있는 order, 같은 order의 중복 문서
+    force=True이면 해시와 관계없이 모든 행을 다시 기록합니다.
+    쓰기는 BulkWriter로 여러 배치를 병렬 전송하며, 끝나면 카탈로그 버전과 order -> 문서 ID 맵을 갱신합니다.
+    재시도 후에도 실패한 쓰기가 있으면 저장소가 스냅샷과 다르므로 버전을 올리지 않습니다. (version은 None)
+
+    Returns:
+        { "inserted", "updated", "deleted", "unchanged", "failed", "version", "phases": { 단계: {docs, seconds, docsPerSecond} } }
+    """
+    snapshot = catalog_snapshot.get(collection)
+    report = {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0, "failed": 0, "version": None, "phases": {}}
+    collection_ref = db.collection(collection)
+
+    # --- [Phase 1] 저장된 order/해시만 조회 ---
+    started = time.perf_counter()
+    stored = {}
+    duplicates = []
+    scanned = 0
+    for doc in collection_ref.select(["order", "contentHash"]).stream():
+        scanned += 1
+        data = doc.to_dict()
+        order = data.get("order")
+        if order in stored:
+            duplicates.append(doc.reference)
+        else:
+            stored[order] = (doc.reference, data.get("contentHash"))
+    _phase(report, "scan", started, scanned)
+
+    # --- [Phase 2] 비교 ---
+    started = time.perf_counter()
+    inserts = []
+    updates = []
+    ids = {}
+    for row in snapshot.ordered_rows():
+        digest = snapshot.hashes[row["order"]]
+        existing = stored.pop(row["order"], None)
+        if existing is None:
+            ref = collection_ref.document()
+            inserts.append((ref, row, digest))
+        else:
+            ref = existing[0]
+            if force or existing[1] != digest:
+                updates.append((ref, row, digest))
+            else:
+                report["unchanged"] += 1
+        ids[str(row["order"])] = ref.id
+    # 스냅샷에 없는 order와 중복 문서는 삭제
+    deletes = [ref for ref, _ in stored.values()] + duplicates
+    _phase(report, "diff", started, len(snapshot.rows))
+
+    # --- [Phase 3] 변경분만 병렬 기록 ---
+    started = time.perf_counter()
+    writer = db.bulk_writer()
+    failed_paths = []
+
+    def on_error(error, bulk_writer) -> bool:
+        if error.attempts < MAX_WRITE_ATTEMPTS:
+            return True
+        failed_paths.append(error.operation.reference.path)
+        return False
+    writer.on_write_error(on_error)
+
+    for ref, row, digest in inserts:
+        writer.create(ref, {
+            **row,
+            "contentHash": digest,
+            "createdAt": firestore.SERVER_TIMESTAMP
+        })
+    for ref, row, digest in updates:
+        writer.update(ref, {
+            **row,
+            "contentHash": digest,
+            "updatedAt": firestore.SERVER_TIMESTAMP
+        })
+    for ref in deletes:
+        writer.delete(ref)
+    # 재시도는 닫힌 BulkWriter에 다시 넣을 수 없으므로 flush로 재시도까지 끝낸 뒤 닫음
+    writer.flush()
+    writer.close()
+
+    report["inserted"] = len(inserts)
+    report["updated"] = len(updates)
+    report["deleted"] = len(deletes)
+    report["failed"] = len(failed_paths)
+    _phase(report, "write", started, len(inserts) + len(updates) + len(deletes))
+
+    if failed_paths:
+        # 일부만 반영된 상태를 새 버전으로 알리지 않음 (다시 실행하면 달라진 행만 다시 기록)
+        logger.error("Catalog sync failed", collection=collection, failedPaths=failed_paths[:20], **report)
+        return report
+
+    # --- [Phase 4] 카탈로그 버전 갱신 ---
+    report["version"] = catalog.bump_version(db, collection, snapshot.content_hash, ids)
+    catalog.invalidate(collection)
+
+    logger.info("Catalog synced", collection=collection, **report)
+    return report
+
+
+def _sync_response(collection: str, report: dict) -> https_fn.Response:
+    phases = ", ".join(
+        f"{name} {phase['docs']} docs {phase['seconds']}s" for name, phase in report["phases"].items()
+    )
+    if report["failed"]:
+        return https_fn.Response(
+            f"❌ Sync of {collection} incomplete: {report['failed']} writes failed, "
+            f"catalog version not bumped. Run again to retry ({phases})",
+            status=500
+        )
+    message = (
+        f"✅ Synced {collection} (version {report['version']}): "
+        f"{report['inserted']} inserted, {report['updated']} updated, "
+        f"{report['deleted']} deleted, {report['unchanged']} unchanged ({phases})"
+    )
+    return https_fn.Response(message, status=200)
 
 
 def seed_daily_questions(req: https_fn.Request) -> https_fn.Response:
     """
-    일일 응답 질문 시드 데이터 추가 (CSV 파일에서 로드)
+    일일 응답 질문 시드 데이터 동기화 (카탈로그 스냅샷에서 로드, 달라진 행만 기록)
     
     사용법:
         # 개발 환경 (에뮬레이터) - 인증 불필요
@@ -96,6 +196,9 @@ def seed_daily_questions(req: https_fn.Request) -> https_fn.Response:
         # 프로덕션 - Authorization 헤더 필요
         curl -X POST https://your-function-url/seed_daily_questions \
           -H "Authorization: Bearer YOUR_ID_TOKEN"
+
+        # 해시와 관계없이 모든 행 다시 기록
+        curl -X POST "http://localhost:5001/damago-dev-26/asia-northeast3/seed_daily_questions?force=true"
     """
     
     # 관리자 권한 확인 (에뮬레이터에서는 자동 통과)
@@ -103,83 +206,13 @@ def seed_daily_questions(req: https_fn.Request) -> https_fn.Response:
         return errors.error_response(errors.Forbidden.ADMIN_REQUIRED)
     
     try:
-        import time
-        request_id = str(time.time())
-        print(f"[SEED-DAILY] Request {request_id} started")
-        
-        # Firestore 클라이언트 초기화
         db = get_db()
-        
-        # CSV에서 데이터 로드
-        questions_data = load_daily_questions_from_csv()
-        print(f"[SEED-DAILY] Request {request_id} - CSV loaded: {len(questions_data)} questions")
-        
-        # force 파라미터 확인
+
         force = req.args.get('force', 'false').lower() == 'true'
-        
-        # 기존 데이터 확인
-        existing_docs = list(db.collection('dailyQuestions').limit(1).get())
-        has_existing_data = len(existing_docs) > 0
-        
-        print(f"[SEED-DAILY] Request {request_id} - Current state: has_data={has_existing_data}, force={force}")
-        
-        if has_existing_data and not force:
-            print(f"[SEED-DAILY] Request {request_id} - BLOCKED: Data already exists")
-            return https_fn.Response(
-                "Daily questions already exist. Use ?force=true to override.",
-                status=409
-            )
-        
-        print(f"[SEED-DAILY] Request {request_id} - Proceeding to add data")
-        
-        # force=true이면 기존 데이터 삭제
-        deleted_count = 0
-        if force and has_existing_data:
-            # 기존 데이터 삭제 (배치 단위로)
-            while True:
-                docs = list(db.collection('dailyQuestions').limit(500).get())
-                if len(docs) == 0:
-                    break
-                    
-                batch = db.batch()
-                for doc in docs:
-                    batch.delete(doc.reference)
-                    deleted_count += 1
-                batch.commit()
-        
-        # 배치로 추가 (Firestore는 배치당 최대 500개)
-        added_count = 0
-        batch = db.batch()
-        batch_count = 0
-        
-        for question in questions_data:
-            doc_ref = db.collection('dailyQuestions').document()
-            batch.set(doc_ref, {
-                'order': question['order'],
-                'questionText': question['questionText'],
-                'createdAt': firestore.SERVER_TIMESTAMP
-            })
-            batch_count += 1
-            added_count += 1
-            
-            # 500개마다 커밋
-            if batch_count >= 500:
-                batch.commit()
-                batch = db.batch()
-                batch_count = 0
-        
-        # 남은 데이터 커밋
-        if batch_count > 0:
-            batch.commit()
-        
-        print(f"[SEED-DAILY] Request {request_id} - COMPLETED: deleted={deleted_count}, added={added_count}")
-        
-        # 성공 메시지
-        message = f"✅ Successfully added {added_count} daily questions from CSV"
-        if deleted_count > 0:
-            message = f"✅ Deleted {deleted_count} existing questions, added {added_count} new questions from CSV"
-        
-        return https_fn.Response(message, status=200)
+
+        tracing.step(tracing.WRITE)
+        report = sync_catalog(db, catalog.DAILY_QUESTIONS, force=force)
+        return _sync_response(catalog.DAILY_QUESTIONS, report)
         
     except Exception as e:
         return https_fn.Response(f"Error: {str(e)}", status=500)
@@ -187,7 +220,7 @@ def seed_daily_questions(req: https_fn.Request) -> https_fn.Response:
 
 def seed_balance_games(req: https_fn.Request) -> https_fn.Response:
     """
-    밸런스 게임 시드 데이터 추가 (CSV 파일에서 로드)
+    밸런스 게임 시드 데이터 동기화 (카탈로그 스냅샷에서 로드, 달라진 행만 기록)
     
     사용법:
         # 개발 환경 (에뮬레이터) - 인증 불필요
@@ -196,6 +229,9 @@ def seed_balance_games(req: https_fn.Request) -> https_fn.Response:
         # 프로덕션 - Authorization 헤더 필요
         curl -X POST https://your-function-url/seed_balance_games \
           -H "Authorization: Bearer YOUR_ID_TOKEN"
+
+        # 해시와 관계없이 모든 행 다시 기록
+        curl -X POST "http://localhost:5001/damago-dev-26/asia-northeast3/seed_balance_games?force=true"
     """
     
     # 관리자 권한 확인 (에뮬레이터에서는 자동 통과)
@@ -203,92 +239,64 @@ def seed_balance_games(req: https_fn.Request) -> https_fn.Response:
         return errors.error_response(errors.Forbidden.ADMIN_REQUIRED)
     
     try:
-        import time
-        request_id = str(time.time())
-        print(f"[SEED-BALANCE] Request {request_id} started")
-        
-        # Firestore 클라이언트 초기화
         db = get_db()
-        
-        # CSV에서 데이터 로드
-        games_data = load_balance_games_from_csv()
-        print(f"[SEED-BALANCE] Request {request_id} - CSV loaded: {len(games_data)} games")
-        
-        # force 파라미터 확인
+
         force = req.args.get('force', 'false').lower() == 'true'
-        
-        # 기존 데이터 확인
-        existing_docs = list(db.collection('balanceGames').limit(1).get())
-        has_existing_data = len(existing_docs) > 0
-        
-        print(f"[SEED-BALANCE] Request {request_id} - Current state: has_data={has_existing_data}, force={force}")
-        
-        if has_existing_data and not force:
-            print(f"[SEED-BALANCE] Request {request_id} - BLOCKED: Data already exists")
-            return https_fn.Response(
-                "Balance games already exist. Use ?force=true to override.",
-                status=409
-            )
-        
-        print(f"[SEED-BALANCE] Request {request_id} - Proceeding to add data")
-        
-        # force=true이면 기존 데이터 삭제
-        deleted_count = 0
-        if force and has_existing_data:
-            while True:
-                docs = list(db.collection('balanceGames').limit(500).get())
-                if len(docs) == 0:
-                    break
-                    
-                batch = db.batch()
-                for doc in docs:
-                    batch.delete(doc.reference)
-                    deleted_count += 1
-                batch.commit()
-        
-        # 배치로 추가
-        batch = db.batch()
-        added_count = 0
-        batch_count = 0
-        
-        for game in games_data:
-            doc_ref = db.collection('balanceGames').document()
-            batch.set(doc_ref, {
-                'order': game['order'],
-                'questionText': game['questionText'],
-                'option1': game['option1'],
-                'option2': game['option2'],
-                'createdAt': firestore.SERVER_TIMESTAMP
-            })
-            batch_count += 1
-            added_count += 1
-            
-            # 500개마다 커밋
-            if batch_count >= 500:
-                batch.commit()
-                batch = db.batch()
-                batch_count = 0
-        
-        # 남은 데이터 커밋
-        if batch_count > 0:
-            batch.commit()
-        
-        print(f"[SEED-BALANCE] Request {request_id} - COMPLETED: deleted={deleted_count}, added={added_count}")
-        
-        # 성공 메시지
-        message = f"✅ Successfully added {added_count} balance games from CSV"
-        if deleted_count > 0:
-            message = f"✅ Deleted {deleted_count} existing games, added {added_count} new games from CSV"
-        
-        return https_fn.Response(message, status=200)
+
+        tracing.step(tracing.WRITE)
+        report = sync_catalog(db, catalog.BALANCE_GAMES, force=force)
+        return _sync_response(catalog.BALANCE_GAMES, report)
         
     except Exception as e:
         return https_fn.Response(f"Error: {str(e)}", status=500)
 
 
+def _stream_clear(db, queries: dict) -> https_fn.Response:
+    """삭제 진행 상황을 줄 단위 JSON(NDJSON)으로 전송합니다."""
+    events = queue.Queue()
+
+    def run():
+        try:
+            counts = bulk_delete.delete_collections(
+                db, queries, on_progress=lambda name, deleted: events.put({"collection": name, "deleted": deleted})
+            )
+            _finish_clear(db, counts)
+            events.put({"done": True, "deleted": counts})
+        except bulk_delete.BulkDeleteError as e:
+            _log_clear_failure(e)
+            events.put({"error": str(e), "deleted": e.deleted, "failed": len(e.failed_paths)})
+        except Exception as e:
+            events.put({"error": str(e)})
+        events.put(None)
+
+    threading.Thread(target=run, name="clear-seed-data", daemon=True).start()
+
+    def body():
+        while (event := events.get()) is not None:
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+
+    return https_fn.Response(body(), mimetype="application/x-ndjson")
+
+
+def _log_clear_failure(error) -> None:
+    # 남은 문서가 있으므로 카탈로그 버전을 올리지 않음 (캐시는 이전 버전을 유지)
+    logger.error(
+        "Seed data clear failed", deleted=error.deleted,
+        failed=len(error.failed_paths), failedPaths=error.failed_paths[:20]
+    )
+
+
+def _finish_clear(db, counts: dict) -> None:
+    # 비워진 카탈로그도 새 버전으로 기록하여 캐시가 갱신되도록 함
+    for coll_name in counts:
+        catalog.bump_version(db, coll_name, catalog_snapshot.content_hash({}), {})
+    catalog.invalidate()
+    logger.info("Seed data cleared", deleted=counts)
+
+
 def clear_seed_data(req: https_fn.Request) -> https_fn.Response:
     """
-    시드 데이터 삭제
+    시드 데이터 삭제 (여러 컬렉션을 동시에, 문서 참조만 페이지 단위로 조회하여 삭제)
     
     사용법:
         # 모든 시드 데이터 삭제 (dailyQuestions + balanceGames)
@@ -297,6 +305,9 @@ def clear_seed_data(req: https_fn.Request) -> https_fn.Response:
         # 특정 컬렉션만 삭제
         curl -X DELETE "http://localhost:5001/damago-dev-26/asia-northeast3/clear_seed_data?collection=dailyQuestions"
         curl -X DELETE "http://localhost:5001/damago-dev-26/asia-northeast3/clear_seed_data?collection=balanceGames"
+
+        # 진행 상황을 줄 단위 JSON으로 받기
+        curl -N -X DELETE "http://localhost:5001/damago-dev-26/asia-northeast3/clear_seed_data?stream=true"
     """
     
     # 관리자 권한 확인 (에뮬레이터에서는 자동 통과)
@@ -312,36 +323,36 @@ def clear_seed_data(req: https_fn.Request) -> https_fn.Response:
         
         # 삭제할 컬렉션 목록
         if collection == 'all':
-            collections_to_delete = ['dailyQuestions', 'balanceGames']
-        elif collection in ['dailyQuestions', 'balanceGames']:
+            collections_to_delete = list(catalog.CATALOG_COLLECTIONS)
+        elif collection in catalog.CATALOG_COLLECTIONS:
             collections_to_delete = [collection]
         else:
             return https_fn.Response(
                 "Invalid collection. Use: dailyQuestions, balanceGames, or omit for all",
                 status=400
             )
-        
-        total_deleted = 0
-        results = []
-        
-        for coll_name in collections_to_delete:
-            deleted_count = 0
-            
-            # 배치 단위로 삭제
-            while True:
-                docs = list(db.collection(coll_name).limit(500).get())
-                if len(docs) == 0:
-                    break
-                
-                batch = db.batch()
-                for doc in docs:
-                    batch.delete(doc.reference)
-                    deleted_count += 1
-                batch.commit()
-            
-            total_deleted += deleted_count
-            results.append(f"{coll_name}: {deleted_count}")
-        
+
+        queries = {coll_name: db.collection(coll_name) for coll_name in collections_to_delete}
+
+        tracing.step(tracing.WRITE)
+        if req.args.get('stream', 'false').lower() == 'true':
+            return _stream_clear(db, queries)
+
+        try:
+            counts = bulk_delete.delete_collections(
+                db, queries,
+                on_progress=lambda name, deleted: logger.info("Clearing seed data", collection=name, deleted=deleted)
+            )
+        except bulk_delete.BulkDeleteError as e:
+            _log_clear_failure(e)
+            return https_fn.Response(
+                f"❌ Clear incomplete: {len(e.failed_paths)} deletes failed, catalog version not bumped (deleted {e.deleted})",
+                status=500
+            )
+        _finish_clear(db, counts)
+
+        total_deleted = sum(counts.values())
+        results = [f"{coll_name}: {deleted_count}" for coll_name, deleted_count in counts.items()]
         message = f"✅ Deleted {total_deleted} documents ({', '.join(results)})"
         return https_fn.Response(message, status=200)
         
@@ -1,13 +1,19 @@
 from firebase_functions import https_fn
 from firebase_admin import firestore
 import google.cloud.firestore
-from utils.firestore import get_db
+from utils.firestore import get_db, get_snapshot
 from utils.constants import get_default_damago_name, get_required_exp
-from utils.middleware import get_uid_from_request
+from utils.middleware import get_uid_from_request, get_principal_from_request, resolve_couple_id, is_couple_member
 import utils.errors as errors
+import utils.idempotency as idempotency
+from utils import tracing
+from services import economy_service, home_service, leaderboard_service
+from utils.logger import get_logger
 import json
 from datetime import datetime
 
+logger = get_logger(__name__)
+
 def adjust_coin(req: https_fn.Request) -> https_fn.Response:
     """
     사용자의 코인을 증가하거나 감소시킵니다.
@@ -21,7 +27,8 @@ def adjust_coin(req: https_fn.Request) -> https_fn.Response:
         JSON Response: { "totalCoin": updated_amount }
     """
     try:
-        uid = get_uid_from_request(req)
+        principal = get_principal_from_request(req)
+        uid = principal.uid
         data = req.get_json()
         amount = data.get("amount")
         
@@ -40,41 +47,55 @@ def adjust_coin(req: https_fn.Request) -> https_fn.Response:
 
     db = get_db()
     
-    # User Lookup
-    user_ref = db.collection("users").document(uid)
-    user_doc = user_ref.get()
-    if not user_doc.exists:
-        return errors.error_response(errors.NotFound.USER)
-        
-    couple_id = user_doc.to_dict().get("coupleID")
-    if not couple_id:
-        return errors.error_response(errors.NotFound.COUPLE)
+    # --- [Idempotency] --- (재시도 요청은 커플 조회 없이 기록된 응답을 반환)
+    tracing.step(tracing.READ)
+    idem_ref = idempotency.get_idempotency_ref(db, req, uid, "adjust_coin")
+    stored = idempotency.find_stored_response(idem_ref)
+    if stored:
+        return stored.to_response()
+
+    # Couple Lookup (토큰 claim 우선, 없으면 User 조회)
+    couple_id, error = resolve_couple_id(db, principal)
+    if error:
+        return errors.error_response(error)
         
     couple_ref = db.collection("couples").document(couple_id)
 
     @google.cloud.firestore.transactional
     def run_coin_transaction(transaction, doc_ref):
+        stored = idempotency.find_stored_response(idem_ref, transaction)
+        if stored:
+            return stored
+
         snapshot = doc_ref.get(transaction=transaction)
         if not snapshot.exists:
             raise ValueError(errors.NotFound.COUPLE_DOCUMENT.message)
-            
-        current_coin = snapshot.to_dict().get("totalCoin", 0)
-        new_coin = current_coin + amount
-        
-        if new_coin < 0:
-            raise ValueError(errors.BadRequest.NOT_ENOUGH_COINS.message)
-            
-        transaction.update(doc_ref, {"totalCoin": new_coin})
-        return new_coin
+        # 토큰 claim의 커플 ID가 오래된 값일 수 있으므로 구성원인지 확인
+        if not is_couple_member(snapshot.to_dict(), uid):
+            raise PermissionError(errors.Forbidden.NOT_COUPLE_MEMBER.message)
+
+        # 차감 후 잔액이 음수면 ValueError
+        balance = economy_service.change(
+            transaction, doc_ref, snapshot.to_dict(), coin=amount, reason="adjust_coin", uid=uid
+        )
+
+        result = {"totalCoin": balance.coin}
+        idempotency.store_response(transaction, idem_ref, result)
+        return result
 
     try:
-        new_balance = run_coin_transaction(db.transaction(), couple_ref)
+        tracing.step(tracing.TXN)
+        result = run_coin_transaction(db.transaction(), couple_ref)
+        if isinstance(result, idempotency.StoredResponse):
+            return result.to_response()
         return https_fn.Response(
-            json.dumps({"totalCoin": new_balance}),
+            json.dumps(result),
             mimetype="application/json"
         )
     except ValueError as ve:
          return https_fn.Response(str(ve), status=400)
+    except PermissionError:
+        return errors.error_response(errors.Forbidden.NOT_COUPLE_MEMBER)
     except Exception as e:
         return errors.error_response_with_detail(errors.Internal.TRANSACTION_FAILED, str(e))
 
@@ -123,6 +144,7 @@ def update_user_info(req: https_fn.Request) -> https_fn.Response:
     updates = {}
     
     # 1. 닉네임 업데이트
+    tracing.step(tracing.WRITE)
     if nickname is not None:
         updates["nickname"] = nickname
         
@@ -136,13 +158,16 @@ def update_user_info(req: https_fn.Request) -> https_fn.Response:
     if updates:
         user_ref.update(updates)
 
-    # 기념일 또는 펫 정보 업데이트가 필요한 경우 유저 정보를 조회해야 함
-    if any(param is not None for param in [anniversary_date_str, damago_name, damago_type]):
-        user_snap = user_ref.get()
+    # 기념일, 펫 정보 또는 홈 화면 닉네임 갱신이 필요한 경우 유저 정보를 조회해야 함
+    if any(param is not None for param in [nickname, anniversary_date_str, damago_name, damago_type]):
+        user_snap = get_snapshot(user_ref)
         if not user_snap.exists:
              return errors.error_response(errors.NotFound.USER)
         user_data = user_snap.to_dict()
 
+        if nickname is not None and user_data.get("coupleID"):
+            home_service.update_home(None, db, user_data["coupleID"], {"nicknames": {uid: nickname}})
+
         # 3. 기념일 업데이트 (커플인 경우에만)
         if anniversary_date_str is not None:
             try:
@@ -158,6 +183,7 @@ def update_user_info(req: https_fn.Request) -> https_fn.Response:
             if couple_id:
                 couple_ref = db.collection("couples").document(couple_id)
                 couple_ref.update({"anniversaryDate": anniversary_date})
+                home_service.update_home(None, db, couple_id, {"anniversaryDate": anniversary_date})
 
         # 4. 다마고 정보 업데이트 (이름, 타입)
         if damago_name is not None or damago_type is not None:
@@ -208,8 +234,20 @@ def update_user_info(req: https_fn.Request) -> https_fn.Response:
                     if "damagoName" not in damago_updates:
                         damago_updates["damagoName"] = get_default_damago_name(damago_type)
                     damago_ref.set(damago_updates)
+                    damago_data = damago_updates
                 else:
                     damago_ref.update(damago_updates)
+                    damago_data = {**damago_snap.to_dict(), **damago_updates}
+
+                # 활성 다마고가 바뀌었거나 이름이 바뀌었으므로 홈 화면 읽기 모델 갱신
+                home_service.update_active_damago(None, db, couple_id, target_damago_id, damago_data)
+
+                # 순위에 있는 다마고면 리더보드의 이름도 갱신 (새로 만든 다마고는 순위에 없음)
+                if damago_name is not None and damago_snap.exists:
+                    try:
+                        leaderboard_service.rename_damago(db, target_damago_id, damago_name)
+                    except Exception as e:
+                        logger.error("Failed to rename damago on leaderboard", damagoID=target_damago_id, error=str(e))
 
     return https_fn.Response("Updated successfully", status=200)
 
@@ -232,50 +270,47 @@ def get_user_info(req: https_fn.Request) -> https_fn.Response:
 
     db = get_db()
     # UDID 대신 UID로 문서 조회
-    user_doc = db.collection("users").document(uid).get()
+    tracing.step(tracing.READ)
+    user_doc = get_snapshot(db.collection("users").document(uid))
 
     if not user_doc.exists:
         return errors.error_response(errors.NotFound.USER)
 
     user_data = user_doc.to_dict()
     damago_id = user_data.get("damagoID")
+    couple_id = user_data.get("coupleID")
     
     # 다마고 정보 초기화
     damago_status = None
     total_coin = 0
     
+    # --- [Home Read Model] ---
+    tracing.step(tracing.READ)
+    # 커플이면 coupleHome 문서 한 번으로 다마고 상태와 코인을 조회
+    home = home_service.get_home(db, couple_id) if couple_id else None
+
+    if home is not None:
+        total_coin = home.get("totalCoin", 0)
+        if damago_id and home.get("damagoID") == damago_id and home.get("damago"):
+            damago_status = home_service.format_damago_status(home["damago"])
+
     # --- [Damago & Coin Aggregation] ---
-    # damagoID가 있으면 다마고 정보도 함께 조회 (Aggregation)
-    if damago_id:
+    tracing.step(tracing.READ)
+    # 홈 문서에 없는 경우 damagoID로 다마고 정보를 직접 조회 (Aggregation)
+    if damago_status is None and damago_id:
         damago_doc = db.collection("damagos").document(damago_id).get()
         if damago_doc.exists:
             damago_data = damago_doc.to_dict()
-            
-            last_fed_at = damago_data.get("lastFedAt")
-            last_fed_at_str = last_fed_at.isoformat(timespec='seconds') if last_fed_at else None
-            
-            last_active_at = damago_data.get("lastActiveAt")
-            last_active_at_str = last_active_at.isoformat(timespec='seconds') if last_active_at else None
-            
-            # 커플 정보에서 코인 조회
-            couple_id = damago_data.get("coupleID")
-            if couple_id:
-                couple_doc = db.collection("couples").document(couple_id).get()
-                if couple_doc.exists:
-                    total_coin = couple_doc.to_dict().get("totalCoin", 0)
-
-            damago_status = {
-                "damagoName": damago_data.get("damagoName", "이름 없는 다마고"),
-                "damagoType": damago_data.get("damagoType", "Bunny"),
-                "level": damago_data.get("level", 1),
-                "currentExp": damago_data.get("currentExp", 0),
-                "maxExp": damago_data.get("maxExp", 20),
-                "isHungry": damago_data.get("isHungry", False),
-                "statusMessage": damago_data.get("statusMessage", "행복해요!"),
-                "lastFedAt": last_fed_at_str,
-                "totalPlayTime": damago_data.get("totalPlayTime", 0),
-                "lastActiveAt": last_active_at_str
-            }
+            damago_status = home_service.format_damago_status(damago_data)
+
+            if home is None:
+                # 커플 정보에서 코인 조회
+                damago_couple_id = damago_data.get("coupleID")
+                if damago_couple_id:
+                    couple_ref = db.collection("couples").document(damago_couple_id)
+                    couple_doc = couple_ref.get()
+                    if couple_doc.exists:
+                        total_coin = economy_service.read_balance(couple_ref, couple_doc.to_dict()).coin
 
     response_data = {
         "uid": uid,  # udid -> uid
@@ -356,7 +391,7 @@ def check_couple_connection(req: https_fn.Request) -> https_fn.Response:
         
     db = get_db()
     user_ref = db.collection("users").document(uid)
-    user_doc = user_ref.get()
+    user_doc = get_snapshot(user_ref)
     
     is_connected = False
     
@@ -0,0 +1,155 @@
+"""
+인스턴스 워밍업
+
+새 인스턴스의 첫 요청이 부담하던 초기화 비용을 미리 치릅니다.
+- Firestore 클라이언트 생성 및 gRPC 채널 연결
+- ID 토큰 검증용 Google 공개 인증서 다운로드
+- 질문 카탈로그 캐시 적재
+- JSON/datetime 직렬화 경로
+- Cloud Tasks, FCM 클라이언트 (해당 함수만)
+
+main.py의 init 훅(인스턴스 초기화)과 /api/warm_up 라우트(관리자 전용)에서 실행됩니다.
+min instances와 함께 사용하면 사용자 요청은 이 비용을 보지 않습니다.
+"""
+
+import json
+import os
+import time
+from datetime import datetime, timezone
+from firebase_functions import https_fn
+from utils.firestore import get_db
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 모든 함수 공통 단계
+BASE_STEPS = ("firestore", "auth_certificates", "codecs")
+
+# 함수(FUNCTION_TARGET)별 추가 단계 (목록에 없는 함수는 공통 단계만 실행)
+EXTRA_STEPS = {
+    "api": ("catalog", "cloud_tasks", "messaging"),
+    "connect_couple": ("catalog",),
+    "fetch_daily_question": ("catalog",),
+    "fetch_balance_game": ("catalog",),
+    "submit_daily_question": ("messaging",),
+    "submit_balance_game": ("messaging",),
+    "feed": ("cloud_tasks", "messaging"),
+    "make_hungry": ("messaging",),
+    "poke": ("cloud_tasks", "messaging"),
+    "update_live_activity": ("cloud_tasks", "messaging"),
+    "start_live_activity": ("cloud_tasks", "messaging"),
+    "retry_push_notification": ("cloud_tasks", "messaging"),
+}
+
+ALL_STEPS = BASE_STEPS + ("catalog", "cloud_tasks", "messaging")
+
+
+def _warm_firestore():
+    # 클라이언트 생성만으로는 채널이 열리지 않으므로 존재하지 않는 문서를 한 번 읽습니다.
+    get_db().collection("warmup").document("ping").get()
+
+
+def _warm_auth_certificates():
+    if os.environ.get("FIREBASE_AUTH_EMULATOR_HOST"):
+        return
+    # 형식만 맞는 토큰을 공개 API로 검증하면 서명 확인 직전에 인증서를 받아 캐시합니다.
+    # (서명이 없으므로 InvalidIdTokenError가 정상, 인증서 다운로드 실패는 CertificateFetchError로 드러남)
+    import base64
+    import firebase_admin
+    from firebase_admin import auth
+
+    project_id = firebase_admin.get_app().project_id
+    encode = lambda data: base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b"=").decode()
+    token = ".".join([
+        encode({"alg": "RS256", "kid": "warmup", "typ": "JWT"}),
+        encode({"aud": project_id, "iss": f"https://securetoken.google.com/{project_id}", "sub": "warmup"}),
+        "warmup"
+    ])
+    try:
+        auth.verify_id_token(token)
+    except auth.InvalidIdTokenError:
+        pass
+
+
+def _warm_catalog():
+    import utils.catalog as catalog
+    db = get_db()
+    for collection in catalog.CATALOG_COLLECTIONS:
+        catalog.load_catalog(db, collection)
+
+
+def _warm_codecs():
+    now = datetime.now(timezone.utc)
+    payload = json.dumps({"statusMessage": "행복해요!", "lastFedAt": now.isoformat(timespec="seconds")}, ensure_ascii=False)
+    datetime.fromisoformat(json.loads(payload)["lastFedAt"])
+
+
+def _warm_cloud_tasks():
+    from utils.tasks import get_tasks_client
+    from google.protobuf import timestamp_pb2
+    get_tasks_client()
+    timestamp_pb2.Timestamp().FromDatetime(datetime.now(timezone.utc))
+
+
+def _warm_messaging():
+    import firebase_admin
+    from firebase_admin import messaging
+    messaging._get_messaging_service(firebase_admin.get_app())
+
+
+STEP_FUNCTIONS = {
+    "firestore": _warm_firestore,
+    "auth_certificates": _warm_auth_certificates,
+    "catalog": _warm_catalog,
+    "codecs": _warm_codecs,
+    "cloud_tasks": _warm_cloud_tasks,
+    "messaging": _warm_messaging,
+}
+
+
+def steps_for_target(target: str | None) -> tuple:
+    """배포된 함수 이름에 맞는 워밍업 단계를 반환합니다. (로컬 등 알 수 없으면 전체)"""
+    if not target:
+        return ALL_STEPS
+    return BASE_STEPS + EXTRA_STEPS.get(target, ())
+
+
+def run_warm_up(steps=None) -> dict:
+    """워밍업 단계를 실행하고 단계별 소요 시간을 반환합니다. (실패한 단계는 건너뜀)"""
+    steps = steps or ALL_STEPS
+    results = []
+    started = time.perf_counter()
+
+    for name in steps:
+        step_started = time.perf_counter()
+        error = None
+        try:
+            STEP_FUNCTIONS[name]()
+        except Exception as e:
+            error = str(e)
+        result = {"step": name, "ms": round((time.perf_counter() - step_started) * 1000, 1), "ok": error is None}
+        if error:
+            result["error"] = error
+        results.append(result)
+
+    report = {"steps": results, "totalMs": round((time.perf_counter() - started) * 1000, 1)}
+    logger.info("Instance warm-up", **report)
+    return report
+
+
+def warm_up_instance() -> None:
+    """인스턴스 초기화(init 훅)에서 호출됩니다."""
+    run_warm_up(steps_for_target(os.environ.get("FUNCTION_TARGET")))
+
+
+def warm_up(req: https_fn.Request) -> https_fn.Response:
+    """
+    워밍업 라우트: 관리자 요청이면 모든 단계를 실행하고 소요 시간을 반환합니다.
+    그 외 요청은 아무 작업 없이 204를 반환합니다. (인스턴스 자체는 init 훅에서 이미 워밍업됨)
+    """
+    from services.seed_service import is_admin
+    if not is_admin(req):
+        return https_fn.Response(status=204)
+
+    report = run_warm_up()
+    return https_fn.Response(json.dumps(report, ensure_ascii=False), status=200, mimetype="application/json")
@@ -0,0 +1,243 @@
+"""
+다마고 경험치 테이블 재조정 마이그레이션
+
+XP_TABLE(get_required_exp)을 바꾸면 기존 다마고의 maxExp가 예전 값으로 남고,
+currentExp가 새 기준치를 넘은 채 머무를 수 있습니다. 이 작업은 모든 다마고를 다시 계산합니다.
+
+- 계산: 페이지 단위로 level/currentExp를 NumPy 배열로 모아 누적 경험치 테이블에 대해 한 번에 계산
+  - 기본(carry): 현재 레벨을 유지하고 넘친 경험치만 다음 레벨로 이월 (feed와 같은 규칙, 레벨이 내려가지 않음)
+  - 재배치(from_table): 예전 테이블 기준 누적 경험치를 새 테이블로 옮김 (레벨이 내려갈 수 있음)
+- 조회: level, currentExp, maxExp, coupleID만 프로젝션하여 문서 ID 커서로 페이지 이동
+- 기록: 값이 바뀐 문서만 BulkWriter로 기록 (읽은 이후 바뀐 문서는 update_time 조건으로 건너뛰고 다음 실행에서 처리)
+  활성 다마고라면 홈 화면 읽기 모델(coupleHome)도 함께 갱신
+- 재개: 페이지마다 migrations/xpRebalance에 커서를 기록하여 중단된 위치부터 이어서 실행
+  테이블이 바뀌면 처음부터 다시 시작
+- 완료 후 레벨이 바뀐 문서가 있으면 리더보드(leaderboard_service.rebuild)를 다시 계산
+- dry_run: 기록 없이 레벨 분포 변화만 보고
+
+레벨업 코인 보상(get_level_up_reward)은 지급하지 않고 보고서에만 합계를 남깁니다.
+
+scripts/rebalance_xp.py에서만 실행합니다. NumPy는 scripts/requirements.txt에만 있으므로
+함수 코드에서 이 모듈을 import하지 않고, NumPy도 함수 안에서만 불러옵니다.
+"""
+
+import hashlib
+import json
+
+from firebase_admin import firestore
+from google.cloud.firestore_v1.field_path import FieldPath
+
+from utils.constants import get_required_exp, get_level_up_reward
+from services import home_service, leaderboard_service
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+MIGRATIONS_COLLECTION = "migrations"
+CHECKPOINT_ID = "xpRebalance"
+PAGE_SIZE = 500
+
+PROJECTED_FIELDS = ["level", "currentExp", "maxExp", "coupleID"]
+
+# BulkWriter 오류 처리 (google.rpc.Code.FAILED_PRECONDITION)
+FAILED_PRECONDITION = 9
+MAX_WRITE_ATTEMPTS = 5
+
+
+def checkpoint_ref(db):
+    return db.collection(MIGRATIONS_COLLECTION).document(CHECKPOINT_ID)
+
+
+class XpTable:
+    """레벨별 필요 경험치와 누적 경험치 (필요한 레벨까지 늘려 가며 사용)"""
+
+    def __init__(self, required_exp):
+        import numpy as np
+
+        self._np = np
+        self._required_exp = required_exp
+        self.required = np.zeros(0, dtype=np.int64)
+        # cumulative[l - 1] = 레벨 1에서 레벨 l에 도달하기까지 필요한 총 경험치
+        self.cumulative = np.zeros(1, dtype=np.int64)
+
+    def ensure_level(self, level: int) -> None:
+        np = self._np
+        if level <= len(self.required):
+            return
+        extra = np.array(
+            [self._required_exp(lv) for lv in range(len(self.required) + 1, level + 1)],
+            dtype=np.int64
+        )
+        self.required = np.concatenate((self.required, extra))
+        self.cumulative = np.concatenate(([0], np.cumsum(self.required)))
+
+    def ensure_total(self, total: int) -> None:
+        # 총 경험치가 도달하는 레벨의 다음 레벨까지 준비 (레벨당 필요 경험치는 1 이상)
+        while self.cumulative[-1] <= total:
+            self.ensure_level(max(len(self.required) * 2, 64))
+
+    def fingerprint(self, levels: int = 200) -> str:
+        self.ensure_level(levels)
+        encoded = json.dumps(self.required[:levels].tolist())
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:16]
+
+
+def recompute(levels, exps, old_table: XpTable, new_table: XpTable):
+    """
+    페이지의 (level, currentExp) 배열을 새 테이블 기준 (level, currentExp, maxExp) 배열로 계산합니다.
+    old_table이 new_table과 같으면 carry 모드입니다.
+    """
+    np = new_table._np
+    old_table.ensure_level(int(levels.max()))
+    totals = old_table.cumulative[levels - 1] + exps
+
+    new_table.ensure_total(int(totals.max()))
+    new_levels = np.searchsorted(new_table.cumulative, totals, side="right")
+    new_exps = totals - new_table.cumulative[new_levels - 1]
+    new_table.ensure_level(int(new_levels.max()))
+    new_max = new_table.required[new_levels - 1]
+    return new_levels, new_exps, new_max
+
+
+def _histogram(values) -> dict:
+    import numpy as np
+    levels, counts = np.unique(values, return_counts=True)
+    return {int(level): int(count) for level, count in zip(levels, counts)}
+
+
+def _merge(total: dict, part: dict) -> None:
+    for key, value in part.items():
+        total[key] = total.get(key, 0) + value
+
+
+def _skipped_rewards(before: int, after: int) -> int:
+    return sum(get_level_up_reward(level) for level in range(before + 1, after + 1))
+
+
+def rebalance(db, dry_run: bool = False, from_table: list | None = None, restart: bool = False,
+              page_size: int = PAGE_SIZE) -> dict:
+    """
+    모든 다마고의 레벨/경험치를 새 테이블로 다시 계산합니다.
+
+    Args:
+        from_table: 예전 XP_TABLE (지정하면 누적 경험치 재배치, 없으면 carry)
+        restart: 체크포인트를 무시하고 처음부터 실행
+
+    Returns:
+        { "scanned", "changed", "written", "conflicts", "levelUps", "levelDowns", "skippedRewardCoin",
+          "levelsBefore": {레벨: 수}, "levelsAfter": {레벨: 수}, "done" }
+    """
+    import numpy as np
+
+    new_table = XpTable(get_required_exp)
+    if from_table:
+        def old_required_exp(level: int) -> int:
+            # 테이블 밖 레벨은 마지막 값에서 레벨당 20씩 증가 (get_required_exp와 같은 규칙)
+            if level <= len(from_table):
+                return from_table[level - 1]
+            return from_table[-1] + (level - len(from_table)) * 20
+        old_table = XpTable(old_required_exp)
+    else:
+        old_table = new_table
+
+    fingerprint = new_table.fingerprint() + (f":{old_table.fingerprint()}" if from_table else "")
+    report = {
+        "scanned": 0, "changed": 0, "written": 0, "conflicts": 0,
+        "levelUps": 0, "levelDowns": 0, "skippedRewardCoin": 0,
+        "levelsBefore": {}, "levelsAfter": {}, "done": False
+    }
+
+    # --- 체크포인트 확인 (같은 테이블로 중단된 실행만 이어서 진행) ---
+    cursor = None
+    ref = checkpoint_ref(db)
+    if not dry_run and not restart:
+        checkpoint = ref.get()
+        if checkpoint.exists and checkpoint.get("fingerprint") == fingerprint and not checkpoint.get("completedAt"):
+            cursor = checkpoint.get("cursor")
+            logger.info("Resuming XP rebalance", cursor=cursor)
+
+    damagos = db.collection("damagos")
+    writer = None if dry_run else db.bulk_writer()
+    if writer is not None:
+        def on_error(error, bulk_writer) -> bool:
+            if error.code == FAILED_PRECONDITION:
+                # 읽은 이후 다른 요청(feed 등)이 바꾼 문서는 재시도하지 않고 다음 실행에 맡김
+                report["conflicts"] += 1
+                return False
+            return error.attempts < MAX_WRITE_ATTEMPTS
+        writer.on_write_error(on_error)
+
+    try:
+        while True:
+            query = damagos.select(PROJECTED_FIELDS).order_by(FieldPath.document_id()).limit(page_size)
+            if cursor:
+                query = query.start_after({FieldPath.document_id(): cursor})
+            page = list(query.stream())
+            if not page:
+                break
+
+            data = [doc.to_dict() for doc in page]
+            levels = np.array([max(int(d.get("level") or 1), 1) for d in data], dtype=np.int64)
+            exps = np.array([max(int(d.get("currentExp") or 0), 0) for d in data], dtype=np.int64)
+            max_exps = np.array([int(d.get("maxExp") or 0) for d in data], dtype=np.int64)
+
+            new_levels, new_exps, new_max = recompute(levels, exps, old_table, new_table)
+            changed = np.flatnonzero((new_levels != levels) | (new_exps != exps) | (new_max != max_exps))
+
+            report["scanned"] += len(page)
+            report["changed"] += len(changed)
+            report["levelUps"] += int((new_levels > levels).sum())
+            report["levelDowns"] += int((new_levels < levels).sum())
+            _merge(report["levelsBefore"], _histogram(levels))
+            _merge(report["levelsAfter"], _histogram(new_levels))
+
+            if writer is not None and len(changed):
+                couple_ids = {data[i].get("coupleID") for i in changed if data[i].get("coupleID")}
+                homes = {
+                    snapshot.id: snapshot.get("damagoID")
+                    for snapshot in db.get_all([home_service.home_ref(db, couple_id) for couple_id in couple_ids])
+                    if snapshot.exists
+                }
+
+            for i in changed:
+                before, after = int(levels[i]), int(new_levels[i])
+                report["skippedRewardCoin"] += _skipped_rewards(before, after)
+                if writer is None:
+                    continue
+
+                fields = {"level": after, "currentExp": int(new_exps[i]), "maxExp": int(new_max[i])}
+                writer.update(
+                    page[i].reference,
+                    {**fields, "lastUpdatedAt": firestore.SERVER_TIMESTAMP},
+                    option=db.write_option(last_update_time=page[i].update_time)
+                )
+                couple_id = data[i].get("coupleID")
+                if couple_id and homes.get(couple_id) == page[i].id:
+                    home_service.update_home(writer, db, couple_id, {"damago": fields})
+                report["written"] += 1
+
+            cursor = page[-1].id
+            if writer is not None:
+                writer.flush()
+                ref.set({
+                    "fingerprint": fingerprint,
+                    "cursor": cursor,
+                    "completedAt": None,
+                    "updatedAt": firestore.SERVER_TIMESTAMP
+                })
+            if len(page) < page_size:
+                break
+    finally:
+        if writer is not None:
+            writer.close()
+
+    report["written"] -= report["conflicts"]
+    report["done"] = True
+    if not dry_run:
+        ref.set({"completedAt": firestore.SERVER_TIMESTAMP, "updatedAt": firestore.SERVER_TIMESTAMP}, merge=True)
+        if report["written"]:
+            # 레벨이 일괄로 바뀌었으므로 리더보드를 다시 계산
+            leaderboard_service.rebuild(db)
+
+    logger.info("XP rebalance finished", dryRun=dry_run, **{k: v for k, v in report.items() if not k.startswith("levels")})
+    return report
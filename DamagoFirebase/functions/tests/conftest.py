@@ -0,0 +1,15 @@
+"""
+functions 테스트 공통 설정
+
+서비스 모듈이 import 시점에 환경 변수를 읽으므로, 어떤 모듈보다 먼저
+tests/harness.py의 환경(메모리 백엔드, 서명 없는 토큰)으로 설정합니다.
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import harness  # noqa: E402
+
+harness.configure_environment("memory", harness.DEFAULT_PROJECT)
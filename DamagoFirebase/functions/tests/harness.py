@@ -0,0 +1,385 @@
+"""
+합성 커플 워크로드 하네스 (테스트/벤치마크 공용)
+
+tests/의 테스트와 scripts/bench_endpoints.py가 같은 환경과 워크로드를 사용하도록 모아 둡니다.
+- configure_environment: 서비스 모듈 import 전에 환경 변수 설정 (메모리 백엔드, 서명 없는 토큰)
+- mint_token: Auth 에뮬레이터 모드에서 verify_id_token이 받아들이는 서명 없는 ID 토큰
+- 외부 서비스 대역: Cloud Tasks 예약, FCM 전송, custom claim 저장 (요청만 기록)
+- Client: 라우트 핸들러를 router.call로 직접 호출하고 요청별 Firestore 연산 수를 observer에 넘김
+- replay: N쌍의 합성 커플을 만들고 다마고를 뽑은 뒤, 실제 사용 패턴에 가까운 세션
+  (앱 실행, 밥주기 연타, 상점, 콕 찌르기, 두 사람의 일일 질문/밸런스 게임 답변, 히스토리 조회)을 재생
+
+커플 연결 후에는 클라이언트의 토큰 갱신처럼 커플 claim이 들어간 토큰으로 교체합니다.
+합성 사용자는 FCM 토큰만 등록하고 Live Activity 토큰은 없으므로 Live Activity 갱신은 전송 전 단계에서 건너뜁니다.
+"""
+
+import base64
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+FUNCTIONS_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_PROJECT = "damago-dev"
+
+# 세션 유형과 가중치
+SESSION_MIX = [
+    (0.25, "app_open"),        # get_user_info, check_couple_connection
+    (0.30, "feed_burst"),      # feed 연타 (먹이가 없으면 store 세션으로 대체)
+    (0.10, "poke"),
+    (0.15, "daily_question"),  # 두 사람 모두 답변 (오늘 이미 답했으면 히스토리 조회)
+    (0.10, "balance_game"),    # 두 사람 모두 선택 (이미 선택했으면 앱 실행)
+    (0.10, "history"),
+]
+
+FEED_BURST = 3
+DRAW_COST = 100
+# 상점 세션의 연속 뽑기 횟수 (MAX_DRAW_COUNT)
+STORE_DRAW_COUNT = 10
+
+
+# --- 합성 데이터 ---
+
+@dataclass
+class SyntheticCouple:
+    uids: tuple[str, str]
+    tokens: dict = field(default_factory=dict)
+    couple_id: str | None = None
+    damago_id: str | None = None
+    food: int = 10
+    answered_daily: bool = False
+    answered_balance: bool = False
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+def _b64(data: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b"=").decode()
+
+
+def mint_token(uid: str, project: str, claims: dict | None = None) -> str:
+    """Auth 에뮬레이터 모드에서 verify_id_token이 받아들이는 서명 없는 ID 토큰"""
+    now = int(time.time())
+    payload = {
+        "iss": f"https://securetoken.google.com/{project}",
+        "aud": project,
+        "auth_time": now,
+        "user_id": uid,
+        "sub": uid,
+        "iat": now,
+        "exp": now + 3600,
+        **(claims or {}),
+    }
+    return f"{_b64({'alg': 'none', 'typ': 'JWT'})}.{_b64(payload)}."
+
+
+# --- 외부 서비스 대역 ---
+
+class RecordingTasksClient:
+    """Cloud Tasks 예약 요청을 기록만 합니다."""
+
+    def __init__(self):
+        self.created = 0
+        self._lock = threading.Lock()
+
+    def queue_path(self, project, location, queue):
+        return f"projects/{project}/locations/{location}/queues/{queue}"
+
+    def create_task(self, request=None, **kwargs):
+        with self._lock:
+            self.created += 1
+            return {"name": f"{request['parent']}/tasks/{self.created}"}
+
+
+class RecordingMessaging:
+    """firebase_admin.messaging.send 대신 전송 요청을 기록만 합니다."""
+
+    def __init__(self):
+        self.sent = 0
+        self._lock = threading.Lock()
+
+    def send(self, message, dry_run=False, app=None):
+        with self._lock:
+            self.sent += 1
+            return f"projects/bench/messages/{self.sent}"
+
+
+class ClaimStore:
+    """memory 백엔드용 custom claim 저장소 (utils.middleware._update_claims 대체)"""
+
+    def __init__(self):
+        self._claims = {}
+
+    def update(self, uid: str, couple_claims: dict) -> None:
+        self._claims[uid] = dict(couple_claims)
+
+    def get(self, uid: str) -> dict:
+        return self._claims.get(uid, {})
+
+
+# --- 호출 ---
+
+# observer(route, 소요 ms, 상태 코드, FirestoreOps) (여러 스레드에서 호출될 수 있음)
+Observer = Callable[[str, float, int, object], None]
+
+
+class Client:
+    def __init__(self, project: str, observer: Observer | None = None):
+        from firebase_functions import https_fn
+        from werkzeug.test import EnvironBuilder
+        import main
+        from utils import router
+        from utils.request_context import request_scope
+
+        self.project = project
+        self.routes = main.API_ROUTES
+        self._request_class = https_fn.Request
+        self._builder = EnvironBuilder
+        self._router = router
+        self._request_scope = request_scope
+        self._observer = observer
+
+    def call(self, route: str, token: str, body: dict | None = None, record: bool = True):
+        headers = {
+            "Authorization": f"Bearer {token}",
+            # 예산은 멱등 키 사용 기준 (키를 쓰지 않는 라우트는 무시)
+            "Idempotency-Key": uuid.uuid4().hex,
+        }
+        req = self._builder(path=f"/api/{route}", method="POST", json=body or {}, headers=headers).get_request(self._request_class)
+        module, name = self.routes[route]
+
+        # 바깥에서 컨텍스트를 열면 router.call이 같은 컨텍스트를 사용하므로 연산 수를 여기서 읽을 수 있습니다.
+        started = time.perf_counter()
+        with self._request_scope(route, req) as context:
+            response = self._router.call(module, name, req)
+        elapsed = (time.perf_counter() - started) * 1000
+
+        if record and self._observer is not None:
+            # 요청 크기에 따라 예산이 다른 라우트(여러 번 뽑기 등)는 예산 이름으로 전달
+            self._observer(context.budget_route or route, elapsed, response.status_code, context.ops)
+
+        try:
+            payload = json.loads(response.get_data(as_text=True))
+        except ValueError:
+            payload = None
+        return response.status_code, payload
+
+
+# --- 워크로드 ---
+
+def setup_couples(client: Client, couples: list, claims_for) -> None:
+    """
+    합성 사용자를 커플로 연결하고 첫 다마고를 뽑습니다.
+    (update_fcm_token, generate_code, connect_couple, adjust_coin, create_damago)
+    """
+    for couple in couples:
+        codes = {}
+        for uid in couple.uids:
+            couple.tokens[uid] = mint_token(uid, client.project)
+            client.call("update_fcm_token", couple.tokens[uid], {"fcmToken": f"fcm-{uid}"})
+            _, payload = client.call("generate_code", couple.tokens[uid])
+            codes[uid] = payload["myCode"]
+
+        first, second = couple.uids
+        status, _ = client.call("connect_couple", couple.tokens[first], {"targetCode": codes[second]})
+        if status != 200:
+            raise RuntimeError(f"connect_couple failed for {first}: {status}")
+
+        # 클라이언트의 토큰 갱신: 커플 claim이 포함된 토큰으로 교체
+        for uid in couple.uids:
+            claims = claims_for(uid)
+            couple.tokens[uid] = mint_token(uid, client.project, claims)
+            couple.couple_id = claims.get("coupleID") or couple.couple_id
+
+        restock(client, couple, first)
+
+
+def restock(client: Client, couple: SyntheticCouple, uid: str, count: int = 1) -> None:
+    """코인을 충전하고 다마고를 count번 뽑습니다. (중복 다마고면 먹이 5개)"""
+    token = couple.tokens[uid]
+    client.call("adjust_coin", token, {"amount": DRAW_COST * count})
+    status, payload = client.call("create_damago", token, {"count": count} if count > 1 else None)
+    if status == 200:
+        draws = payload["results"] if count > 1 else [payload]
+        with couple.lock:
+            couple.damago_id = couple.damago_id or draws[0]["id"]
+            couple.food += 5 * sum(1 for draw in draws if not draw["isNew"])
+
+
+def run_session(client: Client, couple: SyntheticCouple, kind: str, actor_index: int) -> None:
+    uid = couple.uids[actor_index]
+    partner = couple.uids[1 - actor_index]
+    token = couple.tokens[uid]
+
+    if kind == "feed_burst" and couple.food <= 0:
+        kind = "store"
+    if kind == "daily_question" and couple.answered_daily:
+        kind = "history"
+    if kind == "balance_game" and couple.answered_balance:
+        kind = "app_open"
+
+    if kind == "app_open":
+        client.call("get_user_info", token)
+        client.call("check_couple_connection", token)
+
+    elif kind == "feed_burst":
+        for _ in range(min(FEED_BURST, couple.food)):
+            status, payload = client.call("feed", token, {"damagoID": couple.damago_id})
+            if status == 200:
+                with couple.lock:
+                    couple.food = payload["foodCount"]
+
+    elif kind == "store":
+        restock(client, couple, uid, STORE_DRAW_COUNT)
+        client.call("fetch_damago_collection", token)
+
+    elif kind == "poke":
+        client.call("poke", token, {"message": "보고 싶어"})
+
+    elif kind == "daily_question":
+        couple.answered_daily = True
+        _, question = client.call("fetch_daily_question", token)
+        if question and question.get("questionID"):
+            for answerer in (uid, partner):
+                client.call("submit_daily_question", couple.tokens[answerer], {
+                    "questionID": question["questionID"],
+                    "answer": f"{answerer}의 답변",
+                })
+            with couple.lock:
+                couple.food += 3
+
+    elif kind == "balance_game":
+        couple.answered_balance = True
+        _, game = client.call("fetch_balance_game", token)
+        if game and game.get("gameID"):
+            for answerer in (uid, partner):
+                client.call("submit_balance_game", couple.tokens[answerer], {
+                    "gameID": game["gameID"],
+                    "choice": random.choice((1, 2)),
+                })
+
+    elif kind == "history":
+        client.call("fetch_history", token)
+        client.call("fetch_leaderboard", token)
+
+
+def plan_sessions(couples: list, sessions: int, rng: random.Random) -> list:
+    weights = [weight for weight, _ in SESSION_MIX]
+    kinds = [kind for _, kind in SESSION_MIX]
+    return [
+        (rng.randrange(len(couples)), rng.choices(kinds, weights)[0], rng.randrange(2))
+        for _ in range(sessions)
+    ]
+
+
+# --- 실행 ---
+
+def configure_environment(backend: str = "memory", project: str = DEFAULT_PROJECT) -> None:
+    """서비스 모듈이 import 시점에 환경 변수를 읽으므로 import 전에 설정합니다."""
+    os.environ.setdefault("GCLOUD_PROJECT", project)
+    os.environ.setdefault("FIREBASE_CONFIG", json.dumps({"projectId": project}))
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("TRACE_SAMPLE_RATE", "0")
+    # 로컬에서 자격 증명 탐색 시 GCE 메타데이터 서버 확인(수 초)을 건너뜀
+    os.environ.setdefault("NO_GCE_CHECK", "true")
+
+    if backend == "memory":
+        os.environ["FIRESTORE_BACKEND"] = "memory"
+        # 토큰 검증만 에뮬레이터 모드로 동작 (서명 없는 토큰 허용, 네트워크 호출 없음)
+        os.environ.setdefault("FIREBASE_AUTH_EMULATOR_HOST", "127.0.0.1:9099")
+    else:
+        missing = [name for name in ("FIRESTORE_EMULATOR_HOST", "FIREBASE_AUTH_EMULATOR_HOST") if not os.environ.get(name)]
+        if missing:
+            sys.exit(f"emulator backend requires {', '.join(missing)}")
+
+    sys.path.insert(0, str(FUNCTIONS_DIR))
+    warnings.filterwarnings("ignore", category=UserWarning, module="google.cloud.firestore")
+
+
+def replay(
+    backend: str = "memory",
+    couples: int = 50,
+    sessions: int = 1000,
+    concurrency: int = 1,
+    seed: int = 1,
+    code_pool: int | None = None,
+    project: str = DEFAULT_PROJECT,
+    observer: Observer | None = None
+) -> dict:
+    """
+    합성 커플 워크로드를 재생하고 { "codePool", "wallSeconds", "tasksScheduled", "pushesSent" }를 반환합니다.
+    카탈로그 캐시를 미리 채워 warm 인스턴스 기준으로 실행하며,
+    커플 코드 풀은 code_pool 개수만큼 채웁니다. (기본: 합성 사용자 수, 0이면 즉석 생성 경로)
+    """
+    configure_environment(backend, project)
+
+    import utils.tasks
+    tasks_client = RecordingTasksClient()
+    utils.tasks.get_tasks_client = lambda: tasks_client
+
+    from firebase_admin import auth, messaging
+    messaging_stand_in = RecordingMessaging()
+    messaging.send = messaging_stand_in.send
+
+    import utils.catalog as catalog
+    from utils import middleware, router
+    from utils.firestore import get_db
+
+    client = Client(project, observer)
+    run_id = uuid.uuid4().hex[:6]
+    synthetic = [SyntheticCouple(uids=(f"bench-{run_id}-{i}-a", f"bench-{run_id}-{i}-b")) for i in range(couples)]
+
+    if backend == "memory":
+        claim_store = ClaimStore()
+        middleware._update_claims = claim_store.update
+        claims_for = claim_store.get
+    else:
+        for couple in synthetic:
+            for uid in couple.uids:
+                auth.create_user(uid=uid)
+        claims_for = lambda uid: auth.get_user(uid).custom_claims or {}
+
+    # 카탈로그 시드 후 캐시를 채워 warm 인스턴스 기준으로 실행
+    admin_token = mint_token(f"bench-{run_id}-admin", project, {"admin": True})
+    for route in ("seed_daily_questions", "seed_balance_games"):
+        client.call(route, admin_token, record=False)
+    for collection in catalog.CATALOG_COLLECTIONS:
+        catalog.load_catalog(get_db(), collection, force=True)
+    # 서비스 모듈 import와 init 훅(인스턴스 워밍업)이 첫 요청 지연에 섞이지 않도록 미리 실행
+    for module, name in client.routes.values():
+        router.load_handler(module, name)
+    from firebase_functions import core
+    core._with_init(lambda: None)()
+
+    from services import code_service
+    pool_size = couples * 2 if code_pool is None else code_pool
+    if pool_size:
+        code_service.refill_pool(get_db(), target=pool_size)
+
+    started = time.perf_counter()
+    setup_couples(client, synthetic, claims_for)
+
+    rng = random.Random(seed)
+    random.seed(seed)
+    plan = plan_sessions(synthetic, sessions, rng)
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for future in [executor.submit(run_session, client, synthetic[i], kind, actor) for i, kind, actor in plan]:
+                future.result()
+    else:
+        for i, kind, actor in plan:
+            run_session(client, synthetic[i], kind, actor)
+
+    return {
+        "codePool": pool_size,
+        "wallSeconds": time.perf_counter() - started,
+        "tasksScheduled": tasks_client.created,
+        "pushesSent": messaging_stand_in.sent,
+    }
@@ -0,0 +1,67 @@
+"""
+질문 카탈로그 스냅샷/인스턴스 캐시 테스트
+
+- 배포되는 스냅샷(data/catalog.json)이 CSV와 일치하는지 (scripts/build_catalog.py --check와 같은 비교)
+- 시드된 데이터의 contentHash가 스냅샷과 다르면 스냅샷 대신 컬렉션을 읽는지
+- 캐시가 CATALOG_TTL_SECONDS 뒤에 다시 만들어지는지
+"""
+
+import pytest
+
+from utils import catalog, catalog_snapshot
+from utils.constants import PROJECT_ID
+from utils.memory_firestore import create_client
+
+ORDER = 1
+SEEDED_TEXT = "시드된 질문"
+
+
+@pytest.fixture
+def db():
+    """질문 하나(order 1)가 시드된 새 메모리 백엔드 (테스트마다 캐시 초기화)"""
+    client = create_client(PROJECT_ID)
+    client.collection(catalog.DAILY_QUESTIONS).document("q1").set({"order": ORDER, "questionText": SEEDED_TEXT})
+    catalog.invalidate()
+    yield client
+    catalog.invalidate()
+
+
+def _seed_meta(db, content_hash: str) -> None:
+    catalog._meta_ref(db, catalog.DAILY_QUESTIONS).set({"version": 1, "contentHash": content_hash, "ids": {str(ORDER): "q1"}})
+
+
+def _snapshot_text() -> str:
+    return catalog_snapshot.get(catalog.DAILY_QUESTIONS).rows[ORDER]["questionText"]
+
+
+def test_snapshot_matches_csv():
+    compiled = catalog_snapshot.dumps(catalog_snapshot.compile_snapshot())
+    assert catalog_snapshot.SNAPSHOT_PATH.read_text(encoding="utf-8") == compiled
+
+
+def test_matching_hash_uses_snapshot(db):
+    _seed_meta(db, catalog_snapshot.get(catalog.DAILY_QUESTIONS).content_hash)
+
+    entry = catalog.get_by_order(db, catalog.DAILY_QUESTIONS, ORDER)
+    assert entry.id == "q1"
+    assert entry.data["questionText"] == _snapshot_text()
+
+
+def test_mismatched_hash_reads_collection(db):
+    _seed_meta(db, "stale")
+
+    entry = catalog.get_by_order(db, catalog.DAILY_QUESTIONS, ORDER)
+    assert entry.id == "q1"
+    assert entry.data["questionText"] == SEEDED_TEXT
+
+
+def test_cache_expires(db):
+    _seed_meta(db, catalog_snapshot.get(catalog.DAILY_QUESTIONS).content_hash)
+    assert catalog.get_by_order(db, catalog.DAILY_QUESTIONS, ORDER).data["questionText"] == _snapshot_text()
+
+    # 다른 인스턴스가 다른 내용으로 시드한 경우
+    _seed_meta(db, "reseeded")
+    assert catalog.get_by_order(db, catalog.DAILY_QUESTIONS, ORDER).data["questionText"] == _snapshot_text()
+
+    catalog._catalogs[catalog.DAILY_QUESTIONS].loaded_at -= catalog.CATALOG_TTL_SECONDS
+    assert catalog.get_by_order(db, catalog.DAILY_QUESTIONS, ORDER).data["questionText"] == SEEDED_TEXT
@@ -0,0 +1,48 @@
+"""
+엔드포인트별 Firestore 연산 예산 회귀 테스트
+
+tests/harness.py의 합성 커플 워크로드를 메모리 백엔드(utils/memory_firestore.py)에서 한 번 재생하고,
+요청마다 집계한 연산 수를 라우트별로 assert_within_budget에 통과시킵니다.
+
+실행 (functions 디렉터리에서):
+    python -m pytest tests
+"""
+
+from collections import defaultdict
+from dataclasses import replace
+
+import pytest
+
+import harness
+from utils import firestore_budget
+
+# 예산을 선언했지만 합성 워크로드가 호출하지 않는 라우트 (관리자/작업 큐/배치 경로)
+NOT_IN_WORKLOAD = {
+    "withdraw_user",
+    "continue_cascade_delete",
+    "save_live_activity_token",
+    "update_live_activity",
+    "start_live_activity",
+    "retry_push_notification",
+    "make_hungry",
+    "update_user_info",
+}
+
+
+@pytest.fixture(scope="module")
+def recorded_ops() -> dict:
+    """{ 라우트: [요청별 FirestoreOps, ...] } (동시성 1, 고정 시드)"""
+    recorded = defaultdict(list)
+
+    def record(route, ms, status, ops):
+        recorded[route].append(replace(ops))
+
+    harness.replay("memory", couples=10, sessions=200, concurrency=1, seed=1, observer=record)
+    return dict(recorded)
+
+
+@pytest.mark.parametrize("route", sorted(set(firestore_budget.ENDPOINT_BUDGETS) - NOT_IN_WORKLOAD))
+def test_route_within_budget(recorded_ops, route):
+    assert recorded_ops.get(route), f"{route} was not exercised by the workload"
+    for ops in recorded_ops[route]:
+        firestore_budget.assert_within_budget(route, ops)
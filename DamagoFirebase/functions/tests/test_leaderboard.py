@@ -0,0 +1,110 @@
+"""
+다마고 리더보드 테스트 (services/leaderboard_service.py)
+
+- 보여주는 순위(LEADERBOARD_SIZE) 위로 버퍼를 저장하고, 잘린 목록은 마지막 항목보다 낮은 항목을 받지 않는지
+- 탈퇴로 LEADERBOARD_SIZE개보다 줄어들면 표시만 하고, 스케줄러가 다시 계산하는지
+- 다시 계산할 때 커플 문서가 없는 다마고를 빼고, 기존 항목의 도달 시각을 유지하는지
+- 이름 변경이 반영되는지
+"""
+
+import pytest
+
+from services import leaderboard_service as lb
+from utils.constants import PROJECT_ID
+from utils.memory_firestore import create_client
+
+# 커플마다 다마고 하나, 레벨은 모두 다름 (couple-000이 가장 높음)
+COUPLES = lb.STORED_SIZE + 10
+
+
+def _couple_id(i: int) -> str:
+    return f"couple-{i:03d}"
+
+
+@pytest.fixture
+def db():
+    client = create_client(PROJECT_ID)
+    for i in range(COUPLES):
+        client.collection("couples").document(_couple_id(i)).set({"user1UID": f"user-{i}"})
+        client.collection("damagos").document(f"{_couple_id(i)}_Bunny").set({
+            "coupleID": _couple_id(i),
+            "damagoType": "Bunny",
+            "damagoName": f"다마고{i}",
+            "level": COUPLES + 1 - i,
+        })
+    lb._cache["board"] = None
+    lb.rebuild(client)
+    yield client
+    lb._cache["board"] = None
+
+
+def _board(db) -> dict:
+    return lb.load_board(db, force=True)
+
+
+def test_rebuild_stores_buffer(db):
+    board = _board(db)
+    assert len(board["damagos"]) == lb.STORED_SIZE
+    assert not board["damagosComplete"]
+    assert len(lb._format_entries(board["damagos"], None)) == lb.LEADERBOARD_SIZE
+
+
+def test_truncated_board_rejects_entries_below_tail(db):
+    tail = _board(db)["damagos"][-1]
+    entry = lb.make_entry("newcomer_Bunny", {"coupleID": "newcomer", "damagoType": "Bunny", "level": tail["level"] - 1})
+
+    assert not lb.submit(db, entry)
+    assert all(e["damagoID"] != "newcomer_Bunny" for e in _board(db)["damagos"])
+
+
+def _refresh(db, monkeypatch) -> None:
+    monkeypatch.setattr(lb, "get_db", lambda: db)
+    lb.refresh_leaderboard(None)
+
+
+def _withdraw(db, couple_ids: list, delete_damagos: bool = True) -> None:
+    for couple_id in couple_ids:
+        db.collection("couples").document(couple_id).delete()
+        if delete_damagos:
+            db.collection("damagos").document(f"{couple_id}_Bunny").delete()
+        lb.remove_couple(db, couple_id)
+
+
+def test_removal_below_size_schedules_rebuild(db, monkeypatch):
+    removed = [_couple_id(i) for i in range(lb.LEADERBOARD_BUFFER + 1)]
+    _withdraw(db, removed)
+
+    # 탈퇴 요청 안에서는 다시 계산하지 않음
+    board = _board(db)
+    assert len(board["damagos"]) == lb.STORED_SIZE - len(removed)
+    assert lb.board_ref(db).get().to_dict()["needsRebuild"]
+
+    _refresh(db, monkeypatch)
+    board = _board(db)
+    assert len(board["damagos"]) == min(lb.STORED_SIZE, COUPLES - len(removed))
+    assert board["damagos"][0]["coupleID"] == _couple_id(len(removed))
+    assert "needsRebuild" not in lb.board_ref(db).get().to_dict()
+
+
+def test_rebuild_skips_withdrawn_couples_and_keeps_reached_at(db, monkeypatch):
+    reached_at = _board(db)["damagos"][-1]["reachedAt"]
+    # 커플 문서는 지워졌지만 다마고 삭제가 끝나지 않은 경우
+    removed = [_couple_id(i) for i in range(lb.LEADERBOARD_BUFFER + 1)]
+    _withdraw(db, removed, delete_damagos=False)
+
+    _refresh(db, monkeypatch)
+    board = _board(db)
+    for name in lb.BOARD_LISTS:
+        assert all(e["coupleID"] not in removed for e in board[name])
+    kept = next(e for e in board["damagos"] if e["damagoID"] == f"{_couple_id(lb.STORED_SIZE - 1)}_Bunny")
+    assert kept["reachedAt"] == reached_at
+
+
+def test_rename_updates_entries(db):
+    damago_id = f"{_couple_id(0)}_Bunny"
+    assert lb.rename_damago(db, damago_id, "새 이름")
+
+    board = _board(db)
+    for name in lb.BOARD_LISTS:
+        assert next(e for e in board[name] if e["damagoID"] == damago_id)["damagoName"] == "새 이름"
+    assert not lb.rename_damago(db, "unknown_Bunny", "새 이름")
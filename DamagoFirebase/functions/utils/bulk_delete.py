@@ -0,0 +1,122 @@
+"""
+대량 삭제 엔진 (시드 정리, 탈퇴 연쇄 삭제 등 유지보수 작업 공용)
+
+- 문서 참조만 조회합니다. (select([]), 필드 값은 읽지 않음)
+- 커서(마지막 문서 이후)로 페이지를 넘기므로 매 페이지마다 처음부터 다시 조회하지 않습니다.
+- 삭제는 BulkWriter가 여러 배치를 동시에 전송하며, 다음 페이지 조회와 겹쳐서 진행됩니다.
+- 여러 컬렉션(쿼리)은 최대 max_workers개까지 동시에 삭제합니다.
+- 페이지마다 on_progress(name, 누적 삭제 수)를 호출합니다. (여러 스레드에서 호출될 수 있음)
+- 삭제가 MAX_WRITE_ATTEMPTS번 실패한 문서가 있으면 모든 삭제가 끝난 뒤 BulkDeleteError를 발생시킵니다.
+  (남은 문서가 있는데 성공으로 처리하지 않도록)
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from google.cloud.firestore_v1.field_path import FieldPath
+
+DEFAULT_PAGE_SIZE = 500
+DEFAULT_MAX_WORKERS = 4
+# 문서 하나의 삭제를 시도하는 최대 횟수 (BulkWriter 재시도 포함)
+MAX_WRITE_ATTEMPTS = 5
+
+ProgressCallback = Callable[[str, int], None]
+
+
+class BulkDeleteError(Exception):
+    """
+    삭제하지 못한 문서가 남은 경우
+    deleted: 삭제한 수 (delete_collections는 { 이름: 삭제 수 })
+    failed_paths: 삭제하지 못한 문서 경로
+    """
+
+    def __init__(self, deleted, failed_paths: list):
+        super().__init__(f"{len(failed_paths)} deletes failed (e.g. {', '.join(failed_paths[:3])})")
+        self.deleted = deleted
+        self.failed_paths = failed_paths
+
+
+def delete_query(
+    db,
+    query,
+    name: str = "",
+    page_size: int = DEFAULT_PAGE_SIZE,
+    limit: int | None = None,
+    on_progress: ProgressCallback | None = None
+) -> int:
+    """
+    query에 해당하는 문서를 최대 limit개 삭제하고 삭제한 수를 반환합니다.
+    반환값이 limit보다 작으면 남은 문서가 없다는 뜻입니다.
+    삭제하지 못한 문서가 있으면 BulkDeleteError를 발생시킵니다.
+    """
+    deleted = 0
+    cursor = None
+    failed_paths = []
+    writer = db.bulk_writer()
+
+    def on_error(error, bulk_writer) -> bool:
+        if error.attempts < MAX_WRITE_ATTEMPTS:
+            return True
+        failed_paths.append(error.operation.reference.path)
+        return False
+
+    writer.on_write_error(on_error)
+    try:
+        while limit is None or deleted < limit:
+            size = page_size if limit is None else min(page_size, limit - deleted)
+            page_query = query.select([]).order_by(FieldPath.document_id()).limit(size)
+            if cursor is not None:
+                page_query = page_query.start_after(cursor)
+
+            page = list(page_query.stream())
+            for doc in page:
+                writer.delete(doc.reference)
+            deleted += len(page)
+
+            if page and on_progress:
+                on_progress(name, deleted)
+            if len(page) < size:
+                break
+            cursor = page[-1]
+    finally:
+        # 남은 삭제가 모두 끝날 때까지 대기 (close 중에 예약된 재시도는 닫힌 writer에서 실패하므로 flush 먼저)
+        writer.flush()
+        writer.close()
+
+    if failed_paths:
+        raise BulkDeleteError(deleted - len(failed_paths), failed_paths)
+    return deleted
+
+
+def delete_collections(
+    db,
+    queries: dict,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    on_progress: ProgressCallback | None = None
+) -> dict:
+    """
+    queries: { 이름: 컬렉션 또는 쿼리 }
+    모든 쿼리를 동시에 삭제하고 { 이름: 삭제 수 }를 반환합니다.
+    삭제하지 못한 문서가 있으면 모든 쿼리가 끝난 뒤 BulkDeleteError(deleted={ 이름: 삭제 수 })를 발생시킵니다.
+    """
+    if not queries:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(queries))) as executor:
+        futures = {
+            name: executor.submit(delete_query, db, query, name, page_size, None, on_progress)
+            for name, query in queries.items()
+        }
+        counts = {}
+        failed_paths = []
+        for name, future in futures.items():
+            try:
+                counts[name] = future.result()
+            except BulkDeleteError as e:
+                counts[name] = e.deleted
+                failed_paths.extend(e.failed_paths)
+
+    if failed_paths:
+        raise BulkDeleteError(counts, failed_paths)
+    return counts
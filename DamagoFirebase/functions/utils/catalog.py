@@ -0,0 +1,173 @@
+"""
+질문 카탈로그(dailyQuestions, balanceGames) 인스턴스 캐시
+
+카탈로그는 시드로만 바뀌므로 인스턴스마다 한 번 만들어 order -> 문서, 문서 ID -> 문서로 보관합니다.
+- 질문 내용: 함수와 함께 배포된 스냅샷(utils/catalog_snapshot.py)
+- 문서 ID: 시드 동기화가 기록한 catalogMeta/{collection}의 ids 맵 (인스턴스당 한 번 조회)
+요청마다 where("order", "==", n) 쿼리나 질문 문서 조회를 보내는 대신 메모리에서 찾고,
+캐시에 없는 항목(배포 이후 추가된 시드)만 직접 조회합니다.
+
+캐시는 CATALOG_TTL_SECONDS마다 다시 만듭니다. (다른 인스턴스에서 시드가 바뀐 경우)
+- catalogMeta의 contentHash가 배포된 스냅샷과 같을 때만 스냅샷을 사용합니다. (메타 문서 한 번 조회)
+- ids 맵이 없거나 (시드 동기화 이전 데이터) 해시가 다르면 (스냅샷과 다른 CSV로 시드한 경우) 컬렉션 전체를 읽습니다.
+"""
+
+import time
+from dataclasses import dataclass
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+DAILY_QUESTIONS = "dailyQuestions"
+BALANCE_GAMES = "balanceGames"
+CATALOG_COLLECTIONS = (DAILY_QUESTIONS, BALANCE_GAMES)
+
+# 시드 동기화마다 올라가는 카탈로그 버전과 order -> 문서 ID 맵 (catalogMeta/{collection})
+CATALOG_META_COLLECTION = "catalogMeta"
+
+# 다른 인스턴스에서 시드가 바뀐 경우를 위해 캐시를 주기적으로 다시 만듭니다.
+CATALOG_TTL_SECONDS = 10 * 60
+
+
+@dataclass(frozen=True)
+class CatalogEntry:
+    id: str
+    data: dict
+
+
+@dataclass
+class _Catalog:
+    loaded_at: float
+    by_order: dict[int, CatalogEntry]
+    by_id: dict[str, CatalogEntry]
+
+    def add(self, entry: CatalogEntry) -> None:
+        order = entry.data.get("order")
+        if isinstance(order, int):
+            self.by_order[order] = entry
+        self.by_id[entry.id] = entry
+
+
+_catalogs: dict[str, _Catalog] = {}
+
+
+def _meta_ref(db, collection: str):
+    return db.collection(CATALOG_META_COLLECTION).document(collection)
+
+
+def _load_from_snapshot(db, collection: str) -> _Catalog | None:
+    from utils import catalog_snapshot
+
+    meta = _meta_ref(db, collection).get()
+    meta_data = meta.to_dict() if meta.exists else {}
+    ids = meta_data.get("ids")
+    if not ids:
+        return None
+
+    snapshot = catalog_snapshot.get(collection)
+    if meta_data.get("contentHash") != snapshot.content_hash:
+        logger.warning(
+            "Catalog snapshot does not match seeded data", collection=collection,
+            snapshotHash=snapshot.content_hash, seededHash=meta_data.get("contentHash"), version=meta_data.get("version")
+        )
+        return None
+
+    catalog = _Catalog(time.monotonic(), {}, {})
+    for order, row in snapshot.rows.items():
+        doc_id = ids.get(str(order))
+        if doc_id:
+            catalog.add(CatalogEntry(doc_id, row))
+    return catalog
+
+
+def _load_from_collection(db, collection: str) -> _Catalog:
+    catalog = _Catalog(time.monotonic(), {}, {})
+    for doc in db.collection(collection).stream():
+        catalog.add(CatalogEntry(doc.id, doc.to_dict()))
+    return catalog
+
+
+def _get_catalog(db, collection: str, force: bool = False) -> _Catalog:
+    cached = _catalogs.get(collection)
+    if cached and not force and time.monotonic() - cached.loaded_at < CATALOG_TTL_SECONDS:
+        return cached
+
+    catalog = _load_from_snapshot(db, collection) or _load_from_collection(db, collection)
+    _catalogs[collection] = catalog
+    return catalog
+
+
+def load_catalog(db, collection: str, force: bool = False) -> dict[int, CatalogEntry]:
+    """카탈로그 전체를 order 기준으로 반환합니다. (캐시 사용)"""
+    return _get_catalog(db, collection, force).by_order
+
+
+def get_by_order(db, collection: str, order: int) -> CatalogEntry | None:
+    """order에 해당하는 카탈로그 항목을 반환합니다. 없으면 None."""
+    catalog = _get_catalog(db, collection)
+    entry = catalog.by_order.get(order)
+    if entry is not None:
+        return entry
+
+    # 캐시 이후 추가된 항목일 수 있으므로 직접 조회
+    doc = next(db.collection(collection).where("order", "==", order).limit(1).stream(), None)
+    if doc is None:
+        return None
+
+    entry = CatalogEntry(doc.id, doc.to_dict())
+    catalog.add(entry)
+    return entry
+
+
+def get_by_ids(db, collection: str, doc_ids: list) -> dict[str, CatalogEntry]:
+    """문서 ID들에 해당하는 카탈로그 항목을 { ID: 항목 }으로 반환합니다. (캐시에 없는 ID만 get_all로 조회)"""
+    catalog = _get_catalog(db, collection)
+    found = {doc_id: catalog.by_id[doc_id] for doc_id in doc_ids if doc_id in catalog.by_id}
+
+    missing = [doc_id for doc_id in dict.fromkeys(doc_ids) if doc_id not in found]
+    if missing:
+        for doc in db.get_all([db.collection(collection).document(doc_id) for doc_id in missing]):
+            if doc.exists:
+                entry = CatalogEntry(doc.id, doc.to_dict())
+                catalog.add(entry)
+                found[doc.id] = entry
+    return found
+
+
+def get_by_id(db, collection: str, doc_id: str) -> CatalogEntry | None:
+    """문서 ID에 해당하는 카탈로그 항목을 반환합니다. 없으면 None."""
+    return get_by_ids(db, collection, [doc_id]).get(doc_id)
+
+
+def bump_version(db, collection: str, content_hash: str, ids: dict) -> int:
+    """
+    카탈로그 버전을 1 올리고 새 버전을 반환합니다. (시드 동기화 후 호출)
+    ids: { str(order): 문서 ID } (런타임이 질문 문서를 읽지 않고 ID를 찾는 데 사용)
+    """
+    import google.cloud.firestore
+    from firebase_admin import firestore
+
+    meta_ref = _meta_ref(db, collection)
+
+    @google.cloud.firestore.transactional
+    def run_bump_transaction(transaction):
+        snapshot = meta_ref.get(transaction=transaction)
+        version = (snapshot.get("version") if snapshot.exists else 0) + 1
+        transaction.set(meta_ref, {
+            "version": version,
+            "contentHash": content_hash,
+            "ids": ids,
+            "updatedAt": firestore.SERVER_TIMESTAMP
+        })
+        return version
+
+    return run_bump_transaction(db.transaction())
+
+
+def invalidate(collection: str | None = None) -> None:
+    """캐시를 비웁니다. (시드 추가/삭제 후 호출)"""
+    if collection is None:
+        _catalogs.clear()
+    else:
+        _catalogs.pop(collection, None)
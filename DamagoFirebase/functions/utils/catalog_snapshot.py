@@ -0,0 +1,143 @@
+"""
+질문 카탈로그 스냅샷 (data/catalog.json)
+
+data/*.csv를 빌드 단계(scripts/build_catalog.py)에서 검증하고 작은 JSON으로 컴파일하여 함수 소스와 함께 배포합니다.
+런타임은 CSV를 파싱하지 않고 처음 사용할 때 스냅샷을 한 번 읽습니다.
+- 시드(seed_service): 스냅샷의 행과 행별 contentHash로 달라진 문서만 기록
+- 인스턴스 캐시(utils/catalog.py): 질문 내용은 스냅샷에서, 문서 ID는 catalogMeta의 ids 맵에서 읽음
+
+스냅샷 형식
+    { "format": 1,
+      "collections": { 컬렉션: { "source": CSV 파일, "fields": [필드...], "contentHash": 전체 해시,
+                                 "orders": [order...], "hashes": [행 해시...], "rows": [[필드 값...]...] } } }
+orders는 오름차순 정렬된 order 인덱스이며 hashes, rows와 같은 위치를 가리킵니다.
+스냅샷은 수십 KB라 메모리 매핑 없이 한 번에 읽습니다.
+"""
+
+import hashlib
+import json
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+SNAPSHOT_FORMAT = 1
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+SNAPSHOT_PATH = DATA_DIR / "catalog.json"
+
+
+@dataclass(frozen=True)
+class CatalogSource:
+    """CSV 파일과 열 이름 -> 필드 이름 (첫 열은 order)"""
+    filename: str
+    columns: dict
+
+
+SOURCES = {
+    "dailyQuestions": CatalogSource("DailyQuestionResource.csv", {
+        "번호": "order",
+        "질문 내용": "questionText"
+    }),
+    "balanceGames": CatalogSource("BalanceGameResource.csv", {
+        "번호": "order",
+        "질문": "questionText",
+        "선택지 1": "option1",
+        "선택지 2": "option2"
+    }),
+}
+
+
+@dataclass(frozen=True)
+class CollectionSnapshot:
+    content_hash: str
+    rows: dict[int, dict]
+    hashes: dict[int, str]
+
+    def ordered_rows(self) -> list:
+        return [self.rows[order] for order in sorted(self.rows)]
+
+
+def content_hash(value) -> str:
+    """행(또는 행 해시 맵) 내용의 해시 (필드 순서와 무관)"""
+    encoded = json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:16]
+
+
+def _read_csv(source: CatalogSource) -> list:
+    import csv
+
+    path = DATA_DIR / source.filename
+    with open(path, "r", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        missing = [column for column in source.columns if column not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"{source.filename}: missing columns {missing}")
+
+        rows = []
+        for line, record in enumerate(reader, start=2):
+            row = {}
+            for column, field in source.columns.items():
+                value = (record[column] or "").strip()
+                if field == "order":
+                    if not value.isdigit() or int(value) < 1:
+                        raise ValueError(f"{source.filename}:{line}: invalid order {value!r}")
+                    row[field] = int(value)
+                elif not value:
+                    raise ValueError(f"{source.filename}:{line}: empty {column}")
+                else:
+                    row[field] = value
+            rows.append(row)
+    return rows
+
+
+def compile_snapshot() -> dict:
+    """data/*.csv를 검증하여 스냅샷(dict)으로 컴파일합니다. 잘못된 행이 있으면 ValueError."""
+    collections = {}
+    for collection, source in SOURCES.items():
+        rows = _read_csv(source)
+
+        counts = Counter(row["order"] for row in rows)
+        duplicated = sorted(order for order, count in counts.items() if count > 1)
+        if duplicated:
+            raise ValueError(f"{source.filename}: duplicated order {duplicated}")
+
+        rows.sort(key=lambda row: row["order"])
+        fields = [field for field in source.columns.values() if field != "order"]
+        hashes = [content_hash(row) for row in rows]
+        collections[collection] = {
+            "source": source.filename,
+            "fields": fields,
+            "contentHash": content_hash({str(row["order"]): digest for row, digest in zip(rows, hashes)}),
+            "orders": [row["order"] for row in rows],
+            "hashes": hashes,
+            "rows": [[row[field] for field in fields] for row in rows],
+        }
+    return {"format": SNAPSHOT_FORMAT, "collections": collections}
+
+
+def dumps(snapshot: dict) -> str:
+    # 행 단위 줄바꿈 없이 저장 (diff보다 크기 우선, 원본은 CSV)
+    return json.dumps(snapshot, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+@lru_cache(maxsize=1)
+def load() -> dict[str, CollectionSnapshot]:
+    """배포된 스냅샷을 읽습니다. (인스턴스당 한 번)"""
+    raw = json.loads(SNAPSHOT_PATH.read_text(encoding="utf-8"))
+    if raw.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"Unsupported catalog snapshot format: {raw.get('format')}")
+
+    snapshots = {}
+    for collection, compiled in raw["collections"].items():
+        fields = compiled["fields"]
+        rows = {}
+        hashes = {}
+        for order, digest, values in zip(compiled["orders"], compiled["hashes"], compiled["rows"]):
+            rows[order] = {"order": order, **dict(zip(fields, values))}
+            hashes[order] = digest
+        snapshots[collection] = CollectionSnapshot(compiled["contentHash"], rows, hashes)
+    return snapshots
+
+
+def get(collection: str) -> CollectionSnapshot:
+    return load()[collection]
@@ -11,8 +11,29 @@ PROJECT_ID = os.environ.get("GCLOUD_PROJECT", "damago-dev")
 LOCATION = "asia-northeast3"
 QUEUE_NAME = "make-hungry-queue"
 PUSH_RETRY_QUEUE_NAME = "push-retry-queue"
+CASCADE_DELETE_QUEUE_NAME = "cascade-delete-queue"
 HUNGER_DELAY_SECONDS = 4 * 60 * 60 # 4시간
 
+# 커플 재화(코인/먹이) 지급 샤드 개수 (0이면 커플 문서에 직접 기록)
+# 샤드 사용 시 지급분은 fold_economy_shards 주기마다 커플 문서에 합산됩니다. (차감은 커플 문서에 바로 기록)
+# 기본값은 0입니다. iOS 클라이언트가 couples.totalCoin/foodCount를 직접 읽으므로(ObserveGlobalStateUseCase),
+# 샤드를 켜면 합산 전까지 지급분(make_hungry 먹이, 코인 충전)이 클라이언트와 응답 잔액에 보이지 않습니다.
+ECONOMY_SHARD_COUNT = int(os.environ.get("ECONOMY_SHARD_COUNT", "0"))
+
+# 커플 코드 풀 (미리 예약해 둔 코드 개수)
+# refill_code_pool 주기마다 목표 개수까지 채우며, 하한 미만이면 경고 로그를 남깁니다.
+CODE_POOL_TARGET = int(os.environ.get("CODE_POOL_TARGET", "500"))
+CODE_POOL_LOW_WATER = int(os.environ.get("CODE_POOL_LOW_WATER", "100"))
+
+# Firestore 백엔드 ("memory"이면 프로세스 내 메모리 구현 사용, 테스트/벤치마크용)
+FIRESTORE_BACKEND = os.environ.get("FIRESTORE_BACKEND", "firestore")
+
+# 통합 api 함수의 최소 인스턴스 수 (워밍업된 인스턴스를 유지하여 콜드 스타트 제거, 유휴 비용 발생)
+API_MIN_INSTANCES = int(os.environ.get("API_MIN_INSTANCES", "0"))
+
+# 단계별 소요 시간(Server-Timing, 로그 spans)을 기록할 요청 비율 (0.0 ~ 1.0)
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", "0.1"))
+
 # --- Game Balance Constants ---
 
 FEED_EXP = 10  # 1회 밥주기 경험치
@@ -80,6 +101,38 @@ AVAILABLE_DAMAGO_TYPES = [
     "CatWizard",
 ]
 
+# --- Gacha (create_damago) ---
+
+DRAW_COST = 100              # 뽑기 1회 코인
+MAX_DRAW_COUNT = 10          # 한 번에 뽑을 수 있는 최대 횟수
+DUPLICATE_DRAW_FOOD = 5      # 이미 가진 캐릭터를 뽑으면 지급하는 먹이
+
+# 다마고 타입별 등급 (없는 타입은 common)
+DAMAGO_RARITY = {
+    "CatSiamese": "rare",
+    "CatTiger": "rare",
+    "CatOddEye": "rare",
+    "CatThreeColored": "rare",
+
+    "CatBatman": "epic",
+    "CatChristmas": "epic",
+    "CatEgypt": "epic",
+    "CatWizard": "epic",
+}
+
+# 등급별 뽑기 가중치 (같은 등급 안에서는 균등)
+RARITY_WEIGHTS = {
+    "common": 60,
+    "rare": 30,
+    "epic": 10,
+}
+
+# 천장: 해당 등급을 (값 - 1)번 연속 뽑지 못하면 다음 뽑기는 그 등급에서 나옵니다. (비우면 천장 없음)
+# 카운터는 커플 문서의 gachaPity 맵에 저장됩니다.
+PITY_THRESHOLDS = {
+    "epic": 30,
+}
+
 # DamagoType rawValue → 기본 이름 (DamagoAttributes.DamagoType.defaultName과 동기화)
 DAMAGO_TYPE_DEFAULT_NAMES = {
     "CatBasicBlack": "검정냥",
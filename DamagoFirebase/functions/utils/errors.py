@@ -26,6 +26,7 @@ class NotFound:
     DAMAGO = ErrorInfo("Damago not found", 404)
     NO_MORE_QUESTIONS = ErrorInfo("No more questions available", 404)
     NO_MORE_BALANCE_GAMES = ErrorInfo("No more balance games available", 404)
+    ROUTE = ErrorInfo("Route not found", 404)
 
 
 class BadRequest:
@@ -47,11 +48,18 @@ class BadRequest:
         "Start Token not found or Live Activity disabled", 400
     )
     NOT_ENOUGH_COINS = ErrorInfo("Not enough coins", 400)
+    NOT_ENOUGH_FOOD = ErrorInfo("Not enough food", 400)
     USER_HAS_NO_COUPLE = ErrorInfo("User has no couple", 400)
+    INVALID_DRAW_COUNT = ErrorInfo("Invalid draw count", 400)
+
+
+class Unprocessable:
+    IDEMPOTENCY_KEY_REUSED = ErrorInfo("Idempotency-Key was already used with a different request body", 422)
 
 
 class Forbidden:
     ADMIN_REQUIRED = ErrorInfo("Unauthorized: Admin access required", 403)
+    NOT_COUPLE_MEMBER = ErrorInfo("Not a member of this couple", 403)
 
 
 class Internal:
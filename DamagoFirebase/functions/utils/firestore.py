@@ -1,4 +1,189 @@
+from functools import lru_cache
 from firebase_admin import firestore
+from utils import request_context
+from utils.constants import FIRESTORE_BACKEND, PROJECT_ID
+
 
 def get_db():
-    return firestore.client()
+    db = _memory_client() if FIRESTORE_BACKEND == "memory" else firestore.client()
+    if not getattr(db, "_request_hooks_installed", False):
+        _install_request_hooks(db)
+    return db
+
+
+@lru_cache(maxsize=None)
+def _memory_client():
+    """FIRESTORE_BACKEND=memory: 인스턴스 전역에서 공유하는 메모리 백엔드 클라이언트 (utils/memory_firestore.py)"""
+    from utils.memory_firestore import create_client
+    return create_client(PROJECT_ID)
+
+
+def _install_request_hooks(db) -> None:
+    """
+    GAPIC 호출을 가로채 요청 컨텍스트에 연결합니다.
+    - 읽기/쓰기/쿼리/트랜잭션 수 집계 (요청 요약 로그, Server-Timing 헤더)
+    - 커밋(트랜잭션, 배치, 단건 쓰기 모두)된 문서를 요청 memo에서 제거
+    클라이언트는 인스턴스 전역에서 공유되므로 한 번만 설치합니다.
+    """
+    api = db._firestore_api
+    original_commit = api.commit
+    original_batch_write = api.batch_write
+    original_batch_get_documents = api.batch_get_documents
+    original_run_query = api.run_query
+    original_run_aggregation_query = api.run_aggregation_query
+    original_begin_transaction = api.begin_transaction
+
+    def commit(*args, request=None, **kwargs):
+        try:
+            response = original_commit(*args, request=request, **kwargs)
+        except Exception:
+            _on_writes(request, committed=False)
+            raise
+        _on_writes(request, committed=True)
+        return response
+
+    def batch_write(*args, request=None, **kwargs):
+        try:
+            response = original_batch_write(*args, request=request, **kwargs)
+        except Exception:
+            _on_writes(request, committed=False)
+            raise
+        _on_writes(request, committed=True)
+        return response
+
+    def batch_get_documents(*args, **kwargs):
+        return _count_document_reads(original_batch_get_documents(*args, **kwargs))
+
+    def run_query(*args, **kwargs):
+        return _count_query_reads(original_run_query(*args, **kwargs))
+
+    def run_aggregation_query(*args, **kwargs):
+        context = request_context.current()
+        if context is not None:
+            context.ops.queries += 1
+            context.ops.reads += 1
+        return original_run_aggregation_query(*args, **kwargs)
+
+    def begin_transaction(*args, request=None, **kwargs):
+        _on_begin_transaction(request)
+        return original_begin_transaction(*args, request=request, **kwargs)
+
+    api.commit = commit
+    api.batch_write = batch_write
+    api.batch_get_documents = batch_get_documents
+    api.run_query = run_query
+    api.run_aggregation_query = run_aggregation_query
+    api.begin_transaction = begin_transaction
+    db._request_hooks_installed = True
+
+
+def _count_document_reads(responses):
+    context = request_context.current()
+    for response in responses:
+        # 트랜잭션 시작 응답 등 문서가 없는 응답은 제외 (없는 문서도 읽기 1회로 과금)
+        if context is not None and response._pb.WhichOneof("result"):
+            context.ops.reads += 1
+        yield response
+
+
+def _count_query_reads(responses):
+    context = request_context.current()
+    if context is not None:
+        # 결과가 없는 쿼리도 읽기 1회로 과금되므로 첫 문서는 미리 집계
+        context.ops.queries += 1
+        context.ops.reads += 1
+
+    documents = 0
+    for response in responses:
+        if response._pb.HasField("document"):
+            documents += 1
+            if context is not None and documents > 1:
+                context.ops.reads += 1
+        yield response
+
+
+def _on_begin_transaction(request) -> None:
+    context = request_context.current()
+    if context is None:
+        return
+    context.ops.transactions += 1
+    options = request.get("options") if isinstance(request, dict) else None
+    if options is not None and options.read_write.retry_transaction:
+        context.ops.retries += 1
+
+
+def _on_writes(request, committed: bool) -> None:
+    context = request_context.current()
+    if context is None or request is None:
+        return
+    paths = _written_paths(request)
+    if committed:
+        context.ops.writes += len(paths)
+    # 실패한 커밋도 일부 반영되었을 수 있으므로(batch_write) memo는 항상 비웁니다.
+    for path in paths:
+        context.memo.invalidate(path)
+
+
+def _written_paths(request) -> list:
+    writes = request.get("writes", []) if isinstance(request, dict) else getattr(request, "writes", [])
+    paths = []
+    for write in writes:
+        name = write.update.name or write.delete or write.transform.document
+        if name:
+            # projects/{p}/databases/{d}/documents/users/abc -> users/abc
+            paths.append(name.split("/documents/", 1)[-1])
+    return paths
+
+
+def get_snapshot(ref):
+    """
+    트랜잭션 밖에서 문서를 읽습니다.
+    요청 컨텍스트 안에서는 같은 문서를 다시 읽을 때 첫 스냅샷을 재사용합니다.
+    """
+    context = request_context.current()
+    if context is None:
+        return ref.get()
+
+    snapshot = context.memo.get(ref.path)
+    if snapshot is None:
+        snapshot = ref.get()
+        context.memo.put(ref.path, snapshot)
+    return snapshot
+
+
+def get_all_in_transaction(transaction, refs) -> list:
+    """
+    트랜잭션 안에서 여러 문서를 한 번에 읽고 refs 순서대로 반환합니다.
+    읽은 스냅샷을 요청 memo에 넣어 두므로, 커밋 후 같은 문서를 get_snapshot으로 다시 읽으면 조회하지 않습니다.
+    (이 트랜잭션이 쓴 문서는 커밋 시 memo에서 제거되며, 재시도하면 다시 읽은 스냅샷으로 덮어씁니다)
+    """
+    snapshots = {snapshot.reference.path: snapshot for snapshot in transaction.get_all(refs)}
+    context = request_context.current()
+    if context is not None:
+        for path, snapshot in snapshots.items():
+            context.memo.put(path, snapshot)
+    return [snapshots[ref.path] for ref in refs]
+
+
+def get_snapshots(db, refs) -> list:
+    """get_snapshot의 다건 버전. memo에 없는 문서만 get_all로 읽고 refs 순서대로 반환합니다."""
+    context = request_context.current()
+    if context is None:
+        snapshots = {snapshot.reference.path: snapshot for snapshot in db.get_all(refs)}
+        return [snapshots[ref.path] for ref in refs]
+
+    found = {}
+    missing = []
+    for ref in refs:
+        snapshot = context.memo.get(ref.path)
+        if snapshot is None:
+            missing.append(ref)
+        else:
+            found[ref.path] = snapshot
+
+    if missing:
+        for snapshot in db.get_all(missing):
+            context.memo.put(snapshot.reference.path, snapshot)
+            found[snapshot.reference.path] = snapshot
+
+    return [found[ref.path] for ref in refs]
@@ -0,0 +1,91 @@
+"""
+엔드포인트별 Firestore 연산 예산
+
+요청마다 집계한 연산 수(utils/request_context.FirestoreOps)를 선언된 예산과 비교합니다.
+- 운영: 초과 시 요청 요약 로그에 budgetExceeded 필드로 남습니다.
+- 테스트: tests/test_firestore_budget.py가 합성 워크로드를 메모리 백엔드에서 재생하고
+  요청마다 assert_within_budget으로 확인합니다. (python -m pytest tests)
+- 벤치마크: scripts/bench_endpoints.py --check-budget
+
+예산은 정상 경로의 최댓값 기준입니다. (멱등 키 사용, 커플 claim 없는 토큰 포함)
+None인 항목은 데이터 크기에 비례하여 검사하지 않습니다.
+요청 크기에 따라 연산 수가 달라지는 라우트는 핸들러가 request_context.set_budget_route로 다른 예산을 고릅니다.
+수치는 scripts/bench_endpoints.py의 합성 워크로드 측정값(opsMax)으로 확인합니다.
+카탈로그 캐시 만료 시 재적재 읽기는 예산에 포함하지 않으므로 warm 인스턴스 기준으로 비교합니다.
+"""
+
+from dataclasses import dataclass
+
+from utils.constants import ECONOMY_SHARD_COUNT, MAX_DRAW_COUNT
+
+
+@dataclass(frozen=True)
+class OpBudget:
+    reads: int | None
+    writes: int | None
+    queries: int | None = 0
+    transactions: int | None = 0
+
+
+ENDPOINT_BUDGETS = {
+    "generate_code": OpBudget(reads=4, writes=3, queries=2, transactions=1),
+    "connect_couple": OpBudget(reads=4, writes=7, transactions=1),
+    "withdraw_user": OpBudget(reads=None, writes=None, queries=None),
+    "continue_cascade_delete": OpBudget(reads=None, writes=None, queries=None),
+    "poke": OpBudget(reads=2, writes=2, transactions=1),
+    "save_live_activity_token": OpBudget(reads=0, writes=1),
+    "update_live_activity": OpBudget(reads=1, writes=0),
+    "start_live_activity": OpBudget(reads=1, writes=0),
+    "retry_push_notification": OpBudget(reads=1, writes=0),
+    # 레벨업이 리더보드 컷 이상이면 리더보드 캐시 조회 + 트랜잭션(읽기/쓰기 1회)이 추가됨
+    "feed": OpBudget(reads=8, writes=7, transactions=2),
+    # 1회 뽑기 (접힌 잔액이 부족하면 재화 샤드를 모두 읽어 합침)
+    "create_damago": OpBudget(reads=4 + ECONOMY_SHARD_COUNT, writes=6, transactions=1),
+    # 여러 번 뽑기, MAX_DRAW_COUNT회 기준 (뽑힌 다마고 문서 조회/생성이 횟수만큼 늘어남)
+    "create_damago_multi": OpBudget(reads=3 + MAX_DRAW_COUNT + ECONOMY_SHARD_COUNT, writes=5 + MAX_DRAW_COUNT, transactions=1),
+    # 커플 ID(claim 없을 때 1) + 커플 문서(구성원 확인) + 모든 다마고 타입 문서 (AVAILABLE_DAMAGO_TYPES 11개)
+    "fetch_damago_collection": OpBudget(reads=13, writes=0),
+    "fetch_leaderboard": OpBudget(reads=2, writes=0),
+    "make_hungry": OpBudget(reads=4, writes=4),
+    "get_user_info": OpBudget(reads=7, writes=1, transactions=1),
+    "update_fcm_token": OpBudget(reads=1, writes=1),
+    # 순위에 있는 다마고의 이름을 바꾸면 리더보드 캐시 조회 + 트랜잭션(읽기/쓰기 1회)이 추가됨
+    "update_user_info": OpBudget(reads=5, writes=7, transactions=1),
+    "adjust_coin": OpBudget(reads=4, writes=4, transactions=1),
+    "check_couple_connection": OpBudget(reads=1, writes=0),
+    "fetch_daily_question": OpBudget(reads=4, writes=1),
+    "fetch_history": OpBudget(reads=22, writes=0, queries=1),
+    # 질문 문서는 카탈로그 캐시에서 찾고, 트랜잭션 안에서 존재만 다시 확인 (커플/파트너 문서와 같은 get_all)
+    "submit_daily_question": OpBudget(reads=7, writes=6, transactions=1),
+    "fetch_balance_game": OpBudget(reads=3, writes=0),
+    "submit_balance_game": OpBudget(reads=6, writes=6, transactions=1),
+}
+
+_FIELDS = ("reads", "writes", "queries", "transactions")
+
+
+def check_budget(route: str, ops) -> list:
+    """예산을 초과한 항목을 반환합니다. 예산이 선언되지 않은 라우트는 검사하지 않습니다."""
+    budget = ENDPOINT_BUDGETS.get(route)
+    if budget is None:
+        return []
+
+    violations = []
+    for name in _FIELDS:
+        limit = getattr(budget, name)
+        actual = getattr(ops, name)
+        if name == "transactions":
+            # 경합으로 인한 재시도는 코드 회귀가 아니므로 제외
+            actual -= ops.retries
+        elif name == "reads" and limit is not None:
+            # 재시도마다 트랜잭션 안의 읽기가 반복되므로 재시도 횟수만큼 허용
+            limit *= ops.retries + 1
+        if limit is not None and actual > limit:
+            violations.append(f"{name} {actual} > {limit}")
+    return violations
+
+
+def assert_within_budget(route: str, ops) -> None:
+    """테스트/벤치마크용: 예산 초과 시 AssertionError"""
+    violations = check_budget(route, ops)
+    assert not violations, f"{route} exceeded Firestore budget: {', '.join(violations)}"
@@ -0,0 +1,104 @@
+"""
+다마고 뽑기 확률표 (가중치 + 천장)
+
+- 확률: utils/constants의 RARITY_WEIGHTS를 등급 안 타입 수로 나눈 타입별 가중치
+- 표본 추출: 인스턴스당 한 번 만든 별칭 표(alias table, Vose)로 뽑기 1회를 O(1)에 수행
+- 천장(PITY_THRESHOLDS): 등급별로 연속으로 뽑지 못한 횟수를 세어, 기준에 닿으면 그 등급의 별칭 표에서 뽑음
+  카운터는 호출하는 쪽(create_damago 트랜잭션)이 커플 문서에 저장합니다.
+"""
+
+import random
+from functools import lru_cache
+
+from utils.constants import AVAILABLE_DAMAGO_TYPES, DAMAGO_RARITY, RARITY_WEIGHTS, PITY_THRESHOLDS
+
+DEFAULT_RARITY = "common"
+
+
+class AliasTable:
+    """가중치가 있는 항목을 O(1)에 뽑는 별칭 표 (Vose's alias method)"""
+
+    def __init__(self, items: list, weights: list):
+        if not items or len(items) != len(weights) or any(w < 0 for w in weights) or sum(weights) <= 0:
+            raise ValueError("AliasTable needs items with non-negative weights and a positive total")
+
+        n = len(items)
+        total = sum(weights)
+        scaled = [w * n / total for w in weights]
+        self.items = list(items)
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        # 남은 항목은 부동소수점 오차만 있으므로 확률 1로 둠
+
+    def sample(self, rng=random):
+        i = rng.randrange(len(self.items))
+        return self.items[i] if rng.random() < self.prob[i] else self.items[self.alias[i]]
+
+
+def rarity_of(damago_type: str) -> str:
+    return DAMAGO_RARITY.get(damago_type, DEFAULT_RARITY)
+
+
+def _types_by_rarity() -> dict:
+    by_rarity = {}
+    for damago_type in AVAILABLE_DAMAGO_TYPES:
+        by_rarity.setdefault(rarity_of(damago_type), []).append(damago_type)
+    return by_rarity
+
+
+def _type_weights() -> dict:
+    """{ 다마고 타입: 가중치 } (등급 가중치를 등급 안 타입 수로 나눔)"""
+    return {
+        damago_type: RARITY_WEIGHTS.get(rarity, 0) / len(types)
+        for rarity, types in _types_by_rarity().items()
+        for damago_type in types
+    }
+
+
+def drop_rates() -> dict:
+    """{ 다마고 타입: 1회 뽑기 확률 } (천장 제외)"""
+    weights = _type_weights()
+    total = sum(weights.values())
+    return {damago_type: weight / total for damago_type, weight in weights.items()}
+
+
+@lru_cache(maxsize=1)
+def _tables() -> tuple:
+    """(전체 별칭 표, { 등급: 등급 안 균등 별칭 표 })"""
+    weights = _type_weights()
+    rarity_tables = {rarity: AliasTable(types, [1] * len(types)) for rarity, types in _types_by_rarity().items()}
+    return AliasTable(list(weights), list(weights.values())), rarity_tables
+
+
+def draw(count: int, pity: dict | None = None, rng=random) -> tuple[list, dict]:
+    """
+    count번 뽑아 (다마고 타입 목록, 갱신된 천장 카운터)를 반환합니다.
+    pity: { 등급: 연속으로 뽑지 못한 횟수 } (커플 문서의 gachaPity)
+    """
+    table, rarity_tables = _tables()
+    counters = {
+        rarity: int((pity or {}).get(rarity, 0))
+        for rarity in PITY_THRESHOLDS if rarity in rarity_tables
+    }
+    # 여러 등급이 동시에 천장에 닿으면 가중치가 낮은(더 희귀한) 등급부터
+    ordered = sorted(counters, key=lambda rarity: RARITY_WEIGHTS.get(rarity, 0))
+
+    results = []
+    for _ in range(count):
+        forced = next((r for r in ordered if counters[r] + 1 >= PITY_THRESHOLDS[r]), None)
+        damago_type = rarity_tables[forced].sample(rng) if forced else table.sample(rng)
+        results.append(damago_type)
+
+        drawn = rarity_of(damago_type)
+        for rarity in counters:
+            counters[rarity] = 0 if rarity == drawn else counters[rarity] + 1
+    return results, counters
@@ -0,0 +1,104 @@
+"""
+Idempotency-Key 처리 유틸리티
+
+모바일 재시도로 같은 요청이 다시 들어오면, 트랜잭션에서 커밋된 결과를
+idempotencyKeys 컬렉션에서 한 번의 단건 조회로 찾아 그대로 돌려줍니다.
+같은 키를 다른 본문으로 다시 보내면 이전 응답 대신 422를 반환합니다. (requestHash 비교)
+"""
+
+import hashlib
+import json
+from dataclasses import dataclass
+from datetime import datetime, timezone, timedelta
+from firebase_functions import https_fn
+
+import utils.errors as errors
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_COLLECTION = "idempotencyKeys"
+
+# Firestore TTL 정책(expiresAt)으로 자동 삭제됩니다. (firestore.indexes.json 참고)
+IDEMPOTENCY_TTL = timedelta(hours=24)
+
+
+@dataclass(frozen=True)
+class IdempotencyRef:
+    """기록 문서 참조와 요청 본문 해시"""
+    ref: object
+    request_hash: str
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    """이전에 커밋된 요청의 응답 (mismatch면 같은 키로 다른 본문을 보낸 요청)"""
+    body: str
+    status: int
+    mismatch: bool = False
+
+    def to_response(self) -> https_fn.Response:
+        if self.mismatch:
+            return errors.error_response(errors.Unprocessable.IDEMPOTENCY_KEY_REUSED)
+        return https_fn.Response(
+            self.body,
+            status=self.status,
+            mimetype="application/json",
+            headers={"Idempotent-Replayed": "true"}
+        )
+
+
+def _request_hash(req: https_fn.Request) -> str:
+    # 본문(JSON) 또는 쿼리 파라미터를 키 순서와 무관하게 해시
+    params = req.get_json(silent=True) or req.args.to_dict()
+    encoded = json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def get_idempotency_ref(db, req: https_fn.Request, uid: str, scope: str) -> IdempotencyRef | None:
+    """
+    요청 헤더의 Idempotency-Key로 기록 문서 참조를 만듭니다. 헤더가 없으면 None.
+    키는 (uid, scope)와 함께 해시하여 다른 유저/엔드포인트와 충돌하지 않게 합니다.
+    """
+    key = req.headers.get(IDEMPOTENCY_HEADER)
+    if not key:
+        return None
+
+    doc_id = hashlib.sha256(f"{uid}:{scope}:{key}".encode()).hexdigest()
+    return IdempotencyRef(db.collection(IDEMPOTENCY_COLLECTION).document(doc_id), _request_hash(req))
+
+
+def find_stored_response(idem_ref, transaction=None) -> StoredResponse | None:
+    """
+    기록된 응답이 있으면 반환합니다. 만료 시각이 지난 기록은 무시합니다.
+    기록된 본문 해시와 다르면 mismatch 응답을 반환합니다.
+    """
+    if idem_ref is None:
+        return None
+
+    snapshot = idem_ref.ref.get(transaction=transaction)
+    if not snapshot.exists:
+        return None
+
+    data = snapshot.to_dict()
+    expires_at = data.get("expiresAt")
+    # TTL 삭제는 최대 하루 정도 지연될 수 있으므로 직접 만료를 확인
+    if expires_at and expires_at < datetime.now(timezone.utc):
+        return None
+
+    stored_hash = data.get("requestHash")
+    if stored_hash and stored_hash != idem_ref.request_hash:
+        return StoredResponse(body="", status=errors.Unprocessable.IDEMPOTENCY_KEY_REUSED.status, mismatch=True)
+
+    return StoredResponse(body=data.get("body", ""), status=data.get("status", 200))
+
+
+def store_response(transaction, idem_ref, result, status: int = 200) -> None:
+    """트랜잭션 안에서 커밋될 응답을 함께 기록합니다."""
+    if idem_ref is None:
+        return
+
+    transaction.set(idem_ref.ref, {
+        "body": json.dumps(result),
+        "status": status,
+        "requestHash": idem_ref.request_hash,
+        "expiresAt": datetime.now(timezone.utc) + IDEMPOTENCY_TTL
+    })
@@ -0,0 +1,191 @@
+"""
+구조화 로거 (JSON Lines, 백그라운드 기록)
+
+print 대신 사용합니다.
+- 호출 스레드는 레코드를 큐에 넣기만 하고, 포맷팅과 stdout 기록은 백그라운드 스레드가 처리합니다.
+  응답 후 로그가 사라지지 않도록 router가 요청마다 끝에서 flush()로 큐를 비웁니다.
+- 한 줄에 JSON 하나로 기록하여 Cloud Logging에서 severity, 필드 단위로 조회할 수 있습니다.
+- LOG_LEVEL 환경 변수로 레벨을 거르며, 꺼진 레벨은 메시지 포맷팅 비용도 들지 않습니다.
+- rate_key를 주면 같은 키의 로그를 구간당 한 번만 남기고, 생략된 횟수를 다음 로그에 붙입니다.
+- 요청 컨텍스트 안에서는 route, requestID, trace를 자동으로 붙입니다.
+
+사용법:
+    from utils.logger import get_logger
+    logger = get_logger(__name__)
+
+    logger.info("Cloud Task scheduled", damagoID=damago_id)
+    logger.warning("Live Activity not active for %s", uid, rate_key="la_inactive")
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from utils import request_context
+from utils.constants import PROJECT_ID
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+
+# rate_key별 최소 기록 간격 (초)
+RATE_LIMIT_SECONDS = float(os.environ.get("LOG_RATE_LIMIT_SECONDS", "60"))
+
+_RESERVED = set(logging.LogRecord("", 0, "", 0, "", None, None).__dict__) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """LogRecord를 Cloud Logging 구조화 로그 형식의 JSON 한 줄로 변환합니다."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "severity": record.levelname,
+            "message": record.getMessage(),
+            "logger": record.name,
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+        }
+        trace = getattr(record, "trace", None)
+        if trace:
+            entry["logging.googleapis.com/trace"] = f"projects/{PROJECT_ID}/traces/{trace}"
+
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and key not in ("trace", "rate_key"):
+                entry[key] = value
+
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """rate_key가 있는 레코드를 키별로 구간당 한 번만 통과시킵니다."""
+
+    def __init__(self, interval: float):
+        super().__init__()
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._last = {}        # rate_key -> 마지막 기록 시각
+        self._suppressed = {}  # rate_key -> 생략된 횟수
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = getattr(record, "rate_key", None)
+        if key is None:
+            return True
+
+        now = time.monotonic()
+        with self._lock:
+            last = self._last.get(key)
+            if last is not None and now - last < self.interval:
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                return False
+            self._last[key] = now
+            suppressed = self._suppressed.pop(key, 0)
+
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class _FlushMarker:
+    """큐에 넣으면 리스너가 그 앞의 레코드를 모두 기록한 뒤 done을 설정합니다."""
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class _Listener(logging.handlers.QueueListener):
+    running = False
+
+    def start(self) -> None:
+        super().start()
+        self.running = True
+
+    def stop(self) -> None:
+        self.running = False
+        super().stop()
+
+    def handle(self, record) -> None:
+        if isinstance(record, _FlushMarker):
+            record.done.set()
+            return
+        super().handle(record)
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """기본 QueueHandler는 호출 스레드에서 메시지를 포맷하므로, 포맷팅을 리스너 스레드로 미룹니다."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class StructuredLogger(logging.LoggerAdapter):
+    """키워드 인자를 로그 필드로 붙이고, 요청 컨텍스트 정보를 호출 시점에 기록합니다."""
+
+    def process(self, msg, kwargs):
+        fields = {key: kwargs.pop(key) for key in list(kwargs) if key not in ("exc_info", "stack_info", "stacklevel", "extra")}
+
+        # 리스너 스레드에서는 contextvars를 볼 수 없으므로 여기서 복사
+        context = request_context.current()
+        if context is not None:
+            fields.setdefault("route", context.route)
+            fields.setdefault("requestID", context.request_id)
+            if context.trace_id:
+                fields.setdefault("trace", context.trace_id)
+
+        kwargs["extra"] = {**kwargs.get("extra", {}), **fields}
+        return msg, kwargs
+
+
+_queue = queue.SimpleQueue()
+_listener = None
+
+
+def _configure() -> logging.Logger:
+    global _listener
+
+    root = logging.getLogger("damago")
+    root.setLevel(LOG_LEVEL)
+    root.propagate = False
+
+    handler = _DeferredQueueHandler(_queue)
+    handler.addFilter(RateLimitFilter(RATE_LIMIT_SECONDS))
+    root.addHandler(handler)
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter())
+    _listener = _Listener(_queue, stream, respect_handler_level=False)
+    _listener.start()
+
+    # 인스턴스 종료 시 큐에 남은 로그를 모두 기록
+    atexit.register(_listener.stop)
+    return root
+
+
+_root = _configure()
+
+
+def get_logger(name: str) -> StructuredLogger:
+    # services.damago_service -> damago.services.damago_service
+    return StructuredLogger(_root.getChild(name), {})
+
+
+# flush가 리스너를 기다리는 최대 시간 (초)
+FLUSH_TIMEOUT_SECONDS = 2.0
+
+
+def flush(timeout: float = FLUSH_TIMEOUT_SECONDS) -> None:
+    """
+    지금까지 큐에 넣은 로그가 모두 기록될 때까지 기다립니다.
+    응답을 반환한 뒤에는 인스턴스 CPU가 제한되어 리스너 스레드가 돌지 못할 수 있으므로,
+    router가 요청/스케줄 작업이 끝날 때마다 호출합니다. (리스너는 계속 실행됨)
+    """
+    if _listener is None or not _listener.running:
+        return
+    marker = _FlushMarker()
+    _queue.put_nowait(marker)
+    marker.done.wait(timeout)
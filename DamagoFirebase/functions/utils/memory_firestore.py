@@ -0,0 +1,656 @@
+"""
+메모리 Firestore 백엔드 (테스트, 벤치마크용)
+
+FIRESTORE_BACKEND=memory이면 get_db()가 이 백엔드를 사용하는 클라이언트를 반환합니다.
+에뮬레이터 없이 프로세스 안에서 핸들러 전체를 실행할 수 있고, 결과가 매번 같아 성능 비교에 적합합니다.
+
+실제 google.cloud.firestore.Client를 그대로 쓰고 GAPIC 계층(_firestore_api)만 메모리 구현으로 교체합니다.
+- 쿼리 빌더, FieldFilter, Increment, SERVER_TIMESTAMP, DELETE_FIELD, batch, @transactional 재시도 등
+  클라이언트 라이브러리 동작은 운영과 동일합니다.
+- utils/firestore.py의 요청 훅(연산 수 집계, memo 무효화)도 같은 경로로 동작합니다.
+- 트랜잭션은 낙관적 동시성으로 처리합니다. 트랜잭션에서 읽은 문서가 커밋 전에 바뀌었으면 Aborted를 던지고,
+  클라이언트의 @transactional이 운영과 같은 방식으로 재시도합니다.
+
+지원하지 않는 기능: 실시간 리스너(on_snapshot), 벡터 검색, 파이프라인, read_time 지정 읽기
+
+사용법:
+    FIRESTORE_BACKEND=memory python scripts/bench_endpoints.py
+
+    api = get_db()._firestore_api
+    api.reset()                  # 전체 데이터 삭제
+    api.fail_next_commits(2)     # 다음 트랜잭션 커밋 2회를 경합으로 실패시킴 (재시도 경로 검증)
+"""
+
+import itertools
+import math
+import threading
+import time
+from google.api_core import exceptions
+from google.cloud.firestore_v1 import field_path as field_paths
+from google.cloud.firestore_v1.types import aggregation_result, document, firestore, query, write
+from google.protobuf import timestamp_pb2
+from google.rpc import code_pb2, status_pb2
+
+_Document = document.Document.pb()
+_Value = document.Value.pb()
+_Operator = query.StructuredQuery.FieldFilter.Operator
+_UnaryOperator = query.StructuredQuery.UnaryFilter.Operator
+_CompositeOperator = query.StructuredQuery.CompositeFilter.Operator
+_Direction = query.StructuredQuery.Direction
+_ServerValue = write.DocumentTransform.FieldTransform.ServerValue
+
+_RANGE_OPERATORS = (
+    _Operator.LESS_THAN,
+    _Operator.LESS_THAN_OR_EQUAL,
+    _Operator.GREATER_THAN,
+    _Operator.GREATER_THAN_OR_EQUAL,
+)
+
+
+# --- 값 비교 (Firestore 정렬 규칙: 타입 순서 -> 값) ---
+
+def _value_key(value) -> tuple:
+    kind = value.WhichOneof("value_type")
+    if kind is None or kind == "null_value":
+        return (0,)
+    if kind == "boolean_value":
+        return (1, value.boolean_value)
+    if kind == "integer_value":
+        return (2, value.integer_value)
+    if kind == "double_value":
+        # NaN은 모든 숫자보다 앞에 정렬
+        return (2, -math.inf, 0) if math.isnan(value.double_value) else (2, value.double_value)
+    if kind == "timestamp_value":
+        return (3, value.timestamp_value.seconds, value.timestamp_value.nanos)
+    if kind == "string_value":
+        return (4, value.string_value.encode("utf-8"))
+    if kind == "bytes_value":
+        return (5, value.bytes_value)
+    if kind == "reference_value":
+        return (6, tuple(value.reference_value.split("/")))
+    if kind == "geo_point_value":
+        return (7, value.geo_point_value.latitude, value.geo_point_value.longitude)
+    if kind == "array_value":
+        return (8, tuple(_value_key(item) for item in value.array_value.values))
+    return (9, tuple(sorted((key, _value_key(item)) for key, item in value.map_value.fields.items())))
+
+
+def _is_null(value) -> bool:
+    return value.WhichOneof("value_type") == "null_value"
+
+
+def _is_nan(value) -> bool:
+    return value.WhichOneof("value_type") == "double_value" and math.isnan(value.double_value)
+
+
+def _number(value):
+    kind = value.WhichOneof("value_type")
+    if kind == "integer_value":
+        return value.integer_value
+    if kind == "double_value":
+        return value.double_value
+    return None
+
+
+def _number_value(number) -> "_Value":
+    return _Value(integer_value=number) if isinstance(number, int) else _Value(double_value=number)
+
+
+# --- 필드 경로 ---
+
+def _get_field(fields, parts: list):
+    value = None
+    for index, part in enumerate(parts):
+        if part not in fields:
+            return None
+        value = fields[part]
+        if index < len(parts) - 1:
+            if value.WhichOneof("value_type") != "map_value":
+                return None
+            fields = value.map_value.fields
+    return value
+
+
+def _set_field(fields, parts: list, value) -> None:
+    for part in parts[:-1]:
+        if fields[part].WhichOneof("value_type") != "map_value":
+            fields[part].map_value.SetInParent()
+        fields = fields[part].map_value.fields
+    fields[parts[-1]].CopyFrom(value)
+
+
+def _delete_field(fields, parts: list) -> None:
+    for part in parts[:-1]:
+        if part not in fields or fields[part].WhichOneof("value_type") != "map_value":
+            return
+        fields = fields[part].map_value.fields
+    if parts[-1] in fields:
+        del fields[parts[-1]]
+
+
+def _document_field(doc, path: str):
+    if path == "__name__":
+        return _Value(reference_value=doc.name)
+    return _get_field(doc.fields, field_paths.parse_field_path(path))
+
+
+# --- 쿼리 평가 ---
+
+def _matches(doc, filter_pb) -> bool:
+    kind = filter_pb.WhichOneof("filter_type")
+
+    if kind == "composite_filter":
+        results = (_matches(doc, sub) for sub in filter_pb.composite_filter.filters)
+        return any(results) if filter_pb.composite_filter.op == _CompositeOperator.OR else all(results)
+
+    if kind == "unary_filter":
+        unary = filter_pb.unary_filter
+        value = _document_field(doc, unary.field.field_path)
+        if value is None:
+            return False
+        if unary.op == _UnaryOperator.IS_NULL:
+            return _is_null(value)
+        if unary.op == _UnaryOperator.IS_NOT_NULL:
+            return not _is_null(value)
+        if unary.op == _UnaryOperator.IS_NAN:
+            return _is_nan(value)
+        if unary.op == _UnaryOperator.IS_NOT_NAN:
+            return not _is_nan(value) and not _is_null(value)
+        raise exceptions.InvalidArgument(f"Unsupported unary filter: {unary.op}")
+
+    if kind == "field_filter":
+        return _matches_field(doc, filter_pb.field_filter)
+
+    return True
+
+
+def _matches_field(doc, field_filter) -> bool:
+    value = _document_field(doc, field_filter.field.field_path)
+    if value is None:
+        return False
+
+    op = field_filter.op
+    key = _value_key(value)
+    target = field_filter.value
+
+    if op == _Operator.EQUAL:
+        return key == _value_key(target)
+    if op == _Operator.NOT_EQUAL:
+        return not _is_null(value) and key != _value_key(target)
+    if op in _RANGE_OPERATORS:
+        target_key = _value_key(target)
+        # 범위 비교는 같은 타입끼리만 성립
+        if key[0] != target_key[0]:
+            return False
+        if op == _Operator.LESS_THAN:
+            return key < target_key
+        if op == _Operator.LESS_THAN_OR_EQUAL:
+            return key <= target_key
+        if op == _Operator.GREATER_THAN:
+            return key > target_key
+        return key >= target_key
+    if op == _Operator.IN:
+        return key in {_value_key(item) for item in target.array_value.values}
+    if op == _Operator.NOT_IN:
+        return not _is_null(value) and key not in {_value_key(item) for item in target.array_value.values}
+    if op in (_Operator.ARRAY_CONTAINS, _Operator.ARRAY_CONTAINS_ANY):
+        if value.WhichOneof("value_type") != "array_value":
+            return False
+        elements = {_value_key(item) for item in value.array_value.values}
+        if op == _Operator.ARRAY_CONTAINS:
+            return _value_key(target) in elements
+        return any(_value_key(item) in elements for item in target.array_value.values)
+
+    raise exceptions.InvalidArgument(f"Unsupported field filter: {op}")
+
+
+def _inequality_fields(filter_pb) -> list:
+    kind = filter_pb.WhichOneof("filter_type")
+    if kind == "composite_filter":
+        return [path for sub in filter_pb.composite_filter.filters for path in _inequality_fields(sub)]
+    if kind == "field_filter" and filter_pb.field_filter.op in _RANGE_OPERATORS + (_Operator.NOT_EQUAL, _Operator.NOT_IN):
+        return [filter_pb.field_filter.field.field_path]
+    return []
+
+
+def _orders(structured_query) -> list:
+    """명시한 정렬 + 서버가 붙이는 암묵적 정렬(부등호 필드, __name__)"""
+    orders = [(order.field.field_path, order.direction) for order in structured_query.order_by]
+    explicit = {path for path, _ in orders}
+
+    if structured_query.HasField("where"):
+        for path in _inequality_fields(structured_query.where):
+            if path not in explicit:
+                orders.append((path, _Direction.ASCENDING))
+                explicit.add(path)
+
+    if "__name__" not in explicit:
+        last_direction = orders[-1][1] if orders else _Direction.ASCENDING
+        orders.append(("__name__", last_direction))
+    return orders
+
+
+def _compare_cursor(keys: list, orders: list, cursor) -> int:
+    for key, (_, direction), value in zip(keys, orders, cursor.values):
+        cursor_key = _value_key(value)
+        if key != cursor_key:
+            result = -1 if key < cursor_key else 1
+            return -result if direction == _Direction.DESCENDING else result
+    return 0
+
+
+class _Reversed:
+    """내림차순 정렬용 키 래퍼"""
+    __slots__ = ("key",)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return self.key > other.key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+
+def _project(doc, paths) -> "_Document":
+    """select 또는 문서 마스크(field_paths)에 해당하는 필드만 남긴 문서"""
+    projected = _Document(name=doc.name, create_time=doc.create_time, update_time=doc.update_time)
+    for path in paths:
+        if path == "__name__":
+            continue
+        parts = field_paths.parse_field_path(path)
+        value = _get_field(doc.fields, parts)
+        if value is not None:
+            _set_field(projected.fields, parts, value)
+    return projected
+
+
+# --- 쓰기 ---
+
+def _apply_transform(fields, transform, commit_time) -> "_Value":
+    parts = field_paths.parse_field_path(transform.field_path)
+    current = _get_field(fields, parts)
+    kind = transform.WhichOneof("transform_type")
+
+    if kind == "set_to_server_value":
+        if transform.set_to_server_value != _ServerValue.REQUEST_TIME:
+            raise exceptions.InvalidArgument("Unsupported server value")
+        result = _Value(timestamp_value=commit_time)
+
+    elif kind in ("increment", "maximum", "minimum"):
+        operand = getattr(transform, kind)
+        base = _number(current) if current is not None else None
+        number = _number(operand)
+        if base is None:
+            result = _number_value(number) if kind == "increment" else operand
+        elif kind == "increment":
+            result = _number_value(base + number)
+        elif kind == "maximum":
+            result = _number_value(max(base, number))
+        else:
+            result = _number_value(min(base, number))
+
+    elif kind in ("append_missing_elements", "remove_all_from_array"):
+        existing = list(current.array_value.values) if current is not None and current.WhichOneof("value_type") == "array_value" else []
+        operands = getattr(transform, kind).values
+        if kind == "append_missing_elements":
+            keys = {_value_key(item) for item in existing}
+            for item in operands:
+                if _value_key(item) not in keys:
+                    existing.append(item)
+                    keys.add(_value_key(item))
+        else:
+            removed = {_value_key(item) for item in operands}
+            existing = [item for item in existing if _value_key(item) not in removed]
+        result = _Value()
+        result.array_value.SetInParent()
+        result.array_value.values.extend(existing)
+
+    else:
+        raise exceptions.InvalidArgument(f"Unsupported transform: {kind}")
+
+    _set_field(fields, parts, result)
+    return result
+
+
+class MemoryFirestoreApi:
+    """FirestoreClient(GAPIC)의 메모리 구현. 스레드 안전합니다."""
+
+    def __init__(self, database_string: str):
+        self._prefix = f"{database_string}/documents"
+        self._lock = threading.RLock()
+        self._documents = {}        # 상대 경로(users/abc) -> Document
+        self._transactions = {}     # 트랜잭션 ID -> {상대 경로: 읽을 당시 update_time (없는 문서는 None)}
+        self._transaction_ids = itertools.count(1)
+        self._last_time_ns = 0
+        self._forced_aborts = 0
+
+    # --- 테스트/벤치마크 보조 ---
+
+    def reset(self) -> None:
+        with self._lock:
+            self._documents.clear()
+            self._transactions.clear()
+            self._forced_aborts = 0
+
+    def fail_next_commits(self, count: int) -> None:
+        """다음 트랜잭션 커밋 count회를 경합(Aborted)으로 실패시킵니다."""
+        with self._lock:
+            self._forced_aborts = count
+
+    @property
+    def document_count(self) -> int:
+        return len(self._documents)
+
+    # --- 내부 ---
+
+    def _relative(self, name: str) -> str:
+        if name == self._prefix:
+            return ""
+        if not name.startswith(self._prefix + "/"):
+            raise exceptions.InvalidArgument(f"Invalid resource name: {name}")
+        return name[len(self._prefix) + 1:]
+
+    def _now(self) -> timestamp_pb2.Timestamp:
+        # 커밋마다 update_time이 달라지도록 단조 증가 (트랜잭션 충돌 판정에 사용)
+        now_ns = max(time.time_ns(), self._last_time_ns + 1000)
+        self._last_time_ns = now_ns
+        timestamp = timestamp_pb2.Timestamp()
+        timestamp.FromNanoseconds(now_ns)
+        return timestamp
+
+    def _record_read(self, transaction: bytes, path: str) -> None:
+        if not transaction:
+            return
+        reads = self._transactions.get(transaction)
+        if reads is None:
+            raise exceptions.InvalidArgument("Transaction has expired or is invalid")
+        doc = self._documents.get(path)
+        reads.setdefault(path, doc.update_time.ToNanoseconds() if doc is not None else None)
+
+    def _check_conflicts(self, transaction: bytes) -> None:
+        reads = self._transactions.pop(transaction, None)
+        if reads is None:
+            raise exceptions.InvalidArgument("Transaction has expired or is invalid")
+        if self._forced_aborts > 0:
+            self._forced_aborts -= 1
+            raise exceptions.Aborted("Aborted due to cross-transaction contention.")
+        for path, update_time in reads.items():
+            doc = self._documents.get(path)
+            current = doc.update_time.ToNanoseconds() if doc is not None else None
+            if current != update_time:
+                raise exceptions.Aborted("Aborted due to cross-transaction contention.")
+
+    def _apply(self, write_pb, staged: dict, commit_time) -> "write.WriteResult":
+        operation = write_pb.WhichOneof("operation")
+        name = {
+            "update": lambda: write_pb.update.name,
+            "delete": lambda: write_pb.delete,
+            "transform": lambda: write_pb.transform.document,
+            "verify": lambda: write_pb.verify,
+        }[operation]()
+
+        path = self._relative(name)
+        current = staged[path] if path in staged else self._documents.get(path)
+
+        if write_pb.HasField("current_document"):
+            condition = write_pb.current_document
+            if condition.WhichOneof("condition_type") == "exists":
+                if condition.exists and current is None:
+                    raise exceptions.NotFound(f"No document to update: {name}")
+                if not condition.exists and current is not None:
+                    raise exceptions.AlreadyExists(f"Document already exists: {name}")
+            elif condition.WhichOneof("condition_type") == "update_time":
+                if current is None or current.update_time != condition.update_time:
+                    raise exceptions.FailedPrecondition(f"Document was modified: {name}")
+
+        result = write.WriteResult.pb()(update_time=commit_time)
+        if operation == "verify":
+            return result
+        if operation == "delete":
+            staged[path] = None
+            return result
+
+        updated = _Document()
+        if operation == "update":
+            if write_pb.HasField("update_mask"):
+                if current is not None:
+                    updated.fields.MergeFrom(current.fields)
+                for path_string in write_pb.update_mask.field_paths:
+                    parts = field_paths.parse_field_path(path_string)
+                    value = _get_field(write_pb.update.fields, parts)
+                    if value is None:
+                        _delete_field(updated.fields, parts)
+                    else:
+                        _set_field(updated.fields, parts, value)
+            else:
+                updated.fields.MergeFrom(write_pb.update.fields)
+            transforms = write_pb.update_transforms
+        else:
+            if current is not None:
+                updated.fields.MergeFrom(current.fields)
+            transforms = write_pb.transform.field_transforms
+
+        for transform in transforms:
+            result.transform_results.append(_apply_transform(updated.fields, transform, commit_time))
+
+        updated.name = name
+        updated.create_time.CopyFrom(current.create_time if current is not None else commit_time)
+        updated.update_time.CopyFrom(commit_time)
+        staged[path] = updated
+        return result
+
+    def _flush(self, staged: dict) -> None:
+        for path, doc in staged.items():
+            if doc is None:
+                self._documents.pop(path, None)
+            else:
+                self._documents[path] = doc
+
+    def _run(self, parent: str, structured_query) -> list:
+        parent_path = self._relative(parent)
+        collections = [(selector.collection_id, selector.all_descendants) for selector in structured_query.from_]
+
+        docs = []
+        for path, doc in self._documents.items():
+            segments = path.split("/")
+            doc_parent = "/".join(segments[:-2])
+            for collection_id, all_descendants in collections:
+                # collection_id가 비어 있으면 모든 컬렉션 (recursive 쿼리)
+                if collection_id and segments[-2] != collection_id:
+                    continue
+                if doc_parent == parent_path or (all_descendants and (not parent_path or doc_parent.startswith(parent_path + "/"))):
+                    docs.append(doc)
+                    break
+
+        if structured_query.HasField("where"):
+            docs = [doc for doc in docs if _matches(doc, structured_query.where)]
+
+        orders = _orders(structured_query)
+        keyed = []
+        for doc in docs:
+            values = [_document_field(doc, path) for path, _ in orders]
+            # 정렬 필드가 없는 문서는 결과에서 제외
+            if any(value is None for value in values):
+                continue
+            keyed.append(([_value_key(value) for value in values], doc))
+
+        keyed.sort(key=lambda item: [
+            _Reversed(key) if direction == _Direction.DESCENDING else key
+            for key, (_, direction) in zip(item[0], orders)
+        ])
+
+        if structured_query.HasField("start_at"):
+            cursor = structured_query.start_at
+            keyed = [item for item in keyed if (_compare_cursor(item[0], orders, cursor) >= 0 if cursor.before else _compare_cursor(item[0], orders, cursor) > 0)]
+        if structured_query.HasField("end_at"):
+            cursor = structured_query.end_at
+            keyed = [item for item in keyed if (_compare_cursor(item[0], orders, cursor) < 0 if cursor.before else _compare_cursor(item[0], orders, cursor) <= 0)]
+
+        docs = [doc for _, doc in keyed][structured_query.offset:]
+        if structured_query.HasField("limit"):
+            docs = docs[:structured_query.limit.value]
+        return docs
+
+    # --- GAPIC 메서드 ---
+
+    def batch_get_documents(self, request=None, **kwargs):
+        request = firestore.BatchGetDocumentsRequest(request)._pb
+        with self._lock:
+            transaction = request.transaction
+            if request.HasField("new_transaction"):
+                transaction = self._begin()
+            read_time = self._now()
+            responses = []
+            for name in request.documents:
+                path = self._relative(name)
+                self._record_read(transaction, path)
+                doc = self._documents.get(path)
+                response = firestore.BatchGetDocumentsResponse.pb()(read_time=read_time, transaction=transaction)
+                if doc is None:
+                    response.missing = name
+                elif request.HasField("mask"):
+                    response.found.CopyFrom(_project(doc, request.mask.field_paths))
+                else:
+                    response.found.CopyFrom(doc)
+                responses.append(firestore.BatchGetDocumentsResponse.wrap(response))
+        return iter(responses)
+
+    def run_query(self, request=None, **kwargs):
+        request = firestore.RunQueryRequest(request)._pb
+        with self._lock:
+            transaction = request.transaction
+            if request.HasField("new_transaction"):
+                transaction = self._begin()
+            docs = self._run(request.parent, request.structured_query)
+            read_time = self._now()
+            responses = []
+            for doc in docs:
+                self._record_read(transaction, self._relative(doc.name))
+                if request.structured_query.HasField("select"):
+                    doc = _project(doc, [field.field_path for field in request.structured_query.select.fields])
+                response = firestore.RunQueryResponse.pb()(read_time=read_time, transaction=transaction)
+                response.document.CopyFrom(doc)
+                responses.append(firestore.RunQueryResponse.wrap(response))
+            if not responses:
+                # 결과가 없어도 read_time만 담긴 응답 하나를 돌려줌 (운영과 동일)
+                responses.append(firestore.RunQueryResponse.wrap(
+                    firestore.RunQueryResponse.pb()(read_time=read_time, transaction=transaction)
+                ))
+        return iter(responses)
+
+    def run_aggregation_query(self, request=None, **kwargs):
+        request = firestore.RunAggregationQueryRequest(request)._pb
+        aggregation_query = request.structured_aggregation_query
+        with self._lock:
+            docs = self._run(request.parent, aggregation_query.structured_query)
+            for doc in docs:
+                self._record_read(request.transaction, self._relative(doc.name))
+            read_time = self._now()
+
+        result = aggregation_result.AggregationResult.pb()()
+        for aggregation in aggregation_query.aggregations:
+            kind = aggregation.WhichOneof("operator")
+            if kind == "count":
+                count = len(docs)
+                if aggregation.count.HasField("up_to"):
+                    count = min(count, aggregation.count.up_to.value)
+                value = _Value(integer_value=count)
+            else:
+                path = getattr(aggregation, kind).field.field_path
+                numbers = [_number(v) for v in (_document_field(doc, path) for doc in docs) if v is not None and _number(v) is not None]
+                if kind == "sum":
+                    value = _number_value(sum(numbers))
+                elif numbers:
+                    value = _Value(double_value=sum(numbers) / len(numbers))
+                else:
+                    value = _Value(null_value=0)
+            result.aggregate_fields[aggregation.alias].CopyFrom(value)
+
+        response = firestore.RunAggregationQueryResponse.pb()(read_time=read_time)
+        response.result.CopyFrom(result)
+        return iter([firestore.RunAggregationQueryResponse.wrap(response)])
+
+    def _begin(self) -> bytes:
+        transaction = f"memory-tx-{next(self._transaction_ids)}".encode()
+        self._transactions[transaction] = {}
+        return transaction
+
+    def begin_transaction(self, request=None, **kwargs):
+        with self._lock:
+            transaction = self._begin()
+        return firestore.BeginTransactionResponse(transaction=transaction)
+
+    def rollback(self, request=None, **kwargs):
+        request = firestore.RollbackRequest(request)._pb
+        with self._lock:
+            self._transactions.pop(request.transaction, None)
+
+    def commit(self, request=None, **kwargs):
+        request = firestore.CommitRequest(request)._pb
+        with self._lock:
+            if request.transaction:
+                self._check_conflicts(request.transaction)
+            commit_time = self._now()
+            staged = {}
+            results = [self._apply(write_pb, staged, commit_time) for write_pb in request.writes]
+            # 모든 쓰기가 검증된 뒤에만 반영 (원자적 커밋)
+            self._flush(staged)
+
+        response = firestore.CommitResponse.pb()(commit_time=commit_time)
+        response.write_results.extend(results)
+        return firestore.CommitResponse.wrap(response)
+
+    def batch_write(self, request=None, **kwargs):
+        request = firestore.BatchWriteRequest(request)._pb
+        response = firestore.BatchWriteResponse.pb()()
+        with self._lock:
+            # BatchWrite는 원자적이지 않으므로 쓰기마다 따로 반영
+            for write_pb in request.writes:
+                staged = {}
+                try:
+                    result = self._apply(write_pb, staged, self._now())
+                    self._flush(staged)
+                    response.write_results.append(result)
+                    response.status.append(status_pb2.Status(code=code_pb2.OK))
+                except exceptions.GoogleAPICallError as e:
+                    response.write_results.append(write.WriteResult.pb()())
+                    response.status.append(status_pb2.Status(code=e.grpc_status_code.value[0], message=e.message))
+        return firestore.BatchWriteResponse.wrap(response)
+
+    def list_documents(self, request=None, **kwargs):
+        request = firestore.ListDocumentsRequest(request)._pb
+        parent_path = self._relative(request.parent)
+        prefix = f"{parent_path}/{request.collection_id}/" if parent_path else f"{request.collection_id}/"
+
+        with self._lock:
+            names = set()
+            for path in self._documents:
+                if path.startswith(prefix):
+                    doc_id = path[len(prefix):].split("/", 1)[0]
+                    child = prefix + doc_id
+                    # show_missing: 하위 컬렉션만 있고 문서는 없는 경로도 포함
+                    if child in self._documents or request.show_missing:
+                        names.add(child)
+
+        return iter([document.Document(name=f"{self._prefix}/{path}") for path in sorted(names)])
+
+    def list_collection_ids(self, request=None, **kwargs):
+        request = firestore.ListCollectionIdsRequest(request)._pb
+        parent_path = self._relative(request.parent)
+        prefix = f"{parent_path}/" if parent_path else ""
+
+        with self._lock:
+            ids = {path[len(prefix):].split("/", 1)[0] for path in self._documents if path.startswith(prefix)}
+        return iter(sorted(ids))
+
+
+def create_client(project: str):
+    """메모리 백엔드를 사용하는 Firestore 클라이언트를 만듭니다."""
+    from google.auth.credentials import AnonymousCredentials
+    from google.cloud import firestore as cloud_firestore
+
+    client = cloud_firestore.Client(project=project, credentials=AnonymousCredentials())
+    client._firestore_api_internal = MemoryFirestoreApi(client._database_string)
+    return client
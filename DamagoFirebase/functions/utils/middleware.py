@@ -1,10 +1,88 @@
+from dataclasses import dataclass
 from firebase_admin import auth
 from firebase_functions import https_fn
+import utils.errors as errors
+from utils.firestore import get_snapshot
+from utils import tracing
 
-def get_uid_from_request(req: https_fn.Request) -> str:
+# 커플 연결 시 ID 토큰에 저장하는 custom claim 키
+COUPLE_CLAIM_KEYS = ("coupleID", "partnerUID", "isUser1")
+
+
+@dataclass(frozen=True)
+class Principal:
+    """검증된 ID 토큰의 사용자 정보 (커플 claim이 없으면 None)"""
+    uid: str
+    couple_id: str | None = None
+    partner_uid: str | None = None
+    is_user1: bool | None = None
+
+
+def get_principal_from_request(req: https_fn.Request) -> Principal:
     auth_header = req.headers.get("Authorization")
     if not auth_header or not auth_header.startswith("Bearer "):
         raise ValueError("Missing or invalid Authorization header")
     token = auth_header.split("Bearer ")[1]
-    decoded_token = auth.verify_id_token(token)
-    return decoded_token["uid"]
\ No newline at end of file
+    with tracing.span(tracing.AUTH):
+        decoded_token = auth.verify_id_token(token)
+    return Principal(
+        uid=decoded_token["uid"],
+        couple_id=decoded_token.get("coupleID"),
+        partner_uid=decoded_token.get("partnerUID"),
+        is_user1=decoded_token.get("isUser1")
+    )
+
+
+def get_uid_from_request(req: https_fn.Request) -> str:
+    return get_principal_from_request(req).uid
+
+
+def resolve_couple_id(db, principal: Principal) -> tuple[str | None, errors.ErrorInfo | None]:
+    """
+    토큰 claim에 커플 ID가 있으면 users 문서 조회 없이 사용합니다.
+    claim이 없는 토큰(연결 직후 토큰 갱신 전 등)은 users 문서에서 확인합니다.
+
+    claim은 토큰이 만료될 때까지(최대 1시간) 탈퇴/재연결 이전 값일 수 있으므로,
+    커플 문서를 쓰는 경로는 읽은 커플 문서로 is_couple_member를 확인해야 합니다.
+    """
+    if principal.couple_id:
+        return principal.couple_id, None
+
+    # 이후 핸들러가 같은 users 문서를 읽으면 요청 memo에서 재사용됩니다.
+    user_doc = get_snapshot(db.collection("users").document(principal.uid))
+    if not user_doc.exists:
+        return None, errors.NotFound.USER
+
+    couple_id = user_doc.to_dict().get("coupleID")
+    if not couple_id:
+        return None, errors.NotFound.COUPLE
+
+    return couple_id, None
+
+
+def is_couple_member(couple_data: dict, uid: str) -> bool:
+    """커플 문서의 구성원인지 확인합니다. (이미 읽은 커플 문서로 확인하므로 추가 조회 없음)"""
+    return uid in (couple_data.get("user1UID"), couple_data.get("user2UID"))
+
+
+def _update_claims(uid: str, couple_claims: dict) -> None:
+    # set_custom_user_claims는 전체를 덮어쓰므로 admin 등 기존 claim을 유지하며 병합
+    claims = dict(auth.get_user(uid).custom_claims or {})
+    for key in COUPLE_CLAIM_KEYS:
+        claims.pop(key, None)
+    claims.update(couple_claims)
+    auth.set_custom_user_claims(uid, claims or None)
+
+
+def set_couple_claims(uid: str, couple_id: str, partner_uid: str, is_user1: bool) -> None:
+    """커플 정보를 custom claim으로 저장합니다. (클라이언트가 토큰을 갱신하면 반영)"""
+    _update_claims(uid, {
+        "coupleID": couple_id,
+        "partnerUID": partner_uid,
+        "isUser1": is_user1
+    })
+
+
+def clear_couple_claims(uid: str) -> None:
+    """커플 claim을 제거합니다."""
+    _update_claims(uid, {})
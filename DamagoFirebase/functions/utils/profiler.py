@@ -0,0 +1,176 @@
+"""
+요청 단위 온디맨드 프로파일러
+
+재배포 없이 운영 함수의 CPU 사용 지점(JSON 직렬화, to_dict 변환, 트랜잭션 재시도 등)을 찾기 위해
+선택된 요청의 핸들러 실행만 프로파일링합니다.
+
+프로파일링 대상
+- X-Damago-Profile: 1 헤더 + admin claim이 있는 ID 토큰 (에뮬레이터는 claim 확인 생략)
+- PROFILE_SAMPLE_RATE 비율만큼 무작위 요청 (기본 0, 꺼짐)
+
+결과 형식 (PROFILE_FORMAT)
+- collapsed: 샘플링 프로파일러. 핸들러 스레드의 스택을 PROFILE_INTERVAL_MS마다 수집하여
+  flamegraph.pl, speedscope에서 바로 열 수 있는 "a;b;c 횟수" 형식으로 저장합니다. (기본)
+  벽시계 기준이므로 Firestore/FCM 대기 구간도 함께 나타납니다.
+- pstats: cProfile 결과. 호출 횟수까지 필요할 때 사용합니다. (오버헤드가 더 큼)
+
+결과는 PROFILE_DIR에 "{route}-{시각}-{requestID}" 이름으로 저장되며,
+PROFILE_BUCKET이 설정되어 있으면 Cloud Storage의 profiles/ 아래로도 업로드합니다.
+파일 이름은 요청 요약 로그의 profile 필드와 응답의 X-Damago-Profile 헤더로 확인합니다.
+"""
+
+import os
+import random
+import sys
+import tempfile
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+PROFILE_HEADER = "X-Damago-Profile"
+
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_FORMAT = os.environ.get("PROFILE_FORMAT", "collapsed")
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "damago-profiles"))
+PROFILE_BUCKET = os.environ.get("PROFILE_BUCKET")
+
+# 한 스택에서 기록할 최대 프레임 수 (깊은 재귀로 인한 결과 비대화 방지)
+MAX_STACK_DEPTH = 128
+
+
+class StackSampler:
+    """대상 스레드의 호출 스택을 주기적으로 수집합니다."""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="damago-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[_collapse(frame)] += 1
+
+    def dump(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def _collapse(frame) -> str:
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        module = frame.f_globals.get("__name__", "?")
+        names.append(f"{module}:{code.co_qualname}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def _has_admin_claim(req) -> bool:
+    if os.getenv("FUNCTIONS_EMULATOR") == "true":
+        return True
+
+    auth_header = req.headers.get("Authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        return False
+
+    try:
+        from firebase_admin import auth
+        decoded_token = auth.verify_id_token(auth_header.split("Bearer ")[1])
+        return decoded_token.get("admin", False)
+    except Exception as e:
+        logger.warning("Profile request rejected", error=str(e))
+        return False
+
+
+def should_profile(req) -> bool:
+    if req is not None and req.headers.get(PROFILE_HEADER) == "1":
+        # 헤더를 보낸 요청만 토큰을 한 번 더 검증합니다.
+        return _has_admin_claim(req)
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def _artifact_name(route: str, request_id: str) -> str:
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    extension = "prof" if PROFILE_FORMAT == "pstats" else "collapsed"
+    return f"{route}-{stamp}-{request_id[:8]}.{extension}"
+
+
+def _upload(path: str, name: str) -> None:
+    from firebase_admin import storage
+    storage.bucket(PROFILE_BUCKET).blob(f"profiles/{name}").upload_from_filename(path)
+
+
+def _save(name: str, write) -> str | None:
+    """
+    프로파일 결과를 저장하고 경로를 반환합니다.
+    요청 처리의 finally에서 호출되므로 저장에 실패해도 예외를 올리지 않고 None을 반환합니다.
+    """
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, name)
+        write(path)
+    except Exception as e:
+        logger.warning("Profile save failed", profile=name, dir=PROFILE_DIR, error=str(e))
+        return None
+
+    logger.info("Profile saved", profile=name, dir=PROFILE_DIR)
+    if PROFILE_BUCKET:
+        try:
+            _upload(path, name)
+        except Exception as e:
+            logger.warning("Profile upload failed", profile=name, error=str(e))
+    return path
+
+
+@contextmanager
+def profile_request(context, req):
+    """
+    프로파일링 대상 요청이면 with 블록을 프로파일링하고 결과 파일 이름을 context.profile에 기록합니다.
+    대상이 아니면 아무 일도 하지 않습니다.
+    """
+    if not should_profile(req):
+        yield
+        return
+
+    name = _artifact_name(context.route, context.request_id)
+    context.profile = name
+
+    if PROFILE_FORMAT == "pstats":
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            if _save(name, profiler.dump_stats) is None:
+                context.profile = None
+    else:
+        sampler = StackSampler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000)
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+
+            def write(path):
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(sampler.dump())
+
+            if _save(name, write) is None:
+                context.profile = None
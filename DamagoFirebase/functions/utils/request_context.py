@@ -0,0 +1,174 @@
+"""
+요청 범위 컨텍스트
+
+하나의 함수 호출(요청) 동안 공유되는 상태를 contextvars로 보관합니다.
+router.call이 요청마다 request_scope를 열고, 요청이 끝나면 summary()를 로그로 남깁니다.
+컨텍스트 밖(스케줄러, 스크립트)에서는 current()가 None이며 각 기능은 그대로 동작합니다.
+"""
+
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from utils.constants import TRACE_SAMPLE_RATE
+from utils.firestore_budget import check_budget
+
+# 값이 "1"이면 샘플링과 관계없이 단계별 시간을 기록합니다.
+TRACE_HEADER = "X-Damago-Trace"
+
+
+class SnapshotMemo:
+    """
+    요청 동안 읽은 문서 스냅샷을 경로별로 보관합니다.
+    같은 문서를 다시 읽으면 첫 스냅샷을 돌려주고, 해당 문서에 쓰기가 커밋되면 버립니다.
+    """
+
+    def __init__(self):
+        self._snapshots = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, path: str):
+        snapshot = self._snapshots.get(path)
+        if snapshot is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return snapshot
+
+    def put(self, path: str, snapshot) -> None:
+        self._snapshots[path] = snapshot
+
+    def invalidate(self, path: str) -> None:
+        if self._snapshots.pop(path, None) is not None:
+            self.invalidations += 1
+
+    @property
+    def saved_reads(self) -> int:
+        """memo로 대신한 Firestore 문서 읽기 수"""
+        return self.hits
+
+
+@dataclass
+class FirestoreOps:
+    """요청 동안 발생한 Firestore 연산 수 (과금 단위 기준)"""
+    reads: int = 0          # 문서 읽기 (없는 문서, 결과 없는 쿼리도 1회로 과금)
+    writes: int = 0         # 문서 쓰기/삭제
+    queries: int = 0        # run_query, 집계 쿼리 호출
+    transactions: int = 0   # 트랜잭션 시작
+    retries: int = 0        # 경합으로 재시도된 트랜잭션
+
+    def server_timing(self) -> str:
+        """Server-Timing 헤더 형식 (예: fs-read;desc="3", fs-write;desc="1")"""
+        return ", ".join(f'fs-{name};desc="{value}"' for name, value in (
+            ("read", self.reads),
+            ("write", self.writes),
+            ("query", self.queries),
+            ("tx", self.transactions),
+            ("retry", self.retries),
+        ))
+
+
+@dataclass
+class RequestContext:
+    route: str
+    request_id: str
+    trace_id: str | None = None
+    started_at: float = field(default_factory=time.perf_counter)
+    memo: SnapshotMemo = field(default_factory=SnapshotMemo)
+    ops: FirestoreOps = field(default_factory=FirestoreOps)
+    # 단계별 소요 시간 (utils/tracing.py, 샘플링된 요청만 기록)
+    sampled: bool = False
+    spans: dict[str, float] = field(default_factory=dict)
+    open_step: tuple[str, float] | None = None
+    # 프로파일링된 요청의 결과 파일 이름 (utils/profiler.py)
+    profile: str | None = None
+    # route 대신 비교할 연산 예산 이름 (utils/firestore_budget.py, 없으면 route)
+    budget_route: str | None = None
+
+    def add_span(self, name: str, ms: float) -> None:
+        # 같은 이름의 단계가 여러 번 실행되면 합산 (예: 두 사용자에게 push)
+        self.spans[name] = self.spans.get(name, 0.0) + ms
+
+    def close_step(self) -> None:
+        if self.open_step is not None:
+            name, started = self.open_step
+            self.add_span(name, (time.perf_counter() - started) * 1000)
+            self.open_step = None
+
+    def server_timing(self) -> str:
+        """Server-Timing 헤더 값 (단계별 시간 + Firestore 연산 수)"""
+        entries = [f"{name};dur={ms:.1f}" for name, ms in self.spans.items()]
+        if self.sampled:
+            entries.append(f"total;dur={(time.perf_counter() - self.started_at) * 1000:.1f}")
+        entries.append(self.ops.server_timing())
+        return ", ".join(entries)
+
+    def summary(self) -> dict:
+        summary = {
+            "route": self.route,
+            "requestID": self.request_id,
+            "durationMs": round((time.perf_counter() - self.started_at) * 1000, 1),
+            "memoSavedReads": self.memo.saved_reads,
+            "firestore": asdict(self.ops),
+        }
+        if self.sampled:
+            summary["spans"] = {name: round(ms, 1) for name, ms in self.spans.items()}
+        if self.profile:
+            summary["profile"] = self.profile
+        violations = check_budget(self.budget_route or self.route, self.ops)
+        if violations:
+            summary["budgetExceeded"] = violations
+        return summary
+
+
+_current: ContextVar[RequestContext | None] = ContextVar("request_context", default=None)
+
+
+def current() -> RequestContext | None:
+    return _current.get()
+
+
+def set_budget_route(name: str) -> None:
+    """이 요청의 연산 수를 name 예산과 비교하도록 합니다. (예: 여러 번 뽑기)"""
+    context = _current.get()
+    if context is not None:
+        context.budget_route = name
+
+
+def _trace_id(req) -> str | None:
+    # Cloud Functions가 붙여 주는 trace ID (로그를 요청 trace와 연결하는 데 사용)
+    trace = req.headers.get("X-Cloud-Trace-Context") if req is not None else None
+    return trace.split("/")[0] if trace else None
+
+
+def _should_trace(req) -> bool:
+    if req is not None and req.headers.get(TRACE_HEADER) == "1":
+        return True
+    return TRACE_SAMPLE_RATE > 0 and random.random() < TRACE_SAMPLE_RATE
+
+
+@contextmanager
+def request_scope(route: str, req=None):
+    """요청 하나의 컨텍스트를 엽니다. (중첩 호출 시 바깥 컨텍스트를 그대로 사용)"""
+    existing = _current.get()
+    if existing is not None:
+        yield existing
+        return
+
+    trace_id = _trace_id(req)
+    context = RequestContext(
+        route=route,
+        request_id=trace_id or uuid.uuid4().hex,
+        trace_id=trace_id,
+        sampled=_should_trace(req)
+    )
+    token = _current.set(context)
+    try:
+        yield context
+    finally:
+        context.close_step()
+        _current.reset(token)
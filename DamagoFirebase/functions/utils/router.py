@@ -0,0 +1,78 @@
+"""
+서비스 핸들러 지연 로딩 및 통합 엔트리포인트(api)용 경로 기반 라우터
+
+각 함수는 처음 호출될 때 필요한 서비스 모듈만 import 합니다.
+(get_user_info가 Cloud Tasks, FCM, nanoid 등을 불러오지 않도록 하여 콜드 스타트 단축)
+
+https://{region}-{project}.cloudfunctions.net/api/feed 처럼 호출하면
+경로의 첫 구간(feed)에 해당하는 기존 서비스 핸들러로 전달합니다.
+"""
+
+import importlib
+from functools import lru_cache
+from typing import Callable
+from firebase_functions import https_fn
+import utils.errors as errors
+from utils.request_context import request_scope
+from utils.profiler import PROFILE_HEADER, profile_request
+from utils import logger as log
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+Handler = Callable[[https_fn.Request], https_fn.Response]
+
+
+@lru_cache(maxsize=None)
+def load_handler(module: str, name: str) -> Callable:
+    """services.{module}.{name}을 처음 사용할 때 import 합니다."""
+    service = importlib.import_module(f"services.{module}")
+    return getattr(service, name)
+
+
+def call(module: str, name: str, req: https_fn.Request) -> https_fn.Response:
+    """핸들러를 요청 컨텍스트(utils/request_context.py) 안에서 실행합니다. (선택된 요청은 프로파일링)"""
+    handler = load_handler(module, name)
+    with request_scope(name, req) as context:
+        try:
+            with profile_request(context, req):
+                response = handler(req)
+            if isinstance(response, https_fn.Response):
+                # 단계별 시간과 요청 비용 확인용 (브라우저 개발자 도구, 벤치마크에서 사용)
+                context.close_step()
+                response.headers.add("Server-Timing", context.server_timing())
+                if context.profile:
+                    response.headers.add(PROFILE_HEADER, context.profile)
+            return response
+        finally:
+            context.close_step()
+            logger.info("request completed", **context.summary())
+            # 응답 후에는 로그 스레드가 실행되지 못할 수 있으므로 반환 전에 기록
+            log.flush()
+
+
+def run_scheduled(module: str, name: str, event) -> None:
+    """스케줄러 핸들러를 실행하고, 반환 전에 로그를 모두 기록합니다."""
+    try:
+        load_handler(module, name)(event)
+    finally:
+        log.flush()
+
+
+def route_name(req: https_fn.Request) -> str | None:
+    """요청 경로에서 라우트 이름을 추출합니다. ("/feed", "/api/feed" 모두 "feed")"""
+    segments = [segment for segment in req.path.split("/") if segment]
+    if segments and segments[0] == "api":
+        segments = segments[1:]
+    return segments[0] if segments else None
+
+
+def dispatch(routes: dict[str, tuple[str, str]], req: https_fn.Request) -> https_fn.Response:
+    """routes: { 라우트 이름: (서비스 모듈, 핸들러 이름) }"""
+    name = route_name(req)
+    target = routes.get(name) if name else None
+
+    if target is None:
+        return errors.error_response_with_detail(errors.NotFound.ROUTE, str(name))
+
+    return call(*target, req)
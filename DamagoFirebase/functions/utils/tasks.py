@@ -0,0 +1,14 @@
+"""
+Cloud Tasks 클라이언트
+
+클라이언트 생성(gRPC 채널, 인증)은 비용이 크므로 인스턴스당 한 번만 만들어 재사용합니다.
+tasks_v2 import 자체도 무거워 처음 사용할 때 불러옵니다.
+"""
+
+from functools import lru_cache
+
+
+@lru_cache(maxsize=1)
+def get_tasks_client():
+    from google.cloud import tasks_v2
+    return tasks_v2.CloudTasksClient()
@@ -0,0 +1,57 @@
+"""
+요청 단계별 소요 시간 측정
+
+핸들러와 서비스는 단계 경계(--- [Step N] --- 주석 등)에서 이름 붙은 단계를 기록합니다.
+- step(name): 이전 단계를 끝내고 새 단계를 시작합니다. (핸들러 본문의 순차 단계용)
+- span(name): with 블록 동안의 시간을 기록합니다. (공용 헬퍼 내부, 중첩 가능)
+
+기록은 샘플링된 요청에서만 이루어지며(TRACE_SAMPLE_RATE, X-Damago-Trace: 1),
+요청이 끝나면 Server-Timing 헤더와 요청 요약 로그의 spans 필드로 나갑니다.
+요청 컨텍스트 밖(스케줄러, 스크립트)에서는 아무 일도 하지 않습니다.
+"""
+
+import time
+from contextlib import contextmanager
+from utils import request_context
+
+# 공통 단계 이름
+AUTH = "auth"       # ID 토큰 검증
+READ = "read"       # 트랜잭션 밖 문서 조회
+QUERY = "query"     # 쿼리
+TXN = "txn"         # 트랜잭션
+WRITE = "write"     # 배치/단건 쓰기
+PUSH = "push"       # 알림/Live Activity 전송 단계
+FCM = "fcm"         # messaging.send 호출
+TASK = "task"       # Cloud Tasks 예약
+CLAIMS = "claims"   # custom claim 갱신
+
+
+def _sampled_context():
+    context = request_context.current()
+    if context is None or not context.sampled:
+        return None
+    return context
+
+
+def step(name: str) -> None:
+    """현재 단계를 끝내고 name 단계를 시작합니다."""
+    context = _sampled_context()
+    if context is None:
+        return
+    context.close_step()
+    context.open_step = (name, time.perf_counter())
+
+
+@contextmanager
+def span(name: str):
+    """with 블록의 소요 시간을 name으로 기록합니다."""
+    context = _sampled_context()
+    if context is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        context.add_span(name, (time.perf_counter() - started) * 1000)